@@ -5,26 +5,40 @@ This file makes the 'app' directory a Python package, allowing for modular
 imports. The `__all__` list explicitly declares which class names are part of
 the public interface of this package, making them easily importable by other
 parts of the application.
+
+The classes are imported lazily on first access, so importing a lightweight
+module such as `app.config` does not load LangChain, Pydantic or Tiktoken.
 """
 
-from app.create_document import CreateDocument
-from app.document_splitter import Document_Splitter
-from app.generate_document import Generate
-from app.language_model import Ollama
-from app.language_separator import ABAP
-from app.prompt_generator import PromptGenerator
-from app.structured_output import Code_Analysis, Code_Structure, Technical_Specification
-from typing import List
+from importlib import import_module
+from typing import Any, Dict, List
+
+# Maps every public name to the module defining it.
+_EXPORTS: Dict[str, str] = {
+    "Document_Splitter": "app.document_splitter",
+    "Generate": "app.generate_document",
+    "Ollama": "app.language_model",
+    "ABAP": "app.language_separator",
+    "PromptGenerator": "app.prompt_generator",
+    "Code_Analysis": "app.structured_output",
+    "Code_Structure": "app.structured_output",
+    "Technical_Specification": "app.structured_output",
+    "CreateDocument": "app.create_document",
+}
 
 # Defines the public API of the 'app' package.
-__all__: List[str] = [
-    "Document_Splitter",
-    "Generate",
-    "Ollama",
-    "ABAP",
-    "PromptGenerator",
-    "Code_Analysis",
-    "Code_Structure",
-    "Technical_Specification",
-    "CreateDocument",
-]
+__all__: List[str] = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """Imports a public class from its module on first access."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'app' has no attribute '{name}'")
+    value: Any = getattr(import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """Lists the public API together with the already loaded names."""
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,118 @@
+"""
+Reads ABAP sources directly from abapGit export archives.
+
+This module contains the `ArchiveReader` class, which streams the members of
+`.zip` and `.tar` (optionally gzip, bzip2 or xz compressed) archives into
+memory without extracting them to disk. Members are selected by the file
+extensions of an abapGit repository, the same as for directories, and a
+shell-style pattern matched against their path inside the archive.
+
+Zip archives allow random access, so their members are read and decompressed
+by several threads at once. Tar archives are read sequentially in a single
+streaming pass, which is the only access pattern compressed tar files allow.
+"""
+
+from app.language_separator import ABAP
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path, PurePosixPath
+from tarfile import TarFile
+from tarfile import open as open_tar
+from typing import Iterator, List, Tuple
+from zipfile import ZipFile, ZipInfo
+
+# Suffixes recognized as archives (compared against the lower-cased file name).
+ARCHIVE_SUFFIXES: Tuple[str, ...] = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(file_path: str) -> bool:
+    """Returns True if the path is a file with a supported archive suffix."""
+    return Path(file_path).is_file() and Path(file_path).name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class ArchiveReader:
+    """
+    Streams the source files of an archive as (source, text) pairs.
+
+    The source of a member is the archive path joined with the member path
+    (e.g., "export.zip/src/zcl_demo.clas.abap"), so document names are derived
+    from the member's file name just like for files on disk.
+    """
+
+    def __init__(self, archive_path: str, pattern: str = "*", workers: int = 4) -> None:
+        """
+        Initializes the reader.
+
+        Args:
+            archive_path: The path of the `.zip` or `.tar` archive.
+            pattern: A shell-style pattern matched against the member path;
+                     `*` also matches across directories. Only members with
+                     a source extension (`ABAP.get_source_extensions()`) are read.
+            workers: The number of threads reading zip members concurrently.
+        """
+        self.archive_path = Path(archive_path)
+        self.pattern: str = pattern
+        self.workers: int = max(1, workers)
+        self.suffixes: Tuple[str, ...] = ABAP.get_source_extensions()
+
+    def read(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yields the source and decoded text of every matching member in archive order.
+
+        Raises:
+            ValueError: If the file is not a supported archive.
+        """
+        name: str = self.archive_path.name.lower()
+        if name.endswith(".zip"):
+            yield from self._read_zip()
+        elif name.endswith(ARCHIVE_SUFFIXES):
+            yield from self._read_tar()
+        else:
+            raise ValueError(f"Unsupported archive format: {self.archive_path.name}")
+
+    def _matches(self, member_name: str) -> bool:
+        """Checks a member path against the source extensions and the pattern, skipping hidden paths like `DirectoryLoader`."""
+        member = PurePosixPath(member_name)
+        if any(part.startswith(".") for part in member.parts) or not member.name.lower().endswith(self.suffixes):
+            return False
+        return fnmatch(member_name, self.pattern) or fnmatch(member.name, self.pattern)
+
+    def _source(self, member_name: str) -> str:
+        """Returns the source path reported for a member."""
+        return str(self.archive_path / PurePosixPath(member_name))
+
+    def _read_zip(self) -> Iterator[Tuple[str, str]]:
+        """Reads the matching zip members concurrently, preserving the archive order."""
+        with ZipFile(self.archive_path) as archive:
+            members: List[ZipInfo] = [member for member in archive.infolist() if not member.is_dir() and self._matches(member.filename)]
+
+            def read_member(member: ZipInfo) -> Tuple[str, str]:
+                # ZipFile serializes access to the underlying file; decompression runs in parallel.
+                return self._source(member.filename), decode_source(archive.read(member))
+
+            if self.workers == 1 or len(members) < 2:
+                yield from map(read_member, members)
+                return
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                yield from executor.map(read_member, members)
+
+    def _read_tar(self) -> Iterator[Tuple[str, str]]:
+        """Reads the matching tar members in a single streaming pass."""
+        # "r|*" reads the archive strictly forward, so compressed tar files are never seeked.
+        archive: TarFile = open_tar(self.archive_path, mode="r|*")
+        with archive:
+            for member in archive:
+                if not member.isfile() or not self._matches(member.name):
+                    continue
+                extracted = archive.extractfile(member)
+                if extracted is None:
+                    continue
+                yield self._source(member.name), decode_source(extracted.read())
+
+
+def decode_source(data: bytes) -> str:
+    """Decodes source bytes as UTF-8, falling back to Latin-1 for legacy exports."""
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
@@ -0,0 +1,213 @@
+"""
+Documents several packages in one run.
+
+This module contains the `BatchRunner` class and the loaders of its package
+lists. Instead of one process per package, each reinitializing the model
+connection and the prompt templates and competing blindly for the same GPU,
+a batch run connects to the model once and processes every package with its
+own `Generate` orchestrator on the shared `Ollama` manager, `PromptGenerator`
+and `ResponseCache`. The stage requests of all packages go through one
+`FairRequestPool`, which serves the packages round-robin, so a huge package
+cannot starve the small ones. The run summary breaks the throughput down per
+package.
+
+A manifest is a JSON file listing the packages, either as a list or under a
+"packages" key. Relative paths are resolved against the manifest's directory:
+
+    {"packages": [{"name": "zdmo_agency", "file_path": "src/agency", "output_path": "docs/agency"}]}
+
+Only `file_path` is required; the name defaults to the stem of the path and
+the output path to a directory of that name below the output root.
+"""
+
+from app.fair_pool import FairRequestPool, PackageThroughput
+from app.generate_document import Generate
+from dataclasses import dataclass
+from json import JSONDecodeError, loads
+from pathlib import Path
+from threading import Thread
+from time import monotonic
+from typing import Any, Dict, List
+
+
+@dataclass(frozen=True)
+class Package:
+    """A package of source files and the directory of its report."""
+
+    name: str
+    file_path: str
+    output_path: str
+
+
+@dataclass
+class PackageOutcome:
+    """How the run of a package ended."""
+
+    created: bool | None = None
+    wall_seconds: float = 0.0
+    error: str | None = None
+
+
+def packages_from_roots(roots: List[str], output_root: str) -> List[Package]:
+    """
+    Creates one package per input root, each reported below the output root.
+
+    Args:
+        roots: The source directories, archives or dumps of the packages.
+        output_root: The directory receiving one report directory per package.
+    """
+    return _unique([Package(name=Path(root).stem, file_path=root, output_path="") for root in roots], output_root)
+
+
+def load_manifest(manifest_path: str, output_root: str) -> List[Package]:
+    """
+    Reads the packages of a manifest file.
+
+    Args:
+        manifest_path: The JSON manifest listing the packages.
+        output_root: The directory receiving the reports of packages without an output path.
+
+    Returns:
+        The packages in the order of the manifest.
+
+    Raises:
+        ValueError: If the manifest cannot be read or a package has no file path.
+    """
+    try:
+        data: Any = loads(Path(manifest_path).read_text(encoding="utf-8"))
+    except (OSError, JSONDecodeError) as error:
+        raise ValueError(f"Cannot read the manifest {manifest_path}: {error}") from error
+    entries: Any = data.get("packages") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"The manifest {manifest_path} lists no packages")
+
+    base: Path = Path(manifest_path).resolve().parent
+    packages: List[Package] = []
+    for position, entry in enumerate(entries, start=1):
+        if isinstance(entry, str):
+            entry = {"file_path": entry}
+        if not isinstance(entry, dict) or not entry.get("file_path"):
+            raise ValueError(f"Package {position} of the manifest {manifest_path} has no file_path")
+        file_path: Path = base / entry["file_path"]
+        output_path: str = str(base / entry["output_path"]) if entry.get("output_path") else ""
+        packages.append(Package(name=str(entry.get("name") or file_path.stem), file_path=str(file_path), output_path=output_path))
+    return _unique(packages, output_root)
+
+
+def _unique(packages: List[Package], output_root: str) -> List[Package]:
+    """Makes the package names unique and assigns the default output paths."""
+    names: Dict[str, int] = {}
+    unique: List[Package] = []
+    for package in packages:
+        names[package.name.lower()] = names.get(package.name.lower(), 0) + 1
+        name: str = package.name if names[package.name.lower()] == 1 else f"{package.name}_{names[package.name.lower()]}"
+        unique.append(Package(name=name, file_path=package.file_path, output_path=package.output_path or str(Path(output_root) / name)))
+    return unique
+
+
+class BatchRunner:
+    """
+    Processes several packages concurrently on one warm model.
+
+    Every package runs its pipeline in its own thread, so the specification
+    requests of a small package start as soon as its analysis is done rather
+    than after the analysis of all packages. Loading and splitting still runs
+    one package at a time, since the splitter uses its own worker processes.
+    """
+
+    def __init__(self, app: Generate) -> None:
+        """
+        Initializes the runner.
+
+        Args:
+            app: The orchestrator whose components are shared by the packages.
+        """
+        self.app: Generate = app
+
+    def run(self, packages: List[Package], model_name: str) -> bool:
+        """
+        Generates the reports of all packages.
+
+        Args:
+            packages: The packages to document.
+            model_name: The name of the Ollama model used for all packages.
+
+        Returns:
+            True if the report of every package was written, False otherwise.
+        """
+        print(f"Welcome to the Document Generator! Documenting {len(packages)} packages.")
+        self.app.prompt_generator.clear_documents
+        self.app.llm_manager.request_stats.reset()
+        self.app.llm_manager.throughput.reset()
+
+        print("\n=== Step 1: Initializing Language Model ===")
+        if not self.app.llm_manager.initialize_llm(model_name):
+            print("Failed to initialize the language model. Aborting.")
+            return False
+
+        pool = FairRequestPool(workers=self.app.llm_manager.limiter.max_limit)
+        apps: Dict[str, Generate] = {package.name: self._create_app(package, pool) for package in packages}
+        outcomes: Dict[str, PackageOutcome] = {package.name: PackageOutcome() for package in packages}
+        started: float = monotonic()
+        threads: List[Thread] = [
+            Thread(target=self._process, args=(apps[package.name], package, model_name, outcomes[package.name]), name=f"package-{package.name}", daemon=True)
+            for package in packages
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        pool.close()
+
+        self.app.print_request_summary()
+        self._print_packages(packages, apps, outcomes, pool.throughput, monotonic() - started)
+        return all(outcome.created for outcome in outcomes.values())
+
+    def _create_app(self, package: Package, pool: FairRequestPool) -> Generate:
+        """Creates the orchestrator of a package on the shared components."""
+        return Generate(
+            document_splitter=self.app.document_splitter,
+            prompt_generator=self.app.prompt_generator,
+            llm_manager=self.app.llm_manager,
+            document_creator=self.app.document_creator,
+            response_cache=self.app.response_cache,
+            method_min_tokens=self.app.method_min_tokens,
+            request_pool=pool,
+            package=package.name,
+        )
+
+    @staticmethod
+    def _process(app: Generate, package: Package, model_name: str, outcome: PackageOutcome) -> None:
+        """Runs the pipeline of one package; a failing package does not stop the others."""
+        started: float = monotonic()
+        try:
+            Path(package.output_path).mkdir(parents=True, exist_ok=True)
+            outcome.created = app.process(file_path=package.file_path, output_file_path=package.output_path, model_name=model_name)
+        except Exception as error:
+            outcome.error = str(error)
+            print(f"[ERROR] Package {package.name} failed: {error}")
+        outcome.wall_seconds = monotonic() - started
+
+    @staticmethod
+    def _print_packages(
+        packages: List[Package],
+        apps: Dict[str, Generate],
+        outcomes: Dict[str, PackageOutcome],
+        throughput: Dict[str, PackageThroughput],
+        wall_seconds: float,
+    ) -> None:
+        """Prints the outcome and request throughput of every package."""
+        written: int = sum(bool(outcome.created) for outcome in outcomes.values())
+        print(f"\tPackages: {written} of {len(packages)} written in {wall_seconds:.1f}s")
+        for package in packages:
+            outcome: PackageOutcome = outcomes[package.name]
+            counts: Dict[str, int] = apps[package.name].run_counts
+            served: PackageThroughput = throughput.get(package.name) or PackageThroughput()
+            status: str = "written" if outcome.created else outcome.error or ("report failed" if outcome.created is False else "aborted")
+            rate: float = served.requests / outcome.wall_seconds * 60 if outcome.wall_seconds else 0.0
+            wait: float = served.wait_seconds / served.requests if served.requests else 0.0
+            print(
+                f"\t\t{package.name}: {status}, {counts['documents']} documents, {served.requests} requests ({served.failed} failed, {counts['cache_hits']} from cache), "
+                f"{served.prompt_tokens} prompt tokens, wall {outcome.wall_seconds:.1f}s, request time {served.busy_seconds:.1f}s, "
+                f"mean queue wait {wait:.1f}s, {rate:.1f} requests/min -> {package.output_path}"
+            )
@@ -0,0 +1,95 @@
+"""
+Defines the compact internal representation of source documents and chunks.
+
+Instead of one LangChain `Document` per chunk, each holding a copy of its
+text and a copied metadata dictionary, the splitter produces:
+1. `SourceDocument`: One record per source file, holding the full text and
+   the metadata shared by all of its chunks.
+2. `Chunk`: A slotted record referencing its `SourceDocument` and storing
+   only offsets into the source text and its token count.
+
+Chunks expose `page_content` and `metadata` like a `Document`, computed on
+demand, and are converted to a real `Document` only at the LLM boundary.
+"""
+
+from dataclasses import dataclass, field
+from langchain_core.documents.base import Document
+from typing import Any, Dict, List, Tuple
+
+
+@dataclass(slots=True, eq=False)
+class SourceDocument:
+    """A loaded source file together with the metadata shared by its chunks."""
+
+    name: str
+    source: str
+    document_type: str
+    document_tokens: int
+    text: str
+    # Metadata from the loader (e.g., "source"), shared instead of copied per chunk.
+    base_metadata: Dict[str, Any] = field(default_factory=dict)
+    chunk_count: int = 0
+
+    @property
+    def object_name(self) -> str:
+        """Returns the name of the ABAP object, without the abapGit object type (e.g., "/dmo/cl_demo" for "#dmo#cl_demo.clas")."""
+        return self.name.split(".")[0].replace("#", "/")
+
+
+@dataclass(slots=True, eq=False)
+class Chunk:
+    """A chunk of a `SourceDocument`, stored as offsets into the source text."""
+
+    document: SourceDocument
+    index: int
+    start: int
+    end: int
+    token_count: int
+
+    @property
+    def page_content(self) -> str:
+        """Returns the text of the chunk, sliced from the source text on demand."""
+        return self.document.text[self.start : self.end]
+
+    @property
+    def chunk_id(self) -> str:
+        """Returns the unique id of the chunk (e.g., "zcl_demo_chunk_1")."""
+        return f"{self.document.name}_chunk_{self.index}"
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Builds the full metadata dictionary of the chunk on demand."""
+        metadata: Dict[str, Any] = dict(self.document.base_metadata)
+        metadata.update(
+            {
+                "document_name": self.document.name,
+                "document_type": self.document.document_type,
+                "document_tokens": self.document.document_tokens,
+                "chunk_index": self.index,
+                "chunk_id": self.chunk_id,
+                "chunk_token_count": self.token_count,
+                "is_first_chunk": self.index == 1,
+                "is_last_chunk": self.index == self.document.chunk_count,
+                "is_single_chunk": self.document.chunk_count == 1,
+            }
+        )
+        return metadata
+
+    def to_document(self) -> Document:
+        """Converts the chunk into a LangChain `Document`."""
+        return Document(page_content=self.page_content, metadata=self.metadata)
+
+
+def create_chunks(document: SourceDocument, offsets: List[Tuple[int, int, int]]) -> List[Chunk]:
+    """
+    Creates the chunks of a document from (start, end, token count) offsets.
+
+    Args:
+        document: The source document the chunks belong to.
+        offsets: The position and token count of every chunk in order.
+
+    Returns:
+        The chunks, numbered from 1.
+    """
+    document.chunk_count = len(offsets)
+    return [Chunk(document=document, index=index, start=start, end=end, token_count=token_count) for index, (start, end, token_count) in enumerate(offsets, 1)]
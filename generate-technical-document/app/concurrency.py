@@ -0,0 +1,203 @@
+"""
+Provides an adaptive concurrency limiter for requests to the language model.
+
+The right number of parallel requests depends on the model size, the number
+of offloaded GPU layers, the context length and the load on the host. The
+`AdaptiveLimiter` finds it at runtime with an AIMD (additive increase,
+multiplicative decrease) policy driven by the observed per-request token
+throughput, and records every decision so deployments can be tuned.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from math import floor
+from threading import Condition
+from time import monotonic
+from typing import Any, Iterator, List
+
+
+@dataclass(frozen=True)
+class LimiterDecision:
+    """A single adjustment of the concurrency limit."""
+
+    timestamp: float
+    previous_limit: int
+    new_limit: int
+    throughput: float
+    baseline: float
+    reason: str
+
+
+class RequestSlot:
+    """A handle for one in-flight request, used to report its outcome."""
+
+    def __init__(self) -> None:
+        """Initializes the slot and starts its latency clock."""
+        self.started: float = monotonic()
+        self.output_tokens: int | None = None
+        self.failed: bool = False
+        self.released: bool = False
+
+    def record_response(self, response: Any) -> None:
+        """
+        Extracts the generated token count from a model response.
+
+        Structured output responses (with `include_raw`) are dictionaries that
+        carry the `AIMessage` under "raw"; plain responses are the message itself.
+        """
+        message: Any = response.get("raw") if isinstance(response, dict) else response
+        metadata: Any = getattr(message, "response_metadata", None) or {}
+        eval_count: Any = metadata.get("eval_count")
+        if isinstance(eval_count, int) and eval_count > 0:
+            self.output_tokens = eval_count
+        else:
+            content: Any = getattr(message, "content", "")
+            self.output_tokens = max(1, len(content) // 4) if isinstance(content, str) else None
+
+
+class AdaptiveLimiter:
+    """
+    An AIMD limiter for the number of concurrent model requests.
+
+    After every window of completed requests (one window holds as many
+    requests as the current limit), the mean tokens/sec per request is
+    compared with a baseline. While it stays within the tolerance the limit
+    grows by one; when it drops, or when a request fails, the limit is
+    multiplied by the decrease factor.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 1,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        tolerance: float = 0.2,
+        decrease_factor: float = 0.5,
+        verbose: bool = True,
+    ) -> None:
+        """
+        Initializes the limiter.
+
+        Args:
+            initial_limit: The number of concurrent requests allowed at start.
+            min_limit: The lower bound of the limit.
+            max_limit: The upper bound of the limit.
+            tolerance: The allowed relative drop of per-request throughput
+                       before the limit is decreased.
+            decrease_factor: The factor applied to the limit on back-off.
+            verbose: Whether decisions are printed as they are made.
+        """
+        self.min_limit: int = max(1, min_limit)
+        self.max_limit: int = max(self.min_limit, max_limit)
+        self.limit: int = min(self.max_limit, max(self.min_limit, initial_limit))
+        self.tolerance: float = tolerance
+        self.decrease_factor: float = decrease_factor
+        self.verbose: bool = verbose
+        self.decisions: List[LimiterDecision] = []
+        self.peak_limit: int = self.limit
+        self._in_flight: int = 0
+        self._window: List[float] = []
+        self._window_saturated: bool = False
+        self._baseline: float | None = None
+        self._condition = Condition()
+
+    @property
+    def in_flight(self) -> int:
+        """Returns the number of requests currently holding a slot."""
+        with self._condition:
+            return self._in_flight
+
+    @contextmanager
+    def slot(self) -> Iterator[RequestSlot]:
+        """
+        Blocks until a request may start and yields its slot.
+
+        An exception raised inside the block is recorded as a failure and
+        triggers a multiplicative decrease before it is re-raised.
+        """
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+            if self._in_flight >= self.limit:
+                self._window_saturated = True
+        request_slot = RequestSlot()
+        try:
+            yield request_slot
+        except BaseException:
+            request_slot.failed = True
+            raise
+        finally:
+            self._release(request_slot)
+
+    def abandon(self, request_slot: RequestSlot) -> None:
+        """
+        Frees the slot of a request that is still running but no longer awaited.
+
+        A request whose attempt timed out may hang until the backstop timeout
+        of its HTTP client; its slot is freed at once, so the retry does not
+        wait for it. The request is recorded as failed.
+        """
+        request_slot.failed = True
+        self._release(request_slot)
+
+    def _release(self, request_slot: RequestSlot) -> None:
+        """Frees a slot and adjusts the limit from the request's outcome; a freed slot is not freed again."""
+        latency: float = max(monotonic() - request_slot.started, 1e-6)
+        with self._condition:
+            if request_slot.released:
+                return
+            request_slot.released = True
+            self._in_flight -= 1
+            if request_slot.failed:
+                self._decrease(throughput=0.0, reason="request failed")
+            elif request_slot.output_tokens:
+                self._window.append(request_slot.output_tokens / latency)
+                if len(self._window) >= self.limit:
+                    self._evaluate_window()
+            self._condition.notify_all()
+
+    def _evaluate_window(self) -> None:
+        """Compares the window's mean throughput with the baseline and adjusts the limit."""
+        throughput: float = sum(self._window) / len(self._window)
+        saturated: bool = self._window_saturated
+        self._window.clear()
+        self._window_saturated = False
+
+        if self._baseline is None:
+            self._baseline = throughput
+        if throughput < self._baseline * (1.0 - self.tolerance):
+            self._decrease(throughput=throughput, reason="per-request throughput dropped")
+            return
+
+        # Track slow drift of the stable throughput level.
+        self._baseline = 0.8 * self._baseline + 0.2 * throughput
+        if saturated and self.limit < self.max_limit:
+            self._record(self.limit + 1, throughput, "throughput stable")
+
+    def _decrease(self, throughput: float, reason: str) -> None:
+        """Applies the multiplicative decrease and starts a new window."""
+        self._window.clear()
+        self._window_saturated = False
+        new_limit: int = max(self.min_limit, floor(self.limit * self.decrease_factor))
+        if new_limit != self.limit:
+            self._record(new_limit, throughput, reason)
+
+    def _record(self, new_limit: int, throughput: float, reason: str) -> None:
+        """Stores and optionally prints a limit change."""
+        decision = LimiterDecision(
+            timestamp=monotonic(),
+            previous_limit=self.limit,
+            new_limit=new_limit,
+            throughput=throughput,
+            baseline=self._baseline or 0.0,
+            reason=reason,
+        )
+        self.decisions.append(decision)
+        self.limit = new_limit
+        self.peak_limit = max(self.peak_limit, new_limit)
+        if self.verbose:
+            print(
+                f"\t[INFO] Concurrency limit {decision.previous_limit} -> {decision.new_limit} ({reason}; "
+                f"{decision.throughput:.1f} tok/s per request, baseline {decision.baseline:.1f})"
+            )
@@ -22,10 +22,41 @@ if load_dotenv():
     DEFAULT_INPUT_PATH = str(BASE_DIR / "files" / "backup")
     # Define the default directory for outputting analyzed markdown documents.
     DEFAULT_OUTPUT_PATH = str(BASE_DIR / "files" / "analyzed_documents")
+    # Define the directory holding the sources and reports of server jobs.
+    DEFAULT_JOBS_PATH = str(BASE_DIR / "files" / "jobs")
+    # Define the file holding the model throughput recorded by previous runs.
+    DEFAULT_THROUGHPUT_PATH = str(BASE_DIR / "files" / "throughput.json")
+    # Define the file caching the model results by the hash of their request.
+    DEFAULT_RESPONSE_CACHE_PATH = str(BASE_DIR / "files" / "response_cache.db")
+    # Define the file through which the processes of the host coalesce identical in-flight requests.
+    DEFAULT_SINGLE_FLIGHT_PATH = str(BASE_DIR / "files" / "in_flight.db")
 
     # --- Default Language Model Configuration ---
     # Define the default language model to be used for code analysis.
     DEFAULT_MODEL_NAME: str = getenv("DEFAULT_MODEL_NAME", "MISTRAL")
+
+    # --- Preprocessing Configuration ---
+    # Define the number of worker processes for loading and splitting (1 = in-process).
+    DEFAULT_PREPROCESS_WORKERS: int = int(getenv("PREPROCESS_WORKERS", 1))
+    # Define the pattern selecting the source files inside .zip/.tar archives.
+    DEFAULT_ARCHIVE_PATTERN: str = getenv("ARCHIVE_MEMBER_PATTERN", "*")
+    # Define the file size in MB from which a source file is split into objects as a multi-object dump.
+    DEFAULT_DUMP_THRESHOLD_MB: float = float(getenv("DUMP_THRESHOLD_MB", 16))
+    # Define the class size in tokens from which classes are analyzed method by method (0 = never).
+    DEFAULT_METHOD_ANALYSIS_MIN_TOKENS: int = int(getenv("METHOD_ANALYSIS_MIN_TOKENS", 2000))
+
+    # --- Server Mode Configuration ---
+    # Define the interface and port of the local HTTP job API.
+    DEFAULT_SERVER_HOST: str = getenv("SERVER_HOST", "127.0.0.1")
+    DEFAULT_SERVER_PORT: int = int(getenv("SERVER_PORT", 8765))
+    # Define the directory below which server jobs may read sources by path.
+    DEFAULT_SERVER_SOURCE_ROOT: str = getenv("SERVER_SOURCE_ROOT", str(BASE_DIR / "files"))
+
+    # --- Distributed Queue Configuration ---
+    # Define how long a worker keeps a claimed job without a heartbeat before it is re-queued.
+    DEFAULT_QUEUE_LEASE_SECONDS: float = float(getenv("QUEUE_LEASE_SECONDS", 60))
+    # Define how often the lease of a job may expire before the job is marked as failed.
+    DEFAULT_QUEUE_MAX_ATTEMPTS: int = int(getenv("QUEUE_MAX_ATTEMPTS", 3))
 else:
     # If the .env file is not found or fails to load, an error is raised.
     # This ensures that the application does not run with missing configurations.
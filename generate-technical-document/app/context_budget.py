@@ -0,0 +1,207 @@
+"""
+Builds the bounded input of the technical specification stage.
+
+The specification prompt is assembled from the Markdown analysis and structure
+generated for a document, which can be longer than the code itself for big
+classes. This module contains the `SpecificationContext` class, which fits
+that Markdown into a token budget: repeated lines are dropped first, then the
+sections are kept by priority (interface, core logic, data interaction, ...)
+until the budget is used up, and the section that no longer fits is cut at a
+line boundary.
+"""
+
+from dataclasses import dataclass, field
+from re import compile
+from typing import Callable, Dict, List, Pattern, Set, Tuple
+
+# Matches a Markdown heading line.
+_HEADING: Pattern[str] = compile(r"^\s{0,3}#{1,6}\s+\S")
+# Matches table separator rows such as |---|:---|, which legitimately repeat.
+_TABLE_SEPARATOR: Pattern[str] = compile(r"^[\s|:\-]+$")
+# Keywords of section headings and their priority (lower is kept first). Empty container headings have priority 0.
+_SECTION_PRIORITIES: Tuple[Tuple[str, int], ...] = (
+    ("interface", 1),
+    ("core logic", 2),
+    ("flow", 2),
+    ("data interaction", 3),
+    ("summary", 4),
+    ("structure", 5),
+    ("dependenc", 6),
+    ("quality", 8),
+    ("recommendation", 8),
+    ("improvement", 8),
+)
+# The priority of sections without a known heading.
+_DEFAULT_PRIORITY: int = 7
+# Lines shorter than this (after normalization) are never treated as repeated content.
+_MIN_DUPLICATE_LENGTH: int = 12
+# A section is cut to fit only if at least this many tokens of the budget remain.
+_MIN_PARTIAL_TOKENS: int = 32
+# Appended to a section that was cut to fit the budget.
+_TRIM_MARKER: str = "(... trimmed to fit the context budget)"
+
+
+@dataclass
+class ContextTrim:
+    """Describes how the specification input of one document was reduced."""
+
+    original_tokens: int
+    tokens: int
+    duplicate_lines: int = 0
+    reduced_sections: List[str] = field(default_factory=list)
+
+    @property
+    def trimmed_tokens(self) -> int:
+        """Returns the number of tokens removed from the input."""
+        return max(0, self.original_tokens - self.tokens)
+
+
+@dataclass
+class _Section:
+    """A heading and the lines below it, up to the next heading."""
+
+    index: int
+    title: str
+    lines: List[str]
+    priority: int
+
+
+class SpecificationContext:
+    """
+    Fits the analysis and structure Markdown of a document into a token budget.
+
+    The builder keeps the trims of every document it processed, so the run
+    summary can report how much input was removed.
+    """
+
+    def __init__(self, token_counter: Callable[[str], int], budget: int | None) -> None:
+        """
+        Initializes the builder.
+
+        Args:
+            token_counter: A function that takes a string and returns the
+                           number of tokens.
+            budget: The maximum number of tokens of the input, or None to only
+                    drop repeated content.
+        """
+        self.token_counter: Callable[[str], int] = token_counter
+        self.budget: int | None = None if budget is None else max(0, budget)
+        self.trims: Dict[str, ContextTrim] = {}
+
+    def build(self, document_name: str, text: str) -> str:
+        """
+        Returns the input of a document reduced to the budget and records its trim.
+
+        Args:
+            document_name: The name of the document, used in the report.
+            text: The combined analysis and structure Markdown.
+        """
+        sections: List[_Section] = self._parse(text)
+        duplicate_lines: int = self._drop_duplicates(sections)
+        deduplicated: str = self._join(sections)
+        original_tokens: int = self.token_counter(text)
+        tokens: int = self.token_counter(deduplicated) if duplicate_lines else original_tokens
+
+        reduced: List[str] = []
+        if self.budget is not None and tokens > self.budget:
+            reduced = self._fit(sections)
+            deduplicated = self._join(sections)
+            tokens = self.token_counter(deduplicated)
+
+        self.trims[document_name] = ContextTrim(original_tokens=original_tokens, tokens=tokens, duplicate_lines=duplicate_lines, reduced_sections=reduced)
+        return deduplicated
+
+    def largest_trims(self, count: int = 5) -> List[Tuple[str, ContextTrim]]:
+        """Returns the documents with the most trimmed tokens, largest first."""
+        trimmed: List[Tuple[str, ContextTrim]] = [(name, trim) for name, trim in self.trims.items() if trim.trimmed_tokens > 0]
+        return sorted(trimmed, key=lambda item: item[1].trimmed_tokens, reverse=True)[:count]
+
+    def summary(self) -> Tuple[int, int, int, int]:
+        """Returns the trimmed documents, trimmed tokens, original tokens and removed duplicate lines."""
+        trims: List[ContextTrim] = list(self.trims.values())
+        return (
+            sum(trim.trimmed_tokens > 0 for trim in trims),
+            sum(trim.trimmed_tokens for trim in trims),
+            sum(trim.original_tokens for trim in trims),
+            sum(trim.duplicate_lines for trim in trims),
+        )
+
+    @staticmethod
+    def _parse(text: str) -> List[_Section]:
+        """Splits Markdown into sections at its headings and assigns their priorities."""
+        sections: List[_Section] = [_Section(index=0, title="", lines=[], priority=_DEFAULT_PRIORITY)]
+        for line in text.splitlines():
+            if _HEADING.match(line):
+                sections.append(_Section(index=len(sections), title=line, lines=[line], priority=_DEFAULT_PRIORITY))
+            else:
+                sections[-1].lines.append(line)
+
+        for section in sections:
+            if not any(line.strip() for line in section.lines[1 if section.title else 0 :]):
+                section.priority = 0
+                continue
+            title: str = section.title.lower()
+            section.priority = next((priority for keyword, priority in _SECTION_PRIORITIES if keyword in title), _DEFAULT_PRIORITY)
+        return [section for section in sections if section.lines]
+
+    @staticmethod
+    def _drop_duplicates(sections: List[_Section]) -> int:
+        """Removes lines already present in a section of higher priority and returns their count."""
+        seen: Set[str] = set()
+        dropped: int = 0
+        for section in sorted(sections, key=lambda section: (section.priority, section.index)):
+            kept: List[str] = []
+            for position, line in enumerate(section.lines):
+                key: str = " ".join(line.lower().split())
+                if position == 0 and section.title:
+                    kept.append(line)
+                elif len(key) < _MIN_DUPLICATE_LENGTH or _TABLE_SEPARATOR.match(key):
+                    kept.append(line)
+                elif key in seen:
+                    dropped += 1
+                else:
+                    seen.add(key)
+                    kept.append(line)
+            section.lines = kept
+        return dropped
+
+    def _fit(self, sections: List[_Section]) -> List[str]:
+        """
+        Keeps whole sections by priority while they fit the budget and cuts the first one that does not.
+
+        Returns:
+            The titles of the sections that were cut or dropped.
+        """
+        remaining: int = self.budget or 0
+        dropped: List[str] = []
+        exhausted: bool = False
+        for section in sorted(sections, key=lambda section: (section.priority, section.index)):
+            title: str = section.title.strip("# ").strip("*: ") or "(preamble)"
+            if exhausted:
+                section.lines = []
+                dropped.append(title)
+                continue
+            line_tokens: List[int] = [self.token_counter(line + "\n") for line in section.lines]
+            if sum(line_tokens) <= remaining:
+                remaining -= sum(line_tokens)
+                continue
+
+            exhausted = True
+            dropped.append(title)
+            marker_tokens: int = self.token_counter(_TRIM_MARKER + "\n")
+            # The cut section keeps at least its first line besides the marker, or is dropped.
+            if remaining < max(_MIN_PARTIAL_TOKENS, marker_tokens + line_tokens[0]):
+                section.lines = []
+                continue
+            remaining -= marker_tokens
+            kept: int = 0
+            while kept < len(section.lines) and line_tokens[kept] <= remaining:
+                remaining -= line_tokens[kept]
+                kept += 1
+            section.lines = section.lines[:kept] + [_TRIM_MARKER]
+        return dropped
+
+    @staticmethod
+    def _join(sections: List[_Section]) -> str:
+        """Reassembles the sections in their original order."""
+        return "\n".join(line for section in sorted(sections, key=lambda section: section.index) for line in section.lines)
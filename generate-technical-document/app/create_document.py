@@ -3,12 +3,27 @@ Handles the creation of the final Markdown analysis report.
 
 This module contains the `CreateDocument` class, which is responsible for
 aggregating the analysis results from various code documents into a single,
-well-formatted Markdown file.
+well-formatted Markdown file, and for keeping the searchable SQLite index of
+the same results up to date. The same results can also be exported as a
+standalone HTML page and as JSON.
 """
 
+from app.results_store import StoredDocument, serialize_result
+from app.search_index import INDEX_FILENAME, SearchIndex
+from html import escape
+from json import dump
 from langchain_core.documents.base import Document
 from os import path
-from typing import Dict, List
+from re import compile, Pattern
+from sqlite3 import Error
+from typing import Dict, Iterable, List
+
+# Inline Markdown converted by the HTML export: code spans first, so their content is not emphasized.
+_INLINE_CODE: Pattern = compile(r"`([^`]+)`")
+_BOLD: Pattern = compile(r"\*\*(.+?)\*\*")
+_HEADING: Pattern = compile(r"^\s*(#{1,6})\s+(.*)$")
+_LIST_ITEM: Pattern = compile(r"^\s*(?:[-*+]|\d+\.)\s+(.*)$")
+_TABLE_SEPARATOR: Pattern = compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
 
 
 class CreateDocument:
@@ -84,3 +99,177 @@ class CreateDocument:
             # Handle potential file writing errors.
             print(f"Error writing to file {output_path}: {error}")
             return False
+
+    def create_index(
+        self,
+        documents: Dict[str, Dict[str, List[Document]]],
+        output_filename: str,
+        changed: Iterable[str] | None = None,
+    ) -> bool:
+        """
+        Synchronizes the SQLite full-text index with the analysis results.
+
+        Only objects whose content changed since the last run are rewritten,
+        and objects missing from `documents` are removed from the index.
+
+        Args:
+            documents: A dictionary where keys are document names and values
+                       hold the formatted analysis, structure and specification.
+            output_filename: The directory path where the index is stored.
+            changed: The names of the regenerated objects, if known. Other
+                     objects are then not compared at all.
+
+        Returns:
+            True if the index was updated successfully, False otherwise.
+        """
+        index_path: str = path.join(output_filename, INDEX_FILENAME)
+        try:
+            written, unchanged, removed = SearchIndex(index_path).synchronize(documents, names=changed)
+        except (Error, OSError) as error:
+            print(f"Error writing search index {index_path}: {error}")
+            return False
+        print(f"Successfully updated search index: {index_path} ({written} written, {unchanged} unchanged, {removed} removed)")
+        return True
+
+    def create_html(
+        self,
+        documents: Dict[str, Dict[str, List[Document]]],
+        output_filename: str,
+    ) -> bool:
+        """
+        Writes the report as a standalone HTML page.
+
+        The sections are the same as in the Markdown report; their Markdown is
+        converted by a small built-in converter covering the constructs the
+        prompts ask for (headings, tables, lists, code blocks and emphasis).
+
+        Args:
+            documents: A dictionary where keys are document names and values
+                       hold the formatted analysis, structure and specification.
+            output_filename: The directory path where `code_structure.html` is saved.
+
+        Returns:
+            True if the file was written successfully, False otherwise.
+        """
+        body: List[str] = []
+        for document_name, document_data in documents.items():
+            body.append(f"<section><h1>Code Analysis Report: <code>{escape(document_name.upper())}</code></h1>")
+            for stage in ("analysis", "structure", "specification"):
+                stage_document: List[Document] | None = document_data.get(stage)
+                if stage_document:
+                    body.append(_markdown_to_html(stage_document[0].page_content))
+            body.append("</section><hr>")
+
+        output_path: str = path.join(output_filename, "code_structure.html")
+        try:
+            with open(file=output_path, mode="w", encoding="utf-8") as file:
+                file.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Code Analysis Report</title></head><body>\n')
+                file.write("\n".join(body))
+                file.write("\n</body></html>\n")
+            print(f"Successfully created HTML file: {output_path}")
+            return True
+        except IOError as error:
+            print(f"Error writing to file {output_path}: {error}")
+            return False
+
+    def create_json(
+        self,
+        documents: Dict[str, StoredDocument],
+        output_filename: str,
+    ) -> bool:
+        """
+        Writes the raw results of every document as a single JSON file.
+
+        Unlike the Markdown and HTML reports, the structured fields of the
+        results (e.g., summary and analysis) are kept separate.
+
+        Args:
+            documents: The stored documents by name.
+            output_filename: The directory path where `code_structure.json` is saved.
+
+        Returns:
+            True if the file was written successfully, False otherwise.
+        """
+        content: List[Dict] = [
+            {
+                "name": document.name,
+                "metadata": document.metadata,
+                "results": {stage: serialize_result(result) for stage, result in document.results.items()},
+                "stale": document.stale,
+            }
+            for document in documents.values()
+        ]
+        output_path: str = path.join(output_filename, "code_structure.json")
+        try:
+            with open(file=output_path, mode="w", encoding="utf-8") as file:
+                dump(content, file, ensure_ascii=False, indent=2, default=str)
+            print(f"Successfully created JSON file: {output_path}")
+            return True
+        except IOError as error:
+            print(f"Error writing to file {output_path}: {error}")
+            return False
+
+
+def _inline_html(text: str) -> str:
+    """Escapes a line and converts its code spans and bold text."""
+    parts: List[str] = _INLINE_CODE.split(text)
+    # Odd parts are the content of code spans.
+    return "".join(f"<code>{escape(part)}</code>" if index % 2 else _BOLD.sub(r"<strong>\1</strong>", escape(part)) for index, part in enumerate(parts))
+
+
+def _table_cells(line: str) -> List[str]:
+    """Splits a Markdown table row into its cells."""
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _markdown_to_html(markdown: str) -> str:
+    """Converts the Markdown of a report section to HTML."""
+    html: List[str] = []
+    paragraph: List[str] = []
+    lines: List[str] = markdown.splitlines()
+
+    def close_paragraph() -> None:
+        if paragraph:
+            html.append(f"<p>{' '.join(_inline_html(line) for line in paragraph)}</p>")
+            paragraph.clear()
+
+    index: int = 0
+    while index < len(lines):
+        line: str = lines[index]
+        stripped: str = line.strip()
+        if stripped.startswith("```"):
+            close_paragraph()
+            code: List[str] = []
+            index += 1
+            while index < len(lines) and not lines[index].strip().startswith("```"):
+                code.append(lines[index])
+                index += 1
+            html.append(f"<pre><code>{escape(chr(10).join(code))}</code></pre>")
+        elif heading := _HEADING.match(line):
+            close_paragraph()
+            level: int = len(heading.group(1))
+            html.append(f"<h{level}>{_inline_html(heading.group(2))}</h{level}>")
+        elif stripped.startswith("|") and index + 1 < len(lines) and _TABLE_SEPARATOR.match(lines[index + 1]):
+            close_paragraph()
+            rows: List[str] = ["<tr>" + "".join(f"<th>{_inline_html(cell)}</th>" for cell in _table_cells(line)) + "</tr>"]
+            index += 2
+            while index < len(lines) and lines[index].strip().startswith("|"):
+                rows.append("<tr>" + "".join(f"<td>{_inline_html(cell)}</td>" for cell in _table_cells(lines[index])) + "</tr>")
+                index += 1
+            html.append(f"<table>{''.join(rows)}</table>")
+            continue
+        elif _LIST_ITEM.match(line):
+            close_paragraph()
+            items: List[str] = []
+            while index < len(lines) and (item := _LIST_ITEM.match(lines[index])):
+                items.append(f"<li>{_inline_html(item.group(1))}</li>")
+                index += 1
+            html.append(f"<ul>{''.join(items)}</ul>")
+            continue
+        elif not stripped or stripped == "---":
+            close_paragraph()
+        else:
+            paragraph.append(stripped)
+        index += 1
+    close_paragraph()
+    return "\n".join(html)
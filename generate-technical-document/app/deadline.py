@@ -0,0 +1,242 @@
+"""
+Keeps a run within a fixed time window.
+
+This module contains the `DeadlineController` class and its helpers. With a
+deadline, the objects of a run are ranked by importance and their requests
+start in that order: objects changed since the last run first, then RAP root
+entities, then the objects referenced by most other objects (dependency
+fan-in). While the requests run, the controller compares the estimated
+remaining work with the time left and, as the deadline approaches, switches
+the requests that have not started yet to cheaper modes:
+
+1. `no specification`: the specification stage is skipped.
+2. `brief output`: the model is asked for short answers with a capped output.
+3. `fallback model`: the smaller model of `OLLAMA_DEADLINE_MODEL` takes over.
+
+Once the deadline has passed, no further request is started. Sections that
+were not generated are marked as stale in the report, showing the result of
+the previous run where there is one.
+"""
+
+from app.chunk_model import Chunk
+from app.scheduler import StageTask
+from collections import Counter
+from datetime import datetime, timedelta
+from re import IGNORECASE, Pattern, compile, fullmatch
+from threading import Lock
+from time import monotonic, time
+from typing import Dict, List, Set, Tuple
+
+# The modes of a run, from the full pipeline to the cheapest one.
+DEGRADATION_LEVELS: Tuple[str, ...] = ("full", "no specification", "brief output", "fallback model")
+# The output tokens requested per stage in the brief output mode.
+BRIEF_OUTPUT_TOKENS: Dict[str, int] = {"analysis": 400, "structure": 300, "method": 150, "specification": 800}
+# A CDS entity at the root of a RAP business object.
+_ROOT_ENTITY: Pattern = compile(r"\bdefine\s+root\s+(?:view\s+)?entity\b", IGNORECASE)
+_IDENTIFIER: Pattern = compile(r"[\w/]+")
+
+
+def parse_deadline(value: str, now: datetime | None = None) -> float:
+    """
+    Converts a deadline into a Unix timestamp.
+
+    Args:
+        value: A clock time (e.g., "05:30", the next occurrence is used) or a
+               duration from now in hours, minutes and seconds (e.g., "2h",
+               "1h30m", "45m", "90s"); a bare number is read as minutes.
+        now: The current time, for testing; defaults to the local time.
+
+    Raises:
+        ValueError: If the value is neither a clock time nor a duration.
+    """
+    now = now or datetime.now()
+    text: str = value.strip().lower()
+    if clock := fullmatch(r"(\d{1,2}):(\d{2})", text):
+        hour, minute = int(clock.group(1)), int(clock.group(2))
+        if hour > 23 or minute > 59:
+            raise ValueError(f"Invalid deadline time '{value}'.")
+        target: datetime = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return target.timestamp()
+    if fullmatch(r"\d+(?:\.\d+)?", text):
+        return now.timestamp() + float(text) * 60
+    duration = fullmatch(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s)?", text)
+    if not text or duration is None:
+        raise ValueError(f"Invalid deadline '{value}'. Use a time such as 05:30 or a duration such as 2h, 1h30m or 45m.")
+    hours, minutes, seconds = (float(part or 0) for part in duration.groups())
+    return now.timestamp() + hours * 3600 + minutes * 60 + seconds
+
+
+def rank_documents(documents: Dict[str, List[Chunk]], previous_run: float | None = None, previous_documents: Set[str] | None = None) -> Dict[str, int]:
+    """
+    Ranks the documents of a run by importance, starting at 0.
+
+    A document is changed if it has no result from the previous run or its
+    source file was modified after that run. Changed documents come first,
+    then RAP root entities, then documents by the number of other documents
+    whose source mentions their name.
+
+    Args:
+        documents: The chunks from the `Document_Splitter`.
+        previous_run: The time the results of the previous run were written, if any.
+        previous_documents: The documents with a result from the previous run.
+
+    Returns:
+        The rank of each document.
+    """
+    from os import stat
+
+    previous_documents = previous_documents or set()
+    fan_in: Counter[str] = Counter()
+    for document_name, chunks in documents.items():
+        if chunks:
+            # Every document counts once per referenced name, however often it mentions it.
+            fan_in.update({identifier.lower() for identifier in _IDENTIFIER.findall(chunks[0].document.text)} - {document_name.lower()})
+
+    def changed(document_name: str, chunks: List[Chunk]) -> bool:
+        if previous_run is None or document_name not in previous_documents:
+            return True
+        try:
+            return stat(chunks[0].document.source).st_mtime > previous_run
+        except (OSError, IndexError):
+            # Sources from archives and dumps have no file of their own.
+            return True
+
+    keys: Dict[str, Tuple[bool, bool, int, str]] = {
+        document_name: (
+            not changed(document_name, chunks),
+            not (chunks and _ROOT_ENTITY.search(chunks[0].document.text)),
+            -fan_in[document_name.lower()],
+            document_name,
+        )
+        for document_name, chunks in documents.items()
+    }
+    return {document_name: rank for rank, document_name in enumerate(sorted(keys, key=keys.__getitem__))}
+
+
+class DeadlineController:
+    """
+    Decides per request whether and in which mode it runs before the deadline.
+
+    The remaining work is the estimated duration of the requests that have
+    not started, plus the specification phase while the analysis is still
+    running. It is scaled by the ratio of the elapsed time to the estimated
+    duration of the requests finished so far, which calibrates the estimates
+    to the actual throughput and concurrency, so pessimistic configured rates
+    do not degrade a run that is on time. The mode only ever becomes cheaper
+    within a run.
+    """
+
+    def __init__(self, deadline: float, fallback_model: str | None = None) -> None:
+        """
+        Initializes the controller.
+
+        Args:
+            deadline: The Unix timestamp by which the run should finish.
+            fallback_model: The key of the model used in the last mode, or None to stop at brief output.
+        """
+        self.deadline: float = deadline
+        self.fallback_model: str | None = fallback_model
+        self.level: int = 0
+        self.skipped: int = 0
+        self._decode_rate: float = 1.0
+        self._costs: Dict[int, Tuple[float, float]] = {}
+        self._outstanding: List[float] = [0.0, 0.0]
+        self._later: float = 0.0
+        self._finished: int = 0
+        self._finished_estimate: float = 0.0
+        self._started: float | None = None
+        self._degraded: Set[int] = set()
+        self._lock = Lock()
+
+    @property
+    def remaining(self) -> float:
+        """Seconds until the deadline; negative once it has passed."""
+        return self.deadline - time()
+
+    @property
+    def mode(self) -> str:
+        """The name of the current mode."""
+        return DEGRADATION_LEVELS[self.level]
+
+    def begin_phase(self, tasks: List[StageTask], decode_rate: float, later_seconds: float = 0.0) -> None:
+        """
+        Registers the requests of a processing phase before they are started.
+
+        Args:
+            tasks: The requests of the phase that are sent to the model.
+            decode_rate: The output tokens per second the estimates are based on.
+            later_seconds: The estimated duration of the requests of later phases (the specifications).
+        """
+        with self._lock:
+            self._decode_rate = max(decode_rate, 1e-6)
+            self._costs = {id(task): (task.estimated_seconds, self._brief_seconds(task)) for task in tasks}
+            self._outstanding = [sum(full for full, _ in self._costs.values()), sum(brief for _, brief in self._costs.values())]
+            self._later = later_seconds
+            self._degraded = set()
+
+    def admit(self, task: StageTask, workers: int) -> int | None:
+        """
+        Decides whether a request starts and in which mode.
+
+        Args:
+            task: The request about to start.
+            workers: The number of requests currently allowed in flight.
+
+        Returns:
+            The index of the mode in `DEGRADATION_LEVELS` for the request, or
+            None if the request is skipped because the deadline has passed or
+            its stage is dropped in the current mode.
+        """
+        with self._lock:
+            if self._started is None:
+                self._started = monotonic()
+            full, brief = self._costs.pop(id(task), (task.estimated_seconds, task.estimated_seconds))
+            self._outstanding[0] -= full
+            self._outstanding[1] -= brief
+            remaining: float = self.remaining
+            if remaining <= 0:
+                if self.skipped == 0:
+                    print("\t[WARNING] Deadline reached; the remaining requests are skipped and their sections marked as stale")
+                self.skipped += 1
+                return None
+            self._escalate(remaining, max(1, workers))
+            if task.stage == "specification" and self.level >= 1:
+                self.skipped += 1
+                return None
+            if self.level >= 2:
+                self._degraded.add(id(task))
+            return self.level
+
+    def finish(self, task: StageTask) -> None:
+        """Records a finished request for the calibration of the estimates."""
+        with self._lock:
+            self._finished += 1
+            self._finished_estimate += task.estimated_seconds
+
+    def degraded(self, task: StageTask) -> bool:
+        """Returns whether a request ran in a mode whose result must not be cached."""
+        return id(task) in self._degraded
+
+    def _brief_seconds(self, task: StageTask) -> float:
+        """Estimates a request in the brief output mode."""
+        saved_tokens: int = max(0, task.output_tokens - BRIEF_OUTPUT_TOKENS.get(task.stage, task.output_tokens))
+        return task.estimated_seconds - saved_tokens / self._decode_rate
+
+    def _escalate(self, remaining: float, workers: int) -> None:
+        """Switches to the cheapest mode needed to finish before the deadline."""
+        # Until the first requests finish, there is nothing to calibrate the estimates with.
+        if self._finished < workers or self._started is None:
+            return
+        # The concurrency affects the elapsed time and the remaining work alike, so it cancels out.
+        scale: float = (monotonic() - self._started) / max(self._finished_estimate, 1e-6)
+        required: List[float] = [
+            (self._outstanding[0] + self._later) * scale,
+            self._outstanding[0] * scale,
+            self._outstanding[1] * scale,
+        ]
+        level: int = next((index for index, seconds in enumerate(required) if seconds <= remaining), 3 if self.fallback_model else 2)
+        if level > self.level:
+            self.level = level
+            print(f"\t[WARNING] Deadline in {remaining / 60:.1f} min, estimated remaining work {required[level - 1] / 60:.1f} min: switching to {self.mode} mode")
@@ -2,18 +2,156 @@
 Handles loading, analyzing, and splitting of ABAP source code files.
 
 This module contains the `Document_Splitter` class, which is responsible for:
-1. Loading `.abap` files from a directory.
-2. Guessing the ABAP object type (e.g., Class, Report, Table) based on keywords.
+1. Loading the source files of a directory, including the abapGit file set
+   (`.clas.abap`, `.ddls.asddls`, `.bdef.asbdef`, `.tabl.xml`, ...).
+2. Determining the ABAP object type (e.g., Class, Report, Table) from the
+   abapGit file name, or by keywords for plain `.abap` files.
 3. Splitting the document content into manageable chunks.
-4. Enriching each chunk with relevant metadata.
+4. Representing each chunk as a compact `Chunk` record with its metadata.
+
+abapGit describes most objects in an XML file next to their sources (e.g.,
+`zcl_demo.clas.xml`). These files are not loaded as documents; their path and
+the object description are attached to the metadata of the object's sources.
+Only objects stored as XML alone, such as tables, are loaded from their XML.
+The includes of a class (`.clas.locals_imp.abap`, `.clas.testclasses.abap`,
+...) are appended to the source of the class, which is documented as one
+object.
+
+For very large corpora, the preprocessing can optionally be spread across
+worker processes, which return compact records (source text plus chunk
+offsets) instead of pickled LangChain `Document` objects.
+
+Besides directories, the splitter accepts abapGit export archives (`.zip`,
+`.tar`, `.tar.gz`), whose members are streamed into the pipeline without
+being extracted to disk, and large multi-object source dumps, which are
+split into one document per object by the `DumpScanner`.
 """
 
+from app.archive_reader import ArchiveReader, is_archive
+from app.chunk_model import Chunk, SourceDocument, create_chunks
+from app.dump_scanner import DumpScanner
 from app.language_separator import ABAP
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+from app.profiler import profiled_stage
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from itertools import repeat
 from langchain_core.documents.base import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pathlib import Path
-from typing import Any, Callable, Dict, List
+from math import ceil
+from os import walk
+from os.path import basename
+from pathlib import Path, PurePath
+from re import MULTILINE, Pattern, compile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+# The abapGit object types and the patterns refining their document type, compiled once per process.
+_FILE_TYPES: Dict[str, str] = ABAP.get_file_types()
+_FILE_TYPE_REFINEMENTS: Dict[str, List[Tuple[Pattern, str]]] = {
+    file_type: [(compile(pattern, MULTILINE), document_type) for pattern, document_type in patterns]
+    for file_type, patterns in ABAP.get_file_type_refinements().items()
+}
+_XML_FILE_TYPES: Tuple[str, ...] = ABAP.get_xml_file_types()
+_SOURCE_EXTENSIONS: Tuple[str, ...] = ABAP.get_source_extensions()
+# Characters at the start of a source searched by the refinement patterns.
+_REFINEMENT_WINDOW: int = 4096
+# The short text of an object in its abapGit XML description.
+_DESCRIPTION: Pattern = compile(r"<(?:DESCRIPT|DDTEXT|CTEXT)>([^<]*)</")
+# The abapGit object type whose includes (e.g., "zcl_demo.clas.locals_imp.abap") belong to the source of the object.
+_INCLUDE_FILE_TYPE: str = "clas"
+
+
+class _DocumentRecord(NamedTuple):
+    """A compact, cheaply pickled result of preprocessing one source file in a worker."""
+
+    source: str
+    document_type: str
+    document_tokens: int
+    text: str
+    # (start offset, end offset, token count) of every chunk within `text`.
+    chunks: List[Tuple[int, int, int]]
+
+
+def _preprocess_batch(files: List[Tuple[str, List[str]]], chunk_size: int, token_counter: Callable[[str], int]) -> List[_DocumentRecord]:
+    """
+    Loads, classifies, counts and splits a batch of files and their includes inside a worker process.
+
+    Unreadable files are skipped, as `DirectoryLoader` does with `silent_errors`.
+    """
+    sources: List[Tuple[str, str]] = []
+    for file_path, includes in files:
+        try:
+            sources.append((file_path, _join_includes(_read_file(file_path), [(include, _read_file(include)) for include in includes])))
+        except Exception:
+            continue
+    return _preprocess_sources(sources, chunk_size, token_counter)
+
+
+def _read_file(file_path: str) -> str:
+    """Reads a source file with `TextLoader`, detecting the encoding of files that are not UTF-8."""
+    from langchain_community.document_loaders import TextLoader
+
+    return "".join(document.page_content for document in TextLoader(file_path=file_path, encoding="utf-8", autodetect_encoding=True).load())
+
+
+def _join_includes(text: str, includes: List[Tuple[str, str]]) -> str:
+    """Appends the (path, text) includes of a class to its source, each after a comment naming the include."""
+    return "\n\n".join([text, *(f"* Include {basename(path)}\n{include}" for path, include in includes)])
+
+
+def _split_file_name(source: str) -> Tuple[str, str | None, List[str]]:
+    """
+    Splits a file name into the object name, its abapGit object type and the remaining parts.
+
+    For example, "zcl_demo.clas.locals_imp.abap" gives ("zcl_demo", "clas",
+    ["locals_imp", "abap"]); names without a known object type give None.
+    """
+    parts: List[str] = basename(source).lower().split(".")
+    if len(parts) >= 3 and parts[1] in _FILE_TYPES:
+        return parts[0], parts[1], parts[2:]
+    return parts[0], None, parts[1:]
+
+
+def _file_document_type(source: str, text: str) -> str | None:
+    """Returns the document type given by an abapGit file name, or None for plain sources."""
+    _, file_type, _ = _split_file_name(source)
+    if file_type is None:
+        return None
+    refinements: List[Tuple[Pattern, str]] = _FILE_TYPE_REFINEMENTS.get(file_type, [])
+    # Lowercasing the start once is much cheaper than case-insensitive patterns.
+    start: str = text[:_REFINEMENT_WINDOW].lower() if refinements else ""
+    for pattern, document_type in refinements:
+        if pattern.search(start):
+            return document_type
+    return _FILE_TYPES[file_type]
+
+
+def _object_file(path: str, file_type: str, extension: str) -> str:
+    """Returns the path of another file of the same abapGit object (e.g., "xml" for its description)."""
+    return str(PurePath(path).with_name(f"{PurePath(path).name.split('.')[0]}.{file_type}.{extension}"))
+
+
+def _read_description(xml_path: str, text: str | None = None) -> Dict[str, Any]:
+    """Reads the metadata attached from the abapGit XML file of an object, from disk unless its text is given."""
+    metadata: Dict[str, Any] = {"metadata_file": xml_path}
+    try:
+        description = _DESCRIPTION.search(text if text is not None else Path(xml_path).read_text(encoding="utf-8", errors="replace"))
+    except OSError:
+        return metadata
+    if description:
+        metadata["description"] = description.group(1).strip()
+    return metadata
+
+
+def _preprocess_sources(sources: List[Tuple[str, str]], chunk_size: int, token_counter: Callable[[str], int]) -> List[_DocumentRecord]:
+    """Classifies, counts and splits a batch of already loaded (source, text) pairs inside a worker process."""
+    splitter = Document_Splitter()
+    records: List[_DocumentRecord] = []
+    for source, text in sources:
+        document = Document(page_content=text, metadata={"source": source})
+        document_type: str = splitter._infer_document_type(source, text)
+        document_tokens: int = token_counter(text)
+        offsets: List[Tuple[int, int, int]] = splitter._split_offsets(document=document, chunk_size=min(document_tokens, chunk_size), token_counter=token_counter)
+        records.append(_DocumentRecord(source, document_type, document_tokens, text, offsets))
+    return records
 
 
 class Document_Splitter:
@@ -25,18 +163,35 @@ class Document_Splitter:
     takes a file path and returns structured, chunked documents.
     """
 
-    def __init__(self) -> None:
+    # Upper bound for the number of files sent to a worker process at once.
+    _MAX_BATCH_SIZE: int = 256
+    # Number of archive members or dump objects sent to a worker process at once while still reading.
+    _STREAM_BATCH_SIZE: int = 64
+
+    def __init__(self, workers: int = 1, archive_pattern: str = "*", dump_threshold: int = 16 * 2**20) -> None:
         """
         Initializes the Document_Splitter instance.
+
+        Args:
+            workers: The number of worker processes used for preprocessing.
+                     The default of 1 processes everything in-process.
+            archive_pattern: The shell-style pattern selecting the members of
+                             an archive that are loaded.
+            dump_threshold: The file size in bytes from which a source file is
+                            treated as a multi-object dump and split per object.
         """
         self._document_directory: List[Document] = []
+        self.workers: int = max(1, workers)
+        self.archive_pattern: str = archive_pattern
+        self.dump_threshold: int = dump_threshold
 
     def split_documents(
         self,
         file_path: str,
         chunk_size: int,
         token_counter: Callable[[str], int],
-    ) -> Dict[str, List[Document]]:
+        file_names: List[str] | None = None,
+    ) -> Dict[str, List[Chunk]]:
         """
         Loads, analyzes, and splits all documents in the given path.
 
@@ -44,60 +199,297 @@ class Document_Splitter:
         process. It returns a dictionary of processed documents.
 
         Args:
-            file_path: The path to the directory containing ABAP source files.
+            file_path: The path to the directory containing ABAP source files,
+                       to a `.zip`/`.tar` archive of them, or to a single
+                       multi-object source dump.
             chunk_size: The maximum size of each chunk, typically based on the
                         LLM's token limit.
             token_counter: A function that takes a string and returns the
                            number of tokens.
+            file_names: Optional paths of individual files to load instead of
+                        the whole directory, e.g. the files changed in watch mode.
 
         Returns:
             A dictionary where keys are document names and values are lists of
-            split and context-enriched `Document` chunks. Returns an empty
-            dictionary if loading fails.
+            `Chunk` records referencing their shared `SourceDocument`. Returns
+            an empty dictionary if loading fails.
         """
-        documents: Dict[str, List[Document]] = {}
-        if self._load_documents(file_path=file_path):
+        # With worker processes, loading and splitting are interleaved and profiled as one stage.
+        if self.workers > 1 and file_names is None and is_archive(file_path):
+            metadata: Dict[str, Dict[str, Any]] = {}
+            with profiled_stage("splitting"):
+                return self._split_stream_parallel(
+                    file_path=file_path, sources=self._read_archive(file_path, metadata, self.workers), chunk_size=chunk_size, token_counter=token_counter, metadata=metadata
+                )
+        if self.workers > 1 and file_names is None and Path(file_path).is_file():
+            with profiled_stage("splitting"):
+                return self._split_stream_parallel(file_path=file_path, sources=DumpScanner(file_path).read(), chunk_size=chunk_size, token_counter=token_counter)
+        if self.workers > 1 and file_names is None:
+            with profiled_stage("splitting"):
+                return self._split_documents_parallel(file_path=file_path, chunk_size=chunk_size, token_counter=token_counter)
+
+        documents: Dict[str, List[Chunk]] = {}
+        with profiled_stage("loading"):
+            loaded: bool = self._load_documents(file_path=file_path, file_names=file_names)
+        if not loaded:
+            print("No documents loaded to split.")
+            return {}
+        with profiled_stage("splitting"):
             for document_index, document in enumerate(self._document_directory, 1):
                 file_stem: str = Path(document.metadata.get("source", "unknown")).stem.lower()
                 print(f"Processing document no-{document_index}: {file_stem}")
 
-                document_type: str = self._analyze_document_type(document.page_content)
+                document_type: str = self._infer_document_type(document.metadata.get("source", "unknown"), document.page_content)
                 print(f"\tDocument Type: {document_type}")
                 document_tokens: int = token_counter(document.page_content)
                 print(f"\tDocument Token Count: {document_tokens} tokens")
                 print(f"\t{'*' * 50}")
 
-                split_document: List[Document] = self._create_splitter(
+                offsets: List[Tuple[int, int, int]] = self._split_offsets(
                     document=document,
                     chunk_size=min(document_tokens, chunk_size),
+                    token_counter=token_counter,
                 )
-
-                documents[file_stem] = self._generate_metadata_for_document(
-                    document_metadata=document.metadata.copy(),
-                    document_chunks=split_document,
+                source_document = SourceDocument(
+                    name=file_stem,
+                    source=document.metadata.get("source", "unknown"),
                     document_type=document_type,
                     document_tokens=document_tokens,
-                    token_counter=token_counter,
+                    text=document.page_content,
+                    base_metadata=document.metadata,
                 )
-            return documents
-        else:
+                documents[file_stem] = create_chunks(source_document, offsets)
+            # The texts now live in the SourceDocuments; the loaded Documents are no longer needed.
+            self._document_directory = []
+        return documents
+
+    def _split_documents_parallel(self, file_path: str, chunk_size: int, token_counter: Callable[[str], int]) -> Dict[str, List[Chunk]]:
+        """
+        Preprocesses the files of a directory in batches across worker processes.
+
+        Workers return `_DocumentRecord` tuples, which map directly onto a
+        `SourceDocument` and its `Chunk` records.
+        """
+        print(f"Loading code files from directory: {file_path} using {self.workers} worker processes")
+        file_paths, metadata = self.select_sources(self._discover_files(file_path))
+        dumps: List[str] = self._find_dumps(file_paths)
+        file_paths = [path for path in file_paths if path not in set(dumps)]
+        if not file_paths and not dumps:
+            print("No code files found in the specified directory.")
+            print("No documents loaded to split.")
+            return {}
+
+        # Several batches per worker balance uneven file sizes without paying per-file IPC.
+        batch_size: int = max(1, min(self._MAX_BATCH_SIZE, ceil(len(file_paths) / (self.workers * 4))))
+        files: List[Tuple[str, List[str]]] = [(path, metadata.get(path, {}).get("includes", [])) for path in file_paths]
+        batches: List[List[Tuple[str, List[str]]]] = [files[index : index + batch_size] for index in range(0, len(files), batch_size)]
+
+        documents: Dict[str, List[Chunk]] = {}
+        processed: int = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for records in executor.map(_preprocess_batch, batches, repeat(chunk_size), repeat(token_counter)):
+                self._add_records(documents, records, metadata)
+                processed += len(records)
+                print(f"\tPreprocessed {processed}/{len(file_paths)} documents")
+            for dump in dumps:
+                print(f"\tSplitting source dump into objects: {dump}")
+                for future in self._submit_sources(executor, DumpScanner(dump).read(), chunk_size, token_counter):
+                    self._add_records(documents, future.result())
+        print(f"{len(documents)} Code files loaded successfully from '{file_path}'")
+        return documents
+
+    def _split_stream_parallel(
+        self,
+        file_path: str,
+        sources: Iterable[Tuple[str, str]],
+        chunk_size: int,
+        token_counter: Callable[[str], int],
+        metadata: Dict[str, Dict[str, Any]] | None = None,
+    ) -> Dict[str, List[Chunk]]:
+        """
+        Preprocesses the sources of an archive or dump across worker processes while they are being read.
+
+        Sources are handed to the workers in fixed-size batches as soon as they
+        are read, so reading the input overlaps with splitting. The metadata of
+        the sources is attached once all of them have been read.
+        """
+        print(f"Loading code files from: {file_path} using {self.workers} worker processes")
+        documents: Dict[str, List[Chunk]] = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                processed: int = 0
+                for future in self._submit_sources(executor, sources, chunk_size, token_counter):
+                    records: List[_DocumentRecord] = future.result()
+                    self._add_records(documents, records, metadata)
+                    processed += len(records)
+                    print(f"\tPreprocessed {processed} documents")
+        except Exception as error:
+            raise RuntimeError(f"Error loading documents: {error}")
+
+        if not documents:
+            print("No code files found in the specified file.")
             print("No documents loaded to split.")
             return {}
+        print(f"{len(documents)} Code files loaded successfully from '{file_path}'")
+        return documents
+
+    def _submit_sources(
+        self,
+        executor: Executor,
+        sources: Iterable[Tuple[str, str]],
+        chunk_size: int,
+        token_counter: Callable[[str], int],
+    ) -> List[Future]:
+        """Reads all sources, submitting them to the workers in fixed-size batches along the way."""
+        futures: List[Future] = []
+        batch: List[Tuple[str, str]] = []
+        for source in sources:
+            batch.append(source)
+            if len(batch) == self._STREAM_BATCH_SIZE:
+                futures.append(executor.submit(_preprocess_sources, batch, chunk_size, token_counter))
+                batch = []
+        if batch:
+            futures.append(executor.submit(_preprocess_sources, batch, chunk_size, token_counter))
+        return futures
+
+    @staticmethod
+    def _add_records(documents: Dict[str, List[Chunk]], records: Iterable[_DocumentRecord], metadata: Dict[str, Dict[str, Any]] | None = None) -> None:
+        """Converts worker records into a `SourceDocument` and its `Chunk` records."""
+        for record in records:
+            file_stem: str = Path(record.source).stem.lower()
+            source_document = SourceDocument(
+                name=file_stem,
+                source=record.source,
+                document_type=record.document_type,
+                document_tokens=record.document_tokens,
+                text=record.text,
+                base_metadata={"source": record.source, **(metadata or {}).get(record.source, {})},
+            )
+            documents[file_stem] = create_chunks(source_document, record.chunks)
+
+    @staticmethod
+    def _discover_files(file_path: str) -> List[str]:
+        """Lists the source and abapGit XML files below a directory in one walk, skipping hidden paths like `DirectoryLoader`."""
+        file_paths: List[str] = []
+        for directory, directories, file_names in walk(file_path):
+            directories[:] = sorted(name for name in directories if not name.startswith("."))
+            file_paths.extend(str(Path(directory) / name) for name in sorted(file_names) if not name.startswith(".") and name.lower().endswith(_SOURCE_EXTENSIONS))
+        return file_paths
+
+    @staticmethod
+    def select_sources(
+        file_paths: List[str],
+        exists: Callable[[str], bool] | None = None,
+        texts: Dict[str, str] | None = None,
+    ) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """
+        Separates the sources in a list of files from the abapGit XML files describing them.
+
+        The includes of a class are not sources of their own; they are listed
+        under "includes" in the metadata of the class source, and an include
+        selects its class even if only the include is in `file_paths`.
+
+        Args:
+            file_paths: The files of a directory, or individual changed files.
+            exists: Checks whether the XML file or class source of a file
+                    exists; by default, it must be part of `file_paths`.
+            texts: The contents of files that are not on disk, such as the
+                   members of an archive, from which XML descriptions are read.
+
+        Returns:
+            The sources in the order of the files, and the metadata read from
+            the XML file of each source that has one.
+        """
+        exists = exists or set(file_paths).__contains__
+        texts = texts or {}
+        sources: Dict[str, None] = {}
+        metadata: Dict[str, Dict[str, Any]] = {}
+        descriptions: Dict[str, Dict[str, Any]] = {}
+        includes: Dict[str, List[str]] = {}
+        for path in file_paths:
+            _, file_type, rest = _split_file_name(path)
+            if rest and rest[-1] == "xml":
+                # Only objects without other files are documented from their XML.
+                if file_type in _XML_FILE_TYPES and len(rest) == 1:
+                    sources[path] = None
+                continue
+            if file_type == _INCLUDE_FILE_TYPE and len(rest) > 1 and exists(class_path := _object_file(path, file_type, rest[-1])):
+                includes.setdefault(class_path, []).append(path)
+                path = class_path
+            sources[path] = None
+            if file_type is not None:
+                xml_path: str = _object_file(path, file_type, "xml")
+                if xml_path not in descriptions and exists(xml_path):
+                    descriptions[xml_path] = _read_description(xml_path, texts.get(xml_path))
+                if xml_path in descriptions:
+                    metadata[path] = descriptions[xml_path]
+        for class_path, class_includes in includes.items():
+            metadata[class_path] = {**metadata.get(class_path, {}), "includes": sorted(class_includes)}
+        return list(sources), metadata
+
+    @staticmethod
+    def _add_class_files(file_paths: List[str]) -> List[str]:
+        """Adds the other files on disk of every class among the given files, which are loaded together."""
+        added: Dict[str, None] = dict.fromkeys(file_paths)
+        for path in file_paths:
+            _, file_type, _ = _split_file_name(path)
+            if file_type == _INCLUDE_FILE_TYPE:
+                # The object name and type as spelled in the file name, e.g. "zcl_demo.clas".
+                prefix: str = ".".join(PurePath(path).name.split(".")[:2])
+                added.update(dict.fromkeys(str(sibling) for sibling in sorted(Path(path).parent.glob(f"{prefix}.*"))))
+        return list(added)
 
-    def _load_documents(self, file_path: str) -> bool:
+    def _find_dumps(self, file_paths: List[str]) -> List[str]:
+        """Returns the files large enough to be treated as multi-object source dumps."""
+        return [path for path in file_paths if Path(path).stat().st_size >= self.dump_threshold]
+
+    def _load_documents(self, file_path: str, file_names: List[str] | None = None) -> bool:
         """
-        Loads all `.abap` files from the specified directory using DirectoryLoader.
+        Loads all source files from the specified directory, the matching
+        members of an archive using the ArchiveReader, or only the given files.
+        Source dumps are split into one document per object using the DumpScanner.
         """
+
         try:
+            if file_names is None and is_archive(file_path):
+                print(f"Loading code files from archive: {file_path}")
+                metadata: Dict[str, Dict[str, Any]] = {}
+                sources: List[Tuple[str, str]] = list(self._read_archive(file_path, metadata))
+                self._document_directory = [Document(page_content=text, metadata={"source": source, **metadata.get(source, {})}) for source, text in sources]
+                if self._document_directory:
+                    print(f"{len(self._document_directory)} Code files loaded successfully from '{file_path}'")
+                    return True
+                print("No code files found in the specified archive.")
+                return False
+
+            if file_names is None and Path(file_path).is_file():
+                print(f"Splitting source dump into objects: {file_path}")
+                self._document_directory = self._scan_dump(file_path)
+                print(f"{len(self._document_directory)} Objects loaded successfully from '{file_path}'")
+                return bool(self._document_directory)
+
+            if file_names is not None:
+                print(f"Loading {len(file_names)} changed code files from directory: {file_path}")
+                present: List[str] = []
+                for file_name in file_names:
+                    if not Path(file_name).is_file():
+                        print(f"[WARNING] Skipping missing file: {file_name}")
+                        continue
+                    present.append(file_name)
+                changed, metadata = self.select_sources(self._add_class_files(present), exists=lambda object_path: Path(object_path).is_file())
+                changed_dumps: List[str] = self._find_dumps(changed)
+                self._document_directory = self._load_files([source for source in changed if source not in changed_dumps], metadata)
+                for dump in changed_dumps:
+                    self._document_directory.extend(self._scan_dump(dump))
+                return bool(self._document_directory)
+
             print(f"Loading code files from directory: {file_path}")
-            self._document_directory = DirectoryLoader(
-                path=str(file_path),
-                glob="**/*.abap",
-                loader_cls=TextLoader,
-                loader_kwargs={"encoding": "utf-8", "autodetect_encoding": True},
-                show_progress=True,
-                silent_errors=True,
-            ).load()
+            file_paths, metadata = self.select_sources(self._discover_files(file_path))
+            dumps: List[str] = self._find_dumps(file_paths)
+            self._document_directory = self._load_files([path for path in file_paths if path not in set(dumps)], metadata)
+            for dump in dumps:
+                print(f"Splitting source dump into objects: {dump}")
+                self._document_directory.extend(self._scan_dump(dump))
 
             if self._document_directory:
                 print(f"{len(self._document_directory)} Code files loaded successfully from '{file_path}'")
@@ -109,6 +501,62 @@ class Document_Splitter:
         except Exception as error:
             raise RuntimeError(f"Error loading documents: {error}")
 
+    @staticmethod
+    def _load_files(file_paths: List[str], metadata: Dict[str, Dict[str, Any]]) -> List[Document]:
+        """
+        Loads the given files and their includes with their attached metadata.
+
+        Unreadable files are skipped, as `DirectoryLoader` does with `silent_errors`.
+        """
+        documents: List[Document] = []
+        for file_path in file_paths:
+            file_metadata: Dict[str, Any] = metadata.get(file_path, {})
+            try:
+                text: str = _join_includes(_read_file(file_path), [(include, _read_file(include)) for include in file_metadata.get("includes", [])])
+            except Exception as error:
+                print(f"[WARNING] Skipping unreadable file {file_path}: {error}")
+                continue
+            documents.append(Document(page_content=text, metadata={"source": file_path, **file_metadata}))
+        return documents
+
+    def _read_archive(self, file_path: str, metadata: Dict[str, Dict[str, Any]], workers: int = 4) -> Iterator[Tuple[str, str]]:
+        """
+        Streams the sources of an archive with the includes of its classes, collecting their metadata.
+
+        Other sources are passed on as soon as they are read. The classes and
+        the XML descriptions are held back until the archive has been read,
+        as their members may come in any order; the metadata read from the
+        descriptions is added to `metadata` by then.
+        """
+        members: List[str] = []
+        held: Dict[str, str] = {}
+        for source, text in ArchiveReader(file_path, pattern=self.archive_pattern, workers=workers).read():
+            members.append(source)
+            _, file_type, rest = _split_file_name(source)
+            if rest[-1] == "xml":
+                held[source] = text
+                # Objects stored as XML alone are documented from their description.
+                if file_type in _XML_FILE_TYPES and len(rest) == 1:
+                    yield source, text
+            elif file_type == _INCLUDE_FILE_TYPE:
+                held[source] = text
+            else:
+                yield source, text
+        sources, selected = self.select_sources(members, texts=held)
+        metadata.update(selected)
+        for source in sources:
+            if source in held and _split_file_name(source)[1] == _INCLUDE_FILE_TYPE:
+                yield source, _join_includes(held[source], [(include, held[include]) for include in selected.get(source, {}).get("includes", [])])
+
+    @staticmethod
+    def _scan_dump(file_path: str) -> List[Document]:
+        """Splits a source dump into one `Document` per object."""
+        return [Document(page_content=text, metadata={"source": source}) for source, text in DumpScanner(file_path).read()]
+
+    def _infer_document_type(self, source: str, content: str) -> str:
+        """Returns the document type given by the abapGit file name, or analyzes the content of plain sources."""
+        return _file_document_type(source, content) or self._analyze_document_type(content)
+
     def _analyze_document_type(self, content: str) -> str:
         """
         Analyzes the document content to determine the ABAP object type.
@@ -125,7 +573,7 @@ class Document_Splitter:
 
         return best_match["doc_type"]
 
-    def _create_splitter(self, document: Document, chunk_size: int) -> List[Document]:
+    def _create_splitter(self, document: Document, chunk_size: int, add_start_index: bool = False) -> List[Document]:
         """
         Creates and applies a text splitter to a document.
         """
@@ -136,35 +584,18 @@ class Document_Splitter:
             length_function=len,
             is_separator_regex=True,
             keep_separator=True,
+            add_start_index=add_start_index,
         )
         return splitter.split_documents(documents=[document])
 
-    def _generate_metadata_for_document(
-        self,
-        document_chunks: List[Document],
-        document_type: str,
-        document_metadata: Dict,
-        document_tokens: int,
-        token_counter: Callable[[str], int],
-    ) -> List[Document]:
-        """
-        Enriches each document chunk with additional metadata.
-        """
-        chunks_with_context: List[Document] = []
-        for chunk_index, document_chunk in enumerate(document_chunks, 1):
-            chunk_metadata: Dict[Any, Any] = document_metadata.copy()
-            chunk_metadata.update(
-                {
-                    "document_name": Path(document_metadata.get("source", "unknown")).stem.lower(),
-                    "document_type": document_type,
-                    "document_tokens": document_tokens,
-                    "chunk_index": chunk_index,
-                    "chunk_id": f"{Path(document_metadata.get('source', 'unknown')).stem.lower()}_chunk_{chunk_index}",
-                    "chunk_token_count": token_counter(document_chunk.page_content),
-                    "is_first_chunk": chunk_index == 1,
-                    "is_last_chunk": chunk_index == len(document_chunks),
-                    "is_single_chunk": len(document_chunks) == 1,
-                }
-            )
-            chunks_with_context.append(Document(metadata=chunk_metadata, page_content=document_chunk.page_content))
-        return chunks_with_context
+    def _split_offsets(self, document: Document, chunk_size: int, token_counter: Callable[[str], int]) -> List[Tuple[int, int, int]]:
+        """
+        Splits a document and returns the (start, end, token count) of every chunk.
+
+        The chunk texts produced by the splitter are only used to count tokens
+        and are discarded afterwards; chunks keep offsets into the source text.
+        """
+        return [
+            (chunk.metadata["start_index"], chunk.metadata["start_index"] + len(chunk.page_content), token_counter(chunk.page_content))
+            for chunk in self._create_splitter(document=document, chunk_size=chunk_size, add_start_index=True)
+        ]
@@ -0,0 +1,108 @@
+"""
+Splits large multi-object source dumps into one logical document per object.
+
+This module contains the `DumpScanner` class for single text files holding
+many repository objects concatenated together, such as transport or SE80
+downloads. The file is memory-mapped and scanned once for the first lines of
+objects (`CLASS ... DEFINITION PUBLIC`, `FUNCTION`, `REPORT`, `define ...
+entity`, and so on, see `ABAP.get_object_boundaries`). Only the bytes of one
+object at a time are copied and decoded, so the whole dump is never held as a
+single Python string.
+"""
+
+from app.archive_reader import decode_source
+from app.language_separator import ABAP
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from re import IGNORECASE, MULTILINE, Pattern, compile
+from typing import Dict, Iterator, List, Set, Tuple
+
+
+def _compile_object_start(patterns: List[str]) -> Pattern[bytes]:
+    """
+    Combines the boundary patterns into one pattern matching the first line of any object.
+
+    Every boundary pattern starts with a keyword or a group of keyword
+    alternatives. A lookahead for their first letters lets the regex engine
+    reject most lines before trying the alternatives, which makes the scan
+    several times faster.
+    """
+    letters: Set[str] = set()
+    for pattern in patterns:
+        head: str = pattern.removeprefix("(?:").split(")")[0].split("\\")[0]
+        letters.update(keyword[0].upper() + keyword[0].lower() for keyword in head.split("|"))
+    alternatives: str = "|".join(f"(?:{pattern})" for pattern in patterns)
+    return compile(f"^[ \\t]*(?=[{''.join(sorted(letters))}])(?:{alternatives})".encode(), IGNORECASE | MULTILINE)
+
+
+# Matches the first line of any object; each alternative has one group capturing the object name.
+_OBJECT_START: Pattern[bytes] = _compile_object_start(ABAP.get_object_boundaries())
+# Lines directly above an object's first line that belong to it: annotations and comments.
+_HEADER_PREFIXES: Tuple[bytes, ...] = (b"@", b"//", b"/*", b"*", b'"')
+
+
+class DumpScanner:
+    """
+    Yields the objects of a multi-object source dump as (source, text) pairs.
+
+    The source of an object is the dump path joined with the object name
+    (e.g., "transport.txt/zcl_demo.abap"), so document names are the object
+    names. A file without recognizable object boundaries is returned as a
+    single object.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Initializes the scanner.
+
+        Args:
+            file_path: The path of the source dump.
+        """
+        self.file_path = Path(file_path)
+
+    def read(self) -> Iterator[Tuple[str, str]]:
+        """Yields the source and decoded text of every object in file order."""
+        if self.file_path.stat().st_size == 0:
+            return
+        with open(self.file_path, "rb") as file, mmap(file.fileno(), 0, access=ACCESS_READ) as mapped:
+            names: Dict[str, int] = {}
+            for start, end, name in self._scan(mapped):
+                yield self._source(name, names), decode_source(mapped[start:end])
+
+    def _scan(self, mapped: mmap) -> List[Tuple[int, int, str]]:
+        """
+        Finds the (start, end, name) of every object in a single pass over the mapped bytes.
+
+        Text before the first object is attached to the first object.
+        """
+        starts: List[Tuple[int, str]] = []
+        for match in _OBJECT_START.finditer(mapped):
+            name: bytes = next((group for group in match.groups() if group), b"")
+            start: int = self._include_header(mapped, match.start(), starts[-1][0] if starts else 0)
+            starts.append((start, name.decode("ascii", errors="replace")))
+
+        if not starts:
+            return [(0, len(mapped), self.file_path.stem)]
+        starts[0] = (0, starts[0][1])
+        ends: List[int] = [start for start, _ in starts[1:]] + [len(mapped)]
+        return [(start, end, name) for (start, name), end in zip(starts, ends)]
+
+    @staticmethod
+    def _include_header(mapped: mmap, start: int, lower_bound: int) -> int:
+        """Moves an object's start up over the annotation and comment lines directly above it."""
+        while start > lower_bound:
+            line_start: int = mapped.rfind(b"\n", lower_bound, start - 1) + 1
+            line_start = max(line_start, lower_bound)
+            if not mapped[line_start : start - 1].lstrip().startswith(_HEADER_PREFIXES):
+                break
+            start = line_start
+        return start
+
+    def _source(self, name: str, names: Dict[str, int]) -> str:
+        """Returns a unique source path for an object, numbering repeated names."""
+        # Namespaced objects (e.g., /DMO/CL_DEMO) must not create path separators.
+        name = name.strip("/").replace("/", "_").lower() or self.file_path.stem.lower()
+        names[name] = names.get(name, 0) + 1
+        if names[name] > 1:
+            name = f"{name}_{names[name]}"
+        return str(self.file_path / f"{name}.abap")
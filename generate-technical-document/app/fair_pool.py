@@ -0,0 +1,131 @@
+"""
+Shares the model between the packages of a batch run.
+
+This module contains the `FairRequestPool` class, a fixed set of request
+threads serving one queue per package. The threads take requests from the
+packages in turn (round-robin), so a package with thousands of requests
+cannot hold back a small package that enqueues its few requests later: the
+small package gets every n-th free slot, where n is the number of packages
+with pending requests. Within a package, requests keep the longest-first
+order of the `Scheduler`. The pool also keeps the request counts and time of
+each package for the throughput breakdown of the run summary.
+"""
+
+from app.scheduler import StageTask
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+
+@dataclass
+class PackageThroughput:
+    """The requests of one package served by the pool."""
+
+    requests: int = 0
+    failed: int = 0
+    prompt_tokens: int = 0
+    # Seconds the package's requests were running, and waiting in its queue.
+    busy_seconds: float = 0.0
+    wait_seconds: float = 0.0
+
+
+class FairRequestPool:
+    """
+    Runs the stage requests of several packages round-robin on shared threads.
+
+    `run` can be called concurrently from one thread per package; each call
+    blocks until the requests it enqueued are finished. The number of threads
+    bounds the requests taken from the queues, while the `Ollama` manager's
+    adaptive limiter still decides how many of them are in flight.
+    """
+
+    def __init__(self, workers: int) -> None:
+        """
+        Initializes the pool and starts its threads.
+
+        Args:
+            workers: The number of request threads.
+        """
+        self._queues: Dict[str, Deque[Tuple[StageTask, Callable[[StageTask], Any], Future, float]]] = {}
+        # Packages in the order they are served; the cursor points at the next one.
+        self._order: List[str] = []
+        self._cursor: int = 0
+        self._closed: bool = False
+        self._condition = Condition()
+        self.throughput: Dict[str, PackageThroughput] = {}
+        self._threads: List[Thread] = [Thread(target=self._work, name=f"fair-pool-{index}", daemon=True) for index in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def run(self, package: str, tasks: List[StageTask], request: Callable[[StageTask], Any]) -> List[Any]:
+        """
+        Enqueues the tasks of a package and waits for their results.
+
+        Args:
+            package: The name of the package the tasks belong to.
+            tasks: The tasks in the order they should be started.
+            request: Sends a single task to the model and returns its result.
+
+        Returns:
+            The result of each task, in the order of the tasks.
+
+        Raises:
+            Exception: The exception raised by `request` for the first failed
+                       task in task order; the other tasks still run.
+        """
+        futures: List[Future] = [Future() for _ in tasks]
+        now: float = monotonic()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The request pool is closed")
+            if package not in self._queues:
+                self._queues[package] = deque()
+                self._order.append(package)
+                self.throughput[package] = PackageThroughput()
+            self._queues[package].extend((task, request, future, now) for task, future in zip(tasks, futures, strict=True))
+            self._condition.notify_all()
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Stops the threads once the queued requests are finished."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _next(self) -> Tuple[str, Tuple[StageTask, Callable[[StageTask], Any], Future, float]] | None:
+        """Waits for the next request, taking the packages in turn, or returns None once the pool is closed and drained."""
+        with self._condition:
+            while True:
+                for offset in range(len(self._order)):
+                    package: str = self._order[(self._cursor + offset) % len(self._order)]
+                    if self._queues[package]:
+                        self._cursor = (self._cursor + offset + 1) % len(self._order)
+                        return package, self._queues[package].popleft()
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def _work(self) -> None:
+        """Serves requests until the pool is closed."""
+        while (item := self._next()) is not None:
+            package, (task, request, future, enqueued) = item
+            started: float = monotonic()
+            try:
+                result: Any = request(task)
+            except Exception as error:
+                result = None
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+            with self._condition:
+                throughput: PackageThroughput = self.throughput[package]
+                throughput.requests += 1
+                throughput.failed += result is None
+                throughput.prompt_tokens += task.prompt_tokens
+                throughput.busy_seconds += monotonic() - started
+                throughput.wait_seconds += started - enqueued
@@ -4,20 +4,49 @@ Orchestrates the entire code analysis and documentation generation pipeline.
 This module contains the `Generate` class, which acts as the main controller,
 coordinating all steps from loading source files to generating the final
 Markdown report. It relies on dependency injection to receive its components,
-making it a flexible and testable orchestrator.
+making it a flexible and testable orchestrator. With a `JobQueue`, the model
+requests are not sent from this process but handed to the queue workers of
+other nodes, and the orchestrator acts as the coordinator of the run.
+
+Large classes are analyzed method by method, and with a `ResponseCache` every
+request whose input is unchanged since an earlier run is answered from the
+cache, so editing one method of a class costs a single small request plus the
+specification of the class.
+
+In a batch run, one orchestrator per package processes its package while the
+model, the prompt templates and the response cache are shared, and the stage
+requests of all packages are served round-robin by a `FairRequestPool`.
 """
 
+from app.chunk_model import Chunk
+from app.concurrency import AdaptiveLimiter
+from app.context_budget import SpecificationContext
 from app.create_document import CreateDocument
+from app.deadline import BRIEF_OUTPUT_TOKENS, DeadlineController, rank_documents
 from app.document_splitter import Document_Splitter
+from app.fair_pool import FairRequestPool
+from app.job_queue import JobQueue, JobResult
 from app.language_model import Ollama
+from app.planner import Planner, RunPlan
+from app.profiler import profiled_stage
 from app.prompt_generator import PromptGenerator
+from app.response_cache import ResponseCache
+from app.results_store import RESULTS_FILENAME, ResultsStore, StoredDocument, deserialize_result
+from app.scheduler import Scheduler, StageTask
 from app.structured_output import Code_Analysis, Code_Structure, Technical_Specification
+from app.throughput import ThroughputProfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from json import loads
 from langchain_core.documents.base import Document
-from langchain_core.prompts.prompt import PromptTemplate
-from langchain_core.runnables import Runnable
-from langchain_ollama import ChatOllama
+from langchain_core.prompts.chat import ChatPromptTemplate
+from pathlib import Path
 from pydantic import BaseModel
-from typing import Callable, Dict, List, Tuple
+from sqlite3 import Error
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Callable, ClassVar, Counter, Dict, List, Tuple, Type
+from uuid import uuid4
 
 # from langchain_core.messages.base import BaseMessage
 
@@ -33,12 +62,44 @@ class Generate:
     4. `CreateDocument`: To assemble the final report.
     """
 
+    # The structured output schema requested from the LLM for each stage.
+    _STAGE_SCHEMAS: Dict[str, Type[BaseModel] | None] = {
+        "analysis": Code_Analysis,
+        "structure": Code_Structure,
+        "specification": None,
+        "method": Code_Analysis,
+    }
+    # The progress message printed when a stage request is sent.
+    _STAGE_ACTIONS: Dict[str, str] = {
+        "analysis": "Analyzing",
+        "structure": "Structuring",
+        "specification": "Generating Technical Specification",
+        "method": "Analyzing Method of",
+    }
+    # The heading of each stage's section, used for the placeholder of a stale section without an earlier result.
+    _STAGE_TITLES: Dict[str, str] = {
+        "analysis": "Code Analysis",
+        "structure": "Code Structure",
+        "specification": "Technical Specification",
+    }
+    # Seconds between two progress checks of the job queue, and between two progress messages.
+    _QUEUE_POLL_SECONDS: float = 1.0
+    _QUEUE_REPORT_SECONDS: float = 30.0
+    # The splitter and the prompt generator keep the state of their last call, so the orchestrators of a batch use them one at a time.
+    _SHARED_STATE_LOCK: ClassVar[Lock] = Lock()
+
     def __init__(
         self,
         document_splitter: Document_Splitter,
         prompt_generator: PromptGenerator,
         llm_manager: Ollama,
         document_creator: CreateDocument,
+        job_queue: JobQueue | None = None,
+        response_cache: ResponseCache | None = None,
+        method_min_tokens: int = 0,
+        request_pool: FairRequestPool | None = None,
+        package: str | None = None,
+        deadline: DeadlineController | None = None,
     ) -> None:
         """
         Initializes the Generate instance with its required dependencies.
@@ -48,13 +109,52 @@ class Generate:
             prompt_generator: An instance of PromptGenerator.
             llm_manager: An instance of Ollama.
             document_creator: An instance of CreateDocument.
+            job_queue: An optional shared queue; if given, the model requests
+                       are processed by queue workers instead of this process.
+            response_cache: An optional cache answering requests whose input
+                            did not change since an earlier run.
+            method_min_tokens: The source size in tokens from which classes
+                               are analyzed method by method, or 0 to always
+                               analyze classes as a whole.
+            request_pool: An optional pool shared by the orchestrators of a
+                          batch run; the stage requests are sent through it
+                          instead of a pool of this orchestrator.
+            package: The name of the package in a batch run.
+            deadline: An optional controller keeping the run within a fixed
+                      time window by prioritizing the documents and
+                      degrading the requests as the deadline approaches.
         """
         self.document_splitter: Document_Splitter = document_splitter
         self.prompt_generator: PromptGenerator = prompt_generator
         self.llm_manager: Ollama = llm_manager
         self.document_creator: CreateDocument = document_creator
+        self.job_queue: JobQueue | None = job_queue
+        self.response_cache: ResponseCache | None = response_cache
+        self.method_min_tokens: int = method_min_tokens
+        self.request_pool: FairRequestPool | None = request_pool
+        self.package: str | None = package
+        self.deadline: DeadlineController | None = deadline
+        self._scheduler: Scheduler
+        # Fits the specification input of the current run into the model's context.
+        self._specification_context: SpecificationContext | None = None
+        # Estimated and actual wall time in seconds of each processing phase.
+        self._makespans: Dict[str, Tuple[float, float]] = {}
+        # The formatted sections of the last run, kept for incremental updates.
+        self._processed_documents: Dict[str, Dict[str, List[Document]]] = {}
+        # The raw results of the last run, persisted in the results store.
+        self._results: Dict[str, StoredDocument] = {}
+        # Jobs of the current run finished per queue worker, and the number of expired leases.
+        self._queue_workers: Counter[str] = Counter()
+        self._queue_requeued: int = 0
+        # Requests of the current run answered from the response cache, and results added to it.
+        self._cache_hits: int = 0
+        self._cache_stored: int = 0
+        # With a deadline: the rank of each document, the results of the previous run, and the sections left stale.
+        self._priorities: Dict[str, int] = {}
+        self._previous: Dict[str, StoredDocument] = {}
+        self._stale_sections: int = 0
 
-    def run(self, file_path: str, output_file_path: str, model_name: str) -> None:
+    def run(self, file_path: str, output_file_path: str, model_name: str) -> bool:
         """
         Executes the full document generation pipeline.
 
@@ -63,106 +163,693 @@ class Generate:
             output_file_path: The directory where the final Markdown report
                               will be saved.
             model_name: The name of the Ollama model to use for analysis.
+
+        Returns:
+            True if the Markdown report was written, False otherwise.
         """
         print("Welcome to the Document Generator!")
+        # State of a previous run on the shared singletons must not leak into this one.
+        self.prompt_generator.clear_documents
+        self.llm_manager.request_stats.reset()
+        self.llm_manager.throughput.reset()
 
         # Step 1: Initialize the LLM manager to ensure a connection.
         print("\n=== Step 1: Initializing Language Model ===")
-        if not self.llm_manager.initialize_llm(model_name):
+        if not self._initialize_model(model_name):
             print("Failed to initialize the language model. Aborting.")
-            return
+            return False
+
+        created: bool | None = self.process(file_path=file_path, output_file_path=output_file_path, model_name=model_name)
+        if created is None:
+            return False
+
+        # Step 6: Report how the model requests were served.
+        self._print_run_summary()
+        return created
+
+    def process(self, file_path: str, output_file_path: str, model_name: str) -> bool | None:
+        """
+        Runs steps 2 to 5 of the pipeline on an initialized model.
+
+        Unlike `run`, the request counters of the shared `Ollama` manager are
+        neither reset nor reported, so the orchestrators of a batch run can
+        process their packages side by side.
+
+        Args:
+            file_path: The directory containing the ABAP source code files.
+            output_file_path: The directory where the final Markdown report
+                              will be saved.
+            model_name: The name of the Ollama model to use for analysis.
 
+        Returns:
+            True if the Markdown report was written, False if writing it
+            failed, or None if the run was aborted before.
+        """
         # Step 2: Load and split documents into chunks.
-        print("\n=== Step 2: Loading and Splitting Documents into Chunks ===")
-        # Get model-specific details for the splitter.
-        max_chunk: int = self.llm_manager.model_max_chunk(model_name)
-        token_counter: Callable[..., int] = self.llm_manager.count_tokens
-        documents: Dict[str, List[Document]] = self.document_splitter.split_documents(
-            file_path=file_path,
-            chunk_size=max_chunk,
-            token_counter=token_counter,
-        )
+        print(f"\n=== Step 2: Loading and Splitting Documents into Chunks{self._package_label} ===")
+        documents: Dict[str, List[Chunk]] = self._split_documents(file_path=file_path, model_name=model_name)
+        if not documents:
+            print(f"No documents were processed{self._package_label}. Aborting.")
+            return None
+
+        if self.deadline is not None:
+            self._prioritize(documents=documents, output_file_path=output_file_path)
+
+        # Steps 3 and 4: Create the prompts and send them to the LLM.
+        self._results = {}
+        processed_documents: Dict[str, Dict[str, List[Document]]] | None = self._analyze_documents(documents=documents, model_name=model_name)
+        if processed_documents is None:
+            return None
+        if self.deadline is not None:
+            self._mark_stale(documents=documents, processed_documents=processed_documents)
+        self._processed_documents = processed_documents
+        self._save_results(output_file_path=output_file_path, model_name=model_name)
+
+        # Step 5: Assemble the analyzed content into a final Markdown document.
+        return self._create_report(processed_documents=processed_documents, output_file_path=output_file_path)
+
+    def _prioritize(self, documents: Dict[str, List[Chunk]], output_file_path: str) -> None:
+        """Ranks the documents for a deadline-bounded run, using the results store of the previous run to detect the changed ones."""
+        store = ResultsStore(str(Path(output_file_path) / RESULTS_FILENAME))
+        previous_run: float | None = None
+        try:
+            self._previous = store.load()
+            previous_run = Path(store.file_path).stat().st_mtime
+        except (OSError, ValueError):
+            # Without a previous run, every document counts as changed.
+            self._previous = {}
+        self._priorities = rank_documents(documents, previous_run=previous_run, previous_documents=set(self._previous))
+        self._stale_sections = 0
+        first: str = ", ".join(sorted(self._priorities, key=self._priorities.__getitem__)[:5])
+        print(f"[INFO] Deadline in {self.deadline.remaining / 60:.1f} min; documents processed by priority, starting with: {first}")
+
+    def _mark_stale(self, documents: Dict[str, List[Chunk]], processed_documents: Dict[str, Dict[str, List[Document]]]) -> None:
+        """Fills the sections not generated before the deadline with the previous result, or a placeholder, marked as stale."""
+        for document_name, chunks in documents.items():
+            category: str = self.prompt_generator.get_category(chunks[0].document.document_type) if chunks else "GENERIC"
+            stages: List[str] = ["analysis", *(["structure"] if self.prompt_generator.get_template(category) is not None else []), "specification"]
+            for stage in stages:
+                if stage in processed_documents.get(document_name, {}):
+                    continue
+                previous: StoredDocument | None = self._previous.get(document_name)
+                result: BaseModel | str | None = previous.results.get(stage) if previous else None
+                metadata: Dict[str, Any] = previous.metadata if previous else chunks[0].metadata if chunks else {}
+                stored: StoredDocument = self._results.setdefault(document_name, StoredDocument(name=document_name, metadata=metadata))
+                if result is not None:
+                    stored.results[stage] = result
+                stored.stale.append(stage)
+                processed_documents.setdefault(document_name, {})[stage] = [Document(metadata=stored.metadata, page_content=self.stale_section(stage, result))]
+                self._stale_sections += 1
+
+    @classmethod
+    def stale_section(cls, stage: str, result: BaseModel | str | None) -> str:
+        """Formats a section that was not regenerated before the deadline, showing the previous result if there is one."""
+        page_content: str | None = cls.format_section(result)
+        if page_content is None:
+            return f"## {cls._STAGE_TITLES[stage]}\n\n> **Stale:** This section was not generated before the deadline of the run."
+        heading, _, body = page_content.partition("\n\n")
+        return f"{heading}\n\n> **Stale:** This section was not regenerated before the deadline of the run and shows the result of an earlier run.\n\n{body}"
+
+    @property
+    def _package_label(self) -> str:
+        """Names the package in the progress messages of a batch run."""
+        return f" [{self.package}]" if self.package else ""
+
+    def update(
+        self,
+        file_path: str,
+        output_file_path: str,
+        model_name: str,
+        changed_files: List[str],
+        removed_files: List[str],
+    ) -> bool:
+        """
+        Regenerates only the given objects and rewrites the report in place.
+
+        The results of the previous `run` or `update` are kept in memory, so
+        only the changed objects go through splitting, prompting and the LLM.
+        Their sections are replaced in the report, the sections of removed
+        objects are dropped, and all other sections stay untouched.
+
+        Args:
+            file_path: The directory containing the ABAP source code files.
+            output_file_path: The directory of the Markdown report.
+            model_name: The name of the Ollama model to use for analysis.
+            changed_files: Paths of created or modified source files.
+            removed_files: Paths of deleted source files.
+
+        Returns:
+            True if the Markdown report was written, False otherwise.
+        """
+        self.prompt_generator.clear_documents
+        self.llm_manager.request_stats.reset()
+        self.llm_manager.throughput.reset()
+        if not self._initialize_model(model_name):
+            print("Failed to initialize the language model. Aborting.")
+            return False
+
+        # Removed abapGit XML descriptions do not remove the object of their sources,
+        # and a removed class include only changes its class, which is loaded again.
+        for removed_file in self.document_splitter.select_sources(removed_files, exists=lambda path: Path(path).is_file())[0]:
+            if Path(removed_file).is_file():
+                changed_files = [*changed_files, removed_file]
+                continue
+            document_name: str = Path(removed_file).stem.lower()
+            self._results.pop(document_name, None)
+            if self._processed_documents.pop(document_name, None) is not None:
+                print(f"Removed document: {document_name}")
+
+        regenerated: List[str] = []
+        if changed_files:
+            documents: Dict[str, List[Chunk]] = self._split_documents(file_path=file_path, model_name=model_name, file_names=changed_files)
+            processed_documents: Dict[str, Dict[str, List[Document]]] | None = self._analyze_documents(documents=documents, model_name=model_name) if documents else None
+            for document_name, document_data in (processed_documents or {}).items():
+                self._processed_documents.setdefault(document_name, {}).update(document_data)
+                regenerated.append(document_name)
+        self._save_results(output_file_path=output_file_path, model_name=model_name)
+
+        created: bool = self._create_report(processed_documents=self._processed_documents, output_file_path=output_file_path, changed=regenerated)
+        self._print_run_summary()
+        return created
+
+    def render(self, output_file_path: str, formats: List[str]) -> bool:
+        """
+        Rebuilds the report from the results store of a previous run without the model.
+
+        The raw results are read from `results.jsonl` in the output directory,
+        formatted into sections as in `run`, and written in every requested
+        format concurrently.
+
+        Args:
+            output_file_path: The directory holding the results store; the
+                              reports are written to it.
+            formats: The formats to write: "markdown" (with the search index),
+                     "html" and "json".
+
+        Returns:
+            True if every requested format was written, False otherwise.
+        """
+        store = ResultsStore(str(Path(output_file_path) / RESULTS_FILENAME))
+        print(f"\n=== Step 1: Loading Results from {store.file_path} ===")
+        started: float = monotonic()
+        try:
+            self._results = store.load()
+        except FileNotFoundError:
+            print(f"[ERROR] No results store found at {store.file_path}. Run the generator once first.")
+            return False
+        except ValueError as error:
+            print(f"[ERROR] {error}")
+            return False
+        processed_documents: Dict[str, Dict[str, List[Document]]] = {}
+        for document_name, stored in self._results.items():
+            for stage in dict.fromkeys([*stored.results, *stored.stale]):
+                result: BaseModel | str | None = stored.results.get(stage)
+                page_content: str | None = self.stale_section(stage, result) if stage in stored.stale else self.format_section(result)
+                if page_content is not None:
+                    processed_documents.setdefault(document_name, {})[stage] = [Document(metadata=stored.metadata, page_content=page_content)]
+        print(f"\tLoaded {len(processed_documents)} documents in {monotonic() - started:.2f}s")
+
+        print(f"\n=== Step 2: Rendering {', '.join(formats)} ===")
+        renderers: Dict[str, Callable[[], bool]] = {
+            "markdown": lambda: self._create_report(processed_documents=processed_documents, output_file_path=output_file_path),
+            "html": lambda: self.document_creator.create_html(documents=processed_documents, output_filename=output_file_path),
+            "json": lambda: self.document_creator.create_json(documents=self._results, output_filename=output_file_path),
+        }
+        with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+            rendered: List[bool] = list(executor.map(lambda name: renderers[name](), formats))
+        print(f"\tRendered {sum(rendered)}/{len(formats)} formats in {monotonic() - started:.2f}s")
+        return all(rendered)
+
+    def plan(self, file_path: str, output_file_path: str, model_name: str) -> bool:
+        """
+        Estimates the cost of a run without contacting the language model.
+
+        The documents are loaded, classified and split, and their prompts are
+        assembled exactly as in `run`. Instead of sending the prompts, the
+        requests per stage, their prompt and output tokens and the expected
+        wall time are reported, based on the throughput recorded by previous
+        runs of the model. Large classes are decomposed into their methods as
+        in a run, and requests the response cache answers are not counted. A per-document breakdown is written to `plan.csv`.
+
+        Args:
+            file_path: The directory containing the ABAP source code files.
+            output_file_path: The directory where `plan.csv` will be saved.
+            model_name: The name of the Ollama model the run is planned for.
+
+        Returns:
+            True if the plan was created, False otherwise.
+        """
+        print("Welcome to the Document Generator!")
+        self.prompt_generator.clear_documents
+        if model_name.upper() not in self.llm_manager.model_configs:
+            print(f"[ERROR] Configuration for model '{model_name}' not found.")
+            return False
+
+        print("\n=== Step 1: Loading and Splitting Documents into Chunks ===")
+        documents: Dict[str, List[Chunk]] = self._split_documents(file_path=file_path, model_name=model_name)
         if not documents:
             print("No documents were processed. Aborting.")
-            return
+            return False
+
+        print("\n=== Step 2: Creating Prompts ===")
+        planner = Planner(
+            prompt_generator=self.prompt_generator,
+            scheduler=self._create_scheduler(model_name),
+            model_name=model_name.upper(),
+            max_tokens=self.llm_manager.model_max_token(model_name),
+            workers=self.llm_manager.limiter.max_limit,
+            specification_budget=self._create_specification_context(model_name).budget,
+            method_min_tokens=self.method_min_tokens,
+            response_cache=self.response_cache,
+        )
+        run_plan: RunPlan | None = planner.plan(documents=documents, profile=self.llm_manager.load_throughput(model_name))
+        if run_plan is None:
+            print("Failed to create analysis prompts. Aborting.")
+            return False
+
+        print("\n=== Step 3: Run Plan ===")
+        Planner.print_summary(run_plan)
+        plan_path: Path = Path(output_file_path) / "plan.csv"
+        Planner.write_csv(run_plan, str(plan_path))
+        print(f"\tPer-document plan written to {plan_path}")
+        return True
+
+    def _initialize_model(self, model_name: str) -> bool:
+        """Connects to the model, or only checks its configuration if the queue workers send the requests."""
+        if self.job_queue is None:
+            return self.llm_manager.initialize_llm(model_name)
+        if model_name.upper() not in self.llm_manager.model_configs:
+            print(f"[ERROR] Configuration for model '{model_name}' not found.")
+            return False
+        print(f"[INFO] Model requests are processed by the workers of the job queue at {self.job_queue.database_path}")
+        return True
+
+    def _split_documents(self, file_path: str, model_name: str, file_names: List[str] | None = None) -> Dict[str, List[Chunk]]:
+        """Loads and splits the documents with the model-specific chunk size."""
+        with self._SHARED_STATE_LOCK:
+            return self.document_splitter.split_documents(
+                file_path=file_path,
+                chunk_size=self.llm_manager.model_max_chunk(model_name),
+                token_counter=self.llm_manager.count_tokens,
+                file_names=file_names,
+            )
+
+    def _analyze_documents(self, documents: Dict[str, List[Chunk]], model_name: str) -> Dict[str, Dict[str, List[Document]]] | None:
+        """
+        Creates the prompts for the documents and sends them to the LLM.
+
+        Returns:
+            The formatted analysis, structure and specification sections for
+            each document, or None if the prompts could not be created.
+        """
+        self._scheduler = self._create_scheduler(model_name)
+        self._specification_context = self._create_specification_context(model_name)
+        self._makespans = {}
+        self._queue_workers = Counter()
+        self._queue_requeued = 0
+        self._cache_hits = 0
+        self._cache_stored = 0
 
         # Step 3: Create an analysis prompt for each document.
-        print("\n=== Step 3: Creating Prompts for Each Document ===")
-        if self.prompt_generator.create_analysis_prompts(documents=documents):
-            prompts: Dict[str, Dict[str, Tuple[Document, PromptTemplate]]] = self.prompt_generator.get_documents
-        else:
+        print(f"\n=== Step 3: Creating Prompts for Each Document{self._package_label} ===")
+        methods: Dict[str, List[Tuple[Document, ChatPromptTemplate]]] = {}
+        with profiled_stage("prompts"), self._SHARED_STATE_LOCK:
+            created: bool = self.prompt_generator.create_analysis_prompts(documents=documents)
+            if created and self.method_min_tokens > 0:
+                methods = self.prompt_generator.create_method_prompts(documents=documents, min_tokens=self.method_min_tokens)
+            prompts: Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]] = self._take_prompts()
+        if not created:
             print("Failed to generate prompts. Aborting.")
-            return
+            return None
 
         # Step 4: Send the code and prompt to the LLM for analysis.
-        print("\n=== Step 4: Analyzing Documents using Langchain Chain ===")
-        llm: ChatOllama = self.llm_manager.get_llm_model()
-        document: Document
-        prompt: PromptTemplate
+        print(f"\n=== Step 4: Analyzing Documents using Langchain Chain{self._package_label} ===")
         processed_documents: Dict[str, Dict[str, List[Document]]] = {}
         # Step 4.1:  Generate Analysis and Structure of the Code.
-        print("\t=== Step 4.1: Generate Analysis and Structure of the Code ===")
-        for document_name, document_data in prompts.items():
-            # --- Process Analysis Prompt (if it exists) ---
-            if "analysis" in document_data:
-                document, prompt = document_data["analysis"]
-                chain: Runnable = prompt | llm.with_structured_output(Code_Analysis)
-                print(f"\tAnalyzing Document: {document_name}")
-                analysis_result: Dict | BaseModel = chain.invoke({"page_content": document.page_content})
-                if isinstance(analysis_result, Code_Analysis):
-                    page_content = f"## Code Analysis\n\n ### **Summary**:\n{analysis_result.summary}\n\n### **Analysis**:\n{analysis_result.analysis}"
-                    processed_documents.setdefault(document_name, {})["analysis"] = [Document(metadata=document.metadata, page_content=page_content)]
-                    print(f"\tSuccessfully stored analysis for {document_name}")
-                else:
-                    print(f"\t[ERROR] Unexpected result type for analysis of {document_name}: {type(analysis_result)}")
-
-            # --- Process Structure Prompt (if it exists) ---
-            if "structure" in document_data:
-                document, prompt = document_data["structure"]
-                chain: Runnable = prompt | llm.with_structured_output(Code_Structure)
-                print(f"\tStructuring Document: {document_name}")
-                structure_result: Dict | BaseModel = chain.invoke({"page_content": document.page_content})
-                if isinstance(structure_result, Code_Structure):
-                    # Assuming result.page_content holds the structured output
-                    page_content: str = f"## Code Structure\n\n{structure_result.page_content}"
-                    processed_documents.setdefault(document_name, {})["structure"] = [Document(metadata=document.metadata, page_content=page_content)]
-                    print(f"\tSuccessfully stored structure for {document_name}")
-                else:
-                    print(f"\t[ERROR] Unexpected result type for structure of {document_name}: {type(structure_result)}")
+        print(f"\t=== Step 4.1: Generate Analysis and Structure of the Code{self._package_label} ===")
+        self._process_stages(prompts=prompts, stages=("analysis", "structure"), processed_documents=processed_documents, model_name=model_name, methods=methods)
 
         # Step 4.2:  Generate Technical Specification of the Code.
-        print("\t=== Step 4.2: Generate Technical Specification of the Code ===")
-        if self.prompt_generator.create_specification_prompts(processed_documents=processed_documents):
-            prompts: Dict[str, Dict[str, Tuple[Document, PromptTemplate]]] = self.prompt_generator.get_documents
-            for document_name, document_data in prompts.items():
-                # --- Process Technical Specification Prompt (if it exists) ---
-                if "specification" in document_data:
-                    document, prompt = document_data["specification"]
-                    chain: Runnable = prompt | llm
-                    print(f"\tGenerating Technical Specification Document: {document_name}")
-                    specification_result: Dict | BaseModel = chain.invoke({"page_content": document.page_content})
-                    if hasattr(specification_result, "content"):
-                        page_content = f"## Technical Specification\n\n{specification_result.content}"
-                        print(specification_result.content)
-                        processed_documents.setdefault(document_name, {})["specification"] = [Document(metadata=document.metadata, page_content=page_content)]
-                        print(f"\tSuccessfully stored specification for {document_name}")
-                    elif isinstance(specification_result, Technical_Specification):
-                        page_content = f"## Technical Specification\n\n{specification_result.page_content}"
-                        print(specification_result.page_content)
-                        processed_documents.setdefault(document_name, {})["specification"] = [Document(metadata=document.metadata, page_content=page_content)]
-                        print(f"\tSuccessfully stored specification for {document_name}")
-                    else:
-                        print(f"\t[ERROR] Unexpected result type for specification of {document_name}: {type(specification_result)}")
+        print(f"\t=== Step 4.2: Generate Technical Specification of the Code{self._package_label} ===")
+        with profiled_stage("prompts"), self._SHARED_STATE_LOCK:
+            created = self.prompt_generator.create_specification_prompts(processed_documents=processed_documents, context=self._specification_context)
+            prompts = self._take_prompts()
+        if created:
+            self._process_stages(prompts=prompts, stages=("specification",), processed_documents=processed_documents, model_name=model_name)
         else:
             print("\tFailed to generate prompts. Aborting.")
+            return None
+        return processed_documents
+
+    def _take_prompts(self) -> Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]]:
+        """Returns the prompts just created by the shared prompt generator and clears them there for the next caller."""
+        prompts: Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]] = dict(self.prompt_generator.get_documents)
+        self.prompt_generator.clear_documents
+        return prompts
+
+    def _create_scheduler(self, model_name: str) -> Scheduler:
+        """Creates the scheduler, preferring the throughput recorded by previous runs over the configured rates."""
+        profile: ThroughputProfile | None = self.llm_manager.load_throughput(model_name)
+        return Scheduler(
+            token_counter=self.llm_manager.count_tokens,
+            prefill_rate=(profile and profile.prefill_rate) or self.llm_manager.prefill_rate,
+            decode_rate=(profile and profile.decode_rate) or self.llm_manager.decode_rate,
+            max_output_tokens=self.llm_manager.model_max_token(model_name),
+            output_ratios=profile.output_ratios if profile else None,
+        )
+
+    def _create_specification_context(self, model_name: str) -> SpecificationContext:
+        """Creates the builder limiting the specification prompt to the configured share of the model's context."""
+        budget: int = int(self.llm_manager.model_max_token(model_name) * self.llm_manager.specification_context_fraction)
+        template: ChatPromptTemplate | None = self.prompt_generator.get_template("SPECIFICATION")
+        if template is not None:
+            budget -= self.llm_manager.count_tokens(template.format(page_content=""))
+        return SpecificationContext(token_counter=self.llm_manager.count_tokens, budget=budget)
+
+    def _save_results(self, output_file_path: str, model_name: str) -> None:
+        """Writes the raw results of all documents to the results store for `--render-only`."""
+        store = ResultsStore(str(Path(output_file_path) / RESULTS_FILENAME))
+        # Requests finish in scheduling order; the store keeps the order of the report.
+        self._results = {name: self._results[name] for name in self._processed_documents if name in self._results}
+        try:
+            store.save(self._results, model_name=model_name.upper())
+            print(f"Results of {len(self._results)} documents stored at {store.file_path}")
+        except OSError as error:
+            print(f"[WARNING] Could not write the results store {store.file_path}: {error}")
+
+    def _create_report(self, processed_documents: Dict[str, Dict[str, List[Document]]], output_file_path: str, changed: List[str] | None = None) -> bool:
+        """Assembles the analyzed content into the final Markdown document and updates the search index of the changed objects."""
+        print(f"\n=== Step 5: Creating Markdown Document{self._package_label} ===")
+        with profiled_stage("rendering"):
+            created: bool = self.document_creator.create_markdown(
+                documents=processed_documents,
+                output_filename=output_file_path,
+            )
+            if created:
+                print(f"Markdown document created successfully at {output_file_path}")
+                # The index is a secondary output; the report stays valid if it cannot be written.
+                self.document_creator.create_index(documents=processed_documents, output_filename=output_file_path, changed=changed)
+            else:
+                print("Failed to create the final markdown document.")
+        return created
+
+    def _process_stages(
+        self,
+        prompts: Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]],
+        stages: Tuple[str, ...],
+        processed_documents: Dict[str, Dict[str, List[Document]]],
+        model_name: str,
+        methods: Dict[str, List[Tuple[Document, ChatPromptTemplate]]] | None = None,
+    ) -> None:
+        """
+        Sends the prompts of the given stages to the LLM concurrently.
+
+        Requests are ordered longest-first by the `Scheduler` and dispatched
+        from a thread pool while the `Ollama` manager's adaptive limiter decides
+        how many of them are actually in flight, or enqueued in that order for
+        the queue workers. Results are stored in document order, independent
+        of completion order.
+
+        The method requests of decomposed classes run in the same batch; the
+        analysis of each such class is assembled from the analysis of its
+        definition and the analyses of its methods.
+
+        Args:
+            prompts: The prompt dictionary from the `PromptGenerator`.
+            stages: The stages to process (e.g., "analysis", "structure").
+            processed_documents: The dictionary receiving the formatted results.
+            model_name: The model the requests are sent to.
+            methods: The method prompts of the decomposed classes.
+        """
+        methods = methods or {}
+        requests: List[Tuple[str, str, Chunk | Document, ChatPromptTemplate]] = [
+            (document_name, "method", document, prompt) for document_name, method_prompts in methods.items() for document, prompt in method_prompts
+        ]
+        # Longest-processing-time-first order: the pool's FIFO queue starts the most expensive requests first.
+        tasks: List[StageTask] = self._scheduler.plan(prompts=prompts, stages=stages, requests=requests)
+        keys: List[str] = [self.response_cache.key(model_name, task.stage, task.prompt, task.document.page_content) for task in tasks] if self.response_cache else []
+        cached: Dict[str, BaseModel | str] = self._read_cache(keys)
+        indices: List[int] = [index for index in range(len(tasks)) if not keys or keys[index] not in cached]
+        if self.deadline is not None:
+            # The most important documents start first; within a document, the longest-first order is kept.
+            indices.sort(key=lambda index: self._priorities.get(tasks[index].document_name, len(self._priorities)))
+        pending: List[StageTask] = [tasks[index] for index in indices]
+        if cached:
+            print(f"\t{len(tasks) - len(pending)} of {len(tasks)} requests answered from the response cache")
+        if self.deadline is not None:
+            self.deadline.begin_phase(pending, self._scheduler.decode_rate, later_seconds=self._estimate_specifications(tasks) if "analysis" in stages else 0.0)
+
+        started: float = monotonic()
+        with profiled_stage("llm"):
+            if self.job_queue is not None:
+                # Every live worker runs up to the configured number of parallel requests.
+                estimated: float = Scheduler.estimate_makespan(pending, workers=max(1, len(self.job_queue.live_workers())) * self.llm_manager.limiter.max_limit)
+                answers: List[BaseModel | str | None] = self._dispatch(self.job_queue, pending) if pending else []
+            else:
+                estimated = Scheduler.estimate_makespan(pending, workers=self.llm_manager.limiter.limit)
+                if self.request_pool is not None:
+                    answers = self.request_pool.run(self.package or "", pending, self._request_task)
+                else:
+                    with ThreadPoolExecutor(max_workers=self.llm_manager.limiter.max_limit) as executor:
+                        answers = list(executor.map(self._request_task, pending))
+        self._makespans["/".join(stages)] = (estimated, monotonic() - started)
+
+        results: List[BaseModel | str | None] = [cached.get(key) for key in keys] if keys else [None] * len(tasks)
+        for index, answer in zip(indices, answers, strict=True):
+            results[index] = answer
+        if keys:
+            # Results of the brief output and fallback modes would otherwise answer later full runs.
+            self._write_cache(
+                {
+                    keys[index]: (tasks[index].stage, result)
+                    for index in indices
+                    if (result := results[index]) is not None and not (self.deadline is not None and self.deadline.degraded(tasks[index]))
+                }
+            )
+
+        method_results: Dict[Tuple[str, str], BaseModel | str | None] = {
+            (task.document_name, task.document.metadata["method_name"]): result for task, result in zip(tasks, results, strict=True) if task.stage == "method"
+        }
+        completed: Dict[Tuple[str, str], Document] = {}
+        for task, result in zip(tasks, results, strict=True):
+            if task.stage == "method":
+                continue
+            if task.stage == "analysis" and task.document_name in methods and isinstance(result, Code_Analysis):
+                names: List[str] = [document.metadata["method_name"] for document, _ in methods[task.document_name]]
+                result = self._assemble_class_analysis(result, [(name, method_results.get((task.document_name, name))) for name in names])
+            section: Document | None = self._store_section(task.document_name, task.stage, task.document.metadata, result) if result is not None else None
+            if section is not None:
+                completed[(task.document_name, task.stage)] = section
+        for document_name in prompts:
+            for stage in stages:
+                if (document_name, stage) in completed:
+                    processed_documents.setdefault(document_name, {})[stage] = [completed[(document_name, stage)]]
+
+    def _estimate_specifications(self, tasks: List[StageTask]) -> float:
+        """Estimates the specification requests that will follow the given analysis and structure requests."""
+        template: ChatPromptTemplate | None = self.prompt_generator.get_template("SPECIFICATION")
+        if template is None:
+            return 0.0
+        # The specification input is the generated analysis and structure, limited by the context budget.
+        inputs: Dict[str, Tuple[Chunk | Document, int]] = {}
+        for task in tasks:
+            if task.stage in ("analysis", "structure"):
+                document, tokens = inputs.get(task.document_name, (task.document, 0))
+                inputs[task.document_name] = (document, tokens + task.output_tokens)
+        budget: int = self._specification_context.budget if self._specification_context is not None else 0
+        return sum(
+            self._scheduler.estimate(document_name, "specification", document, template, min(tokens, budget) if budget > 0 else tokens).estimated_seconds
+            for document_name, (document, tokens) in inputs.items()
+        )
+
+    @staticmethod
+    def _assemble_class_analysis(definition: Code_Analysis, methods: List[Tuple[str, BaseModel | str | None]]) -> Code_Analysis:
+        """Combines the analysis of a class definition with the analyses of its methods."""
+        sections: List[str] = [definition.analysis.strip(), "### Methods"]
+        for name, result in methods:
+            if isinstance(result, Code_Analysis):
+                sections.append(f"#### `{name}`\n\n{result.summary.strip()}\n\n{result.analysis.strip()}")
+            else:
+                sections.append(f"#### `{name}`\n\nThe analysis of this method failed.")
+        return Code_Analysis(summary=definition.summary, analysis="\n\n".join(sections))
+
+    def _read_cache(self, keys: List[str]) -> Dict[str, BaseModel | str]:
+        """Looks up cached results; an unreadable cache only costs the requests it would have saved."""
+        if self.response_cache is None or not keys:
+            return {}
+        try:
+            cached: Dict[str, BaseModel | str] = self.response_cache.get(keys)
+        except Error as error:
+            print(f"[WARNING] Could not read the response cache {self.response_cache.database_path}: {error}")
+            return {}
+        self._cache_hits += len([key for key in keys if key in cached])
+        return cached
+
+    def _write_cache(self, results: Dict[str, Tuple[str, BaseModel | str]]) -> None:
+        """Adds the new results of a batch to the response cache."""
+        if self.response_cache is None or not results:
             return
+        try:
+            self.response_cache.put(results)
+            self._cache_stored += len(results)
+        except Error as error:
+            print(f"[WARNING] Could not write the response cache {self.response_cache.database_path}: {error}")
 
-        # Step 5: Assemble the analyzed content into a final Markdown document.
-        print("\n=== Step 5: Creating Markdown Document ===")
-        if self.document_creator.create_markdown(
-            documents=processed_documents,
-            output_filename=output_file_path,
-        ):
-            print(f"Markdown document created successfully at {output_file_path}")
-        else:
-            print("Failed to create the final markdown document.")
+    def _dispatch(self, job_queue: JobQueue, tasks: List[StageTask]) -> List[BaseModel | str | None]:
+        """
+        Enqueues the tasks for the queue workers and waits until all of them are finished.
+
+        Expired leases are re-queued while waiting, so the jobs of a worker
+        that stopped responding are taken over by the others.
+
+        Returns:
+            The result of each task, or None if its job failed.
+        """
+        run_id: str = uuid4().hex[:12]
+        job_ids: List[int] = job_queue.enqueue(run_id, [(task.document_name, task.stage, str(task.prompt.metadata["template"]), task.document.page_content) for task in tasks])
+        print(f"\tQueued {len(job_ids)} jobs as run {run_id}")
+        last_report: float = monotonic()
+        while True:
+            requeued: int = job_queue.requeue_expired()
+            if requeued:
+                print(f"\t[WARNING] Re-queued {requeued} jobs whose worker stopped responding")
+            progress: Dict[str, int] = job_queue.progress(run_id)
+            if not progress.get("queued") and not progress.get("leased"):
+                break
+            if monotonic() - last_report >= self._QUEUE_REPORT_SECONDS:
+                last_report = monotonic()
+                workers: int = len(job_queue.live_workers())
+                print(f"\t[INFO] Queue: {progress.get('done', 0)} done, {progress.get('leased', 0)} in progress, {progress.get('queued', 0)} waiting ({workers} live workers)")
+                if not workers:
+                    print("\t[WARNING] No live workers; start one with `main.py --worker --queue <path>`")
+            sleep(self._QUEUE_POLL_SECONDS)
+
+        finished: Dict[int, JobResult] = job_queue.results(run_id)
+        job_queue.delete_run(run_id)
+        results: List[BaseModel | str | None] = []
+        for task, job_id in zip(tasks, job_ids, strict=True):
+            job: JobResult = finished[job_id]
+            self._queue_requeued += max(0, job.attempts - 1)
+            result: BaseModel | str | None = None
+            if job.status == "done" and job.result is not None:
+                try:
+                    result = deserialize_result(loads(job.result))
+                except ValueError as error:
+                    job = replace(job, error=f"unreadable result: {error}")
+            if result is not None:
+                self._queue_workers[job.worker or "unknown"] += 1
+                print(f"\tReceived {task.stage} for {task.document_name} from {job.worker}")
+            else:
+                print(f"\t[ERROR] {task.stage} of {task.document_name} failed on the queue workers: {job.error}")
+            results.append(result)
+        return results
+
+    def _request_task(self, task: StageTask) -> BaseModel | str | None:
+        """Sends the prompt of a scheduled task to the LLM, in the mode the deadline allows."""
+        if self.deadline is None:
+            return self.request_section(task.document_name, task.stage, task.document, task.prompt)
+        level: int | None = self.deadline.admit(task, workers=self.llm_manager.limiter.limit)
+        if level is None:
+            return None
+        try:
+            return self.request_section(task.document_name, task.stage, task.document, task.prompt, level=level)
+        finally:
+            self.deadline.finish(task)
+
+    def request_section(self, document_name: str, stage: str, document: Chunk | Document, prompt: ChatPromptTemplate, level: int = 0) -> BaseModel | str | None:
+        """
+        Sends a single prompt to the LLM.
+
+        Args:
+            level: The mode of a deadline-bounded run; from 2 on, a brief
+                   answer is requested, and from 3 on, the fallback model
+                   of the deadline answers.
+
+        Returns:
+            The structured result of the stage, or None if the request failed.
+        """
+        method: str = f" ({document.metadata['method_name']})" if "method_name" in document.metadata else ""
+        print(f"\t{self._STAGE_ACTIONS[stage]} Document: {document_name}{method}{self._package_label}")
+        max_output_tokens: int | None = None
+        if level >= 2 and stage in BRIEF_OUTPUT_TOKENS:
+            prompt = self.prompt_generator.create_brief_prompt(prompt, BRIEF_OUTPUT_TOKENS[stage])
+            # The cap leaves room for the structured output's JSON around the brief answer.
+            max_output_tokens = 2 * BRIEF_OUTPUT_TOKENS[stage]
+        model_name: str | None = self.deadline.fallback_model if level >= 3 and self.deadline is not None else None
+        result: BaseModel | str | None = self.llm_manager.invoke(
+            stage, prompt, document.page_content, self._STAGE_SCHEMAS[stage], model_name=model_name, max_output_tokens=max_output_tokens
+        )
+        if self.format_section(result) is None:
+            print(f"\t[ERROR] Unexpected result type for {stage} of {document_name}: {type(result)}")
+            return None
+        print(f"\tSuccessfully stored {stage} for {document_name}")
+        return result
+
+    @staticmethod
+    def format_section(result: BaseModel | str | None) -> str | None:
+        """Formats the result of a stage as a Markdown section, or returns None for an unexpected result."""
+        if isinstance(result, Code_Analysis):
+            return f"## Code Analysis\n\n ### **Summary**:\n{result.summary}\n\n### **Analysis**:\n{result.analysis}"
+        if isinstance(result, Code_Structure):
+            return f"## Code Structure\n\n{result.page_content}"
+        if isinstance(result, Technical_Specification):
+            return f"## Technical Specification\n\n{result.page_content}"
+        if isinstance(result, str):
+            return f"## Technical Specification\n\n{result}"
+        return None
+
+    def _store_section(self, document_name: str, stage: str, metadata: Dict[str, Any], result: BaseModel | str) -> Document | None:
+        """Keeps the raw result of a stage for the results store and returns its formatted section."""
+        page_content: str | None = self.format_section(result)
+        if page_content is None:
+            return None
+        stored: StoredDocument = self._results.setdefault(document_name, StoredDocument(name=document_name))
+        stored.metadata = metadata
+        stored.results[stage] = result
+        return Document(metadata=metadata, page_content=page_content)
+
+    def print_request_summary(self) -> None:
+        """Prints the request counters collected by the resilient request layer and stores the run's throughput."""
+        self.llm_manager.save_throughput()
+        print("\n=== Step 6: Run Summary ===")
+        stats: Dict[str, int] = self.llm_manager.request_stats.as_dict()
+        print(f"\tModel requests: {stats['requests']}")
+        print(f"\tRetries: {stats['retries']} (timeouts: {stats['timeouts']})")
+        print(f"\tRepaired structured outputs: {stats['repaired']}")
+        print(f"\tHedged requests: {stats['hedged']} (won by hedge: {stats['hedge_wins']})")
+        print(f"\tFailed requests: {stats['failures']}")
+        print(f"\tCoalesced requests: {stats['coalesced'] + stats['coalesced_remote']} (from other processes: {stats['coalesced_remote']})")
+        limiter: AdaptiveLimiter = self.llm_manager.limiter
+        print(f"\tConcurrency limit: {limiter.limit} (peak: {limiter.peak_limit}, adjustments: {len(limiter.decisions)})")
+
+    @property
+    def run_counts(self) -> Dict[str, int]:
+        """The documents of the last run and the requests answered from and added to the response cache."""
+        return {"documents": len(self._processed_documents), "cache_hits": self._cache_hits, "cache_stored": self._cache_stored}
+
+    def _print_run_summary(self) -> None:
+        """Prints the request counters of the run and the details of this orchestrator's documents."""
+        self.print_request_summary()
+        if self.response_cache is not None:
+            print(f"\tResponse cache: {self._cache_hits} requests answered, {self._cache_stored} results added")
+        if self.job_queue is not None:
+            workers: str = ", ".join(f"{worker}: {count}" for worker, count in self._queue_workers.most_common())
+            print(f"\tQueue jobs by worker: {workers or 'none'} (expired leases re-queued: {self._queue_requeued})")
+        if self._specification_context is not None:
+            trimmed_documents, trimmed_tokens, original_tokens, duplicate_lines = self._specification_context.summary()
+            print(
+                f"\tSpecification input: trimmed {trimmed_tokens} of {original_tokens} tokens in {trimmed_documents} documents "
+                f"(budget: {self._specification_context.budget} tokens, repeated lines removed: {duplicate_lines})"
+            )
+            for document_name, trim in self._specification_context.largest_trims():
+                sections: str = ", ".join(trim.reduced_sections) or "repeated lines only"
+                print(f"\t\t{document_name}: {trim.original_tokens} -> {trim.tokens} tokens (reduced: {sections})")
+        if self.deadline is not None:
+            met: str = "met" if self.deadline.remaining >= 0 else f"missed by {-self.deadline.remaining:.0f}s"
+            print(f"\tDeadline: {met}, final mode: {self.deadline.mode}, skipped requests: {self.deadline.skipped}, stale sections: {self._stale_sections}")
+        for phase, (estimated, actual) in self._makespans.items():
+            print(f"\tMakespan {phase}: estimated {estimated:.1f}s, actual {actual:.1f}s")
+        if self._makespans:
+            total_estimated: float = sum(estimated for estimated, _ in self._makespans.values())
+            total_actual: float = sum(actual for _, actual in self._makespans.values())
+            print(f"\tMakespan total: estimated {total_estimated:.1f}s, actual {total_actual:.1f}s")
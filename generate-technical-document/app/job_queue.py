@@ -0,0 +1,249 @@
+"""
+Shares the model requests of a run with workers on other machines.
+
+This module contains the `JobQueue` class, a durable job queue in an SQLite
+file that a coordinator and any number of workers open on a shared mount
+(e.g., NFS), so no message broker is needed. The coordinator enqueues one job
+per document and stage; a worker claims a job under a lease, extends the lease
+with heartbeats while its model works on the job, and writes the structured
+result back. A job whose lease expires, because its worker died or lost the
+mount, is put back into the queue and claimed by another worker.
+
+SQLite's write-ahead log relies on shared memory and does not work across
+machines, so the database uses the rollback journal and every state change is
+a short `BEGIN IMMEDIATE` transaction. Leases are wall-clock timestamps, so
+the clocks of the nodes must be synchronized (e.g., by NTP) to well below the
+lease duration.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from sqlite3 import Connection, Cursor, connect
+from time import time
+from typing import Dict, Iterator, List, Tuple
+
+_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    document_name TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    template TEXT NOT NULL,
+    page_content TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, position);
+CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run_id, status);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    model TEXT,
+    heartbeat_at REAL NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@dataclass(frozen=True)
+class QueuedJob:
+    """A stage request claimed by a worker."""
+
+    id: int
+    run_id: str
+    document_name: str
+    stage: str
+    template: str
+    page_content: str
+    attempts: int
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """The outcome of a finished job."""
+
+    status: str
+    worker: str | None
+    attempts: int
+    # The serialized stage result (see `app.results_store.serialize_result`).
+    result: str | None
+    error: str | None
+
+
+class JobQueue:
+    """
+    Stores stage jobs, their leases and results in a shared SQLite database.
+
+    Every method opens its own short-lived connection, so one instance can be
+    used from any number of threads.
+    """
+
+    def __init__(self, database_path: str, lease_seconds: float = 60.0, max_attempts: int = 3) -> None:
+        """
+        Initializes the queue.
+
+        Args:
+            database_path: The path of the SQLite database on the shared mount.
+            lease_seconds: How long a claimed job stays with its worker without
+                           a heartbeat before it is re-queued.
+            max_attempts: How many leases of a job may expire before the job is
+                          marked as failed instead of re-queued.
+        """
+        self.database_path = Path(database_path)
+        self.lease_seconds: float = lease_seconds
+        self.max_attempts: int = max_attempts
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Connection]:
+        """Opens the database and holds its write lock for the duration of the block."""
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        connection: Connection = connect(self.database_path, timeout=60, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode = DELETE")
+            connection.executescript(_SCHEMA)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def enqueue(self, run_id: str, jobs: List[Tuple[str, str, str, str]]) -> List[int]:
+        """
+        Adds the jobs of a run in the order they should be claimed.
+
+        Args:
+            run_id: The identifier of the coordinator's run.
+            jobs: The document name, stage, template file and page content of each job.
+
+        Returns:
+            The ids of the added jobs, in the given order.
+        """
+        now: float = time()
+        ids: List[int] = []
+        with self._transaction() as connection:
+            for position, job in enumerate(jobs):
+                cursor: Cursor = connection.execute(
+                    "INSERT INTO jobs (run_id, position, document_name, stage, template, page_content, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, position, *job, now),
+                )
+                ids.append(cursor.lastrowid or 0)
+        return ids
+
+    def claim(self, worker_id: str) -> QueuedJob | None:
+        """Leases the next queued job to a worker, re-queuing expired leases first."""
+        now: float = time()
+        with self._transaction() as connection:
+            self._requeue_expired(connection, now)
+            row: Tuple | None = connection.execute(
+                "SELECT id, run_id, document_name, stage, template, page_content, attempts FROM jobs WHERE status = 'queued' ORDER BY position, id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row[0]),
+            )
+        return QueuedJob(*row[:6], attempts=row[6] + 1)
+
+    def heartbeat(self, worker_id: str, model_name: str) -> int:
+        """
+        Extends the leases of a worker's jobs and marks the worker as alive.
+
+        Returns:
+            The number of jobs currently leased to the worker.
+        """
+        now: float = time()
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO workers (id, model, heartbeat_at) VALUES (?, ?, ?) ON CONFLICT (id) DO UPDATE SET model = excluded.model, heartbeat_at = excluded.heartbeat_at",
+                (worker_id, model_name, now),
+            )
+            return connection.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, worker_id),
+            ).rowcount
+
+    def complete(self, job_id: int, worker_id: str, result: str | None, error: str | None = None) -> bool:
+        """
+        Stores the result of a job, or marks it as failed if there is none.
+
+        A late result of a job whose lease expired is still accepted as long
+        as no other worker has finished the job in the meantime.
+
+        Returns:
+            True if the result was stored.
+        """
+        status: str = "done" if result is not None else "failed"
+        with self._transaction() as connection:
+            stored: bool = (
+                connection.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, result = ?, error = ?, lease_expires = NULL, updated_at = ? WHERE id = ? AND status IN ('queued', 'leased')",
+                    (status, worker_id, result, error, time(), job_id),
+                ).rowcount
+                > 0
+            )
+            if stored:
+                column: str = "completed" if status == "done" else "failed"
+                connection.execute(f"UPDATE workers SET {column} = {column} + 1 WHERE id = ?", (worker_id,))
+        return stored
+
+    def release(self, worker_id: str) -> int:
+        """Puts the jobs leased to a stopping worker back into the queue and returns their number."""
+        with self._transaction() as connection:
+            return connection.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL, attempts = MAX(attempts - 1, 0), updated_at = ? WHERE worker = ? AND status = 'leased'",
+                (time(), worker_id),
+            ).rowcount
+
+    def requeue_expired(self) -> int:
+        """Re-queues the jobs whose lease has expired and returns their number."""
+        with self._transaction() as connection:
+            return self._requeue_expired(connection, time())
+
+    def _requeue_expired(self, connection: Connection, now: float) -> int:
+        """Re-queues expired jobs, failing those that used up their attempts."""
+        connection.execute(
+            "UPDATE jobs SET status = 'failed', error = 'lease expired too often', lease_expires = NULL, updated_at = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+        return connection.execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL, updated_at = ? WHERE status = 'leased' AND lease_expires < ?",
+            (now, now),
+        ).rowcount
+
+    def progress(self, run_id: str) -> Dict[str, int]:
+        """Returns the number of jobs of a run per status."""
+        with self._transaction() as connection:
+            return dict(connection.execute("SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (run_id,)).fetchall())
+
+    def results(self, run_id: str) -> Dict[int, JobResult]:
+        """Returns the finished jobs of a run by their id."""
+        with self._transaction() as connection:
+            return {
+                row[0]: JobResult(*row[1:])
+                for row in connection.execute("SELECT id, status, worker, attempts, result, error FROM jobs WHERE run_id = ? AND status IN ('done', 'failed')", (run_id,))
+            }
+
+    def live_workers(self) -> List[Tuple[str, str | None, int, int]]:
+        """Returns the id, model, completed and failed jobs of the workers with a heartbeat within the lease duration."""
+        with self._transaction() as connection:
+            return connection.execute(
+                "SELECT id, model, completed, failed FROM workers WHERE heartbeat_at >= ? ORDER BY id",
+                (time() - self.lease_seconds,),
+            ).fetchall()
+
+    def delete_run(self, run_id: str) -> None:
+        """Removes all jobs of a run once its results have been collected."""
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM jobs WHERE run_id = ?", (run_id,))
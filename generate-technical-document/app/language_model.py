@@ -3,20 +3,224 @@ Manages the connection and interaction with the Ollama language model.
 
 This module provides a singleton wrapper class `Ollama` for the LangChain
 `ChatOllama` instance. It handles loading configuration from environment
-variables, initializing the model, testing the connection, and providing
-helper utilities like token counting.
+variables, initializing the model, testing the connection, sending requests
+through the resilient request layer, and providing helper utilities like
+token counting.
+
+Identical requests that are in flight at the same time, within the process
+or, with `OLLAMA_SINGLE_FLIGHT=host`, in other processes of the host, share
+one generation through the `SingleFlight` layer.
+
+With `OLLAMA_BACKEND=direct`, requests bypass LangChain: the `DirectChatClient`
+posts to Ollama's `/api/chat` through one pooled asynchronous HTTP client,
+passes the JSON schema of the structured output in the native `format` field
+and validates the answer with the schema's prebuilt Pydantic validator. The
+`Ollama.invoke` interface, the resilient request layer, the adaptive limiter
+and the throughput recording are the same for both backends.
+
+`langchain_ollama`, `httpx` and `tiktoken` are imported only when a model is
+created or tokens are counted for the first time, which keeps the startup of
+the command line fast.
 """
 
+from app.concurrency import AdaptiveLimiter
+from app.config import DEFAULT_SINGLE_FLIGHT_PATH, DEFAULT_THROUGHPUT_PATH
+from app.profiler import is_profiling, record_timing
+from app.resilience import RequestAttempt, RequestPolicy, RequestStats, ResilientInvoker, reparse_structured_output
+from app.single_flight import SingleFlight
+from app.throughput import ThroughputProfile, ThroughputRecorder, load_profile
+from asyncio import AbstractEventLoop, new_event_loop, run_coroutine_threadsafe
+from concurrent.futures import Future
 from dataclasses import dataclass
-from dotenv import load_dotenv
+from functools import cache
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.messages.base import BaseMessage
-from langchain_ollama import ChatOllama
+from langchain_core.prompts.chat import ChatPromptTemplate
+from langchain_core.runnables import Runnable
 from os import getenv
-from tiktoken import Encoding, get_encoding
-from typing import ClassVar, Dict, Self
+from pydantic import BaseModel, ValidationError
+from threading import Lock, Thread
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Any, ClassVar, Dict, List, Self, Tuple, Type
+
+if TYPE_CHECKING:
+    from httpx import AsyncClient
+    from langchain_ollama import ChatOllama
+    from tiktoken import Encoding
+
+# The backends `Ollama.invoke` can send requests through.
+BACKENDS: Tuple[str, ...] = ("langchain", "direct")
+# The scopes in which identical in-flight requests are coalesced.
+SINGLE_FLIGHT_SCOPES: Tuple[str, ...] = ("off", "process", "host")
+# Stands in for the page content while a chat prompt is compiled into message halves.
+_CONTENT_MARKER: str = "\x00page_content\x00"
+
+
+@cache
+def _load_encoding() -> "Encoding | None":
+    """
+    Loads the Tiktoken encoding once per process.
+
+    Returns None if the encoding cannot be loaded (e.g., its vocabulary cannot
+    be downloaded on an offline host), so the failure is not retried on every
+    call.
+    """
+    try:
+        from tiktoken import get_encoding
+
+        return get_encoding("cl100k_base")
+    except Exception as error:
+        print(f"[WARNING] Tiktoken encoding unavailable, counting characters instead: {error}")
+        return None
+
+
+class _ModelWait(BaseCallbackHandler):
+    """Measures the time a chain spends in the model call, excluding prompt formatting and output parsing."""
+
+    def __init__(self) -> None:
+        """Initializes the timer."""
+        self.started: float | None = None
+        self.seconds: float = 0.0
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, **kwargs: Any) -> None:
+        """Starts timing when the messages are handed to the model."""
+        self.started = perf_counter()
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        """Stops timing when the model has answered."""
+        if self.started is not None:
+            self.seconds = perf_counter() - self.started
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        """Stops timing when the model call failed."""
+        self.on_llm_end(None)
+
+
+@dataclass(frozen=True)
+class DirectResponse:
+    """
+    The answer of a direct chat request.
+
+    `response_metadata` holds the token counts and durations reported by
+    Ollama under the same keys as a LangChain message, so the limiter and the
+    throughput recorder read both backends alike.
+    """
 
-# Load environment variables once when the module is imported.
-load_dotenv()
+    content: str
+    response_metadata: Dict[str, Any]
+
+
+class DirectChatClient:
+    """
+    Sends chat requests to Ollama without LangChain.
+
+    One `httpx.AsyncClient` with a bounded connection pool serves all
+    requests of the process on an event loop in a background thread. Callers
+    stay synchronous: every request blocks its calling thread until the loop
+    has received the answer, so the resilient request layer is unchanged.
+    The chat prompt of every template is compiled once into the text before
+    and after the page content, and the JSON schema of every output model is
+    generated once.
+    """
+
+    def __init__(self, model: str, options: Dict[str, Any], keep_alive: int | str, timeout: float, max_connections: int) -> None:
+        """
+        Initializes the client and starts its event loop.
+
+        Args:
+            model: The Ollama model name (e.g., "mistral:7b-instruct").
+            options: The model options sent with every request (e.g., "num_ctx").
+            keep_alive: How long Ollama keeps the model loaded after a request.
+            timeout: The backstop timeout of a single HTTP request in seconds.
+            max_connections: The size of the connection pool.
+        """
+        from httpx import AsyncClient, Limits, Timeout
+
+        self.model: str = model
+        self.options: Dict[str, Any] = options
+        self.keep_alive: int | str = keep_alive
+        self._loop: AbstractEventLoop = new_event_loop()
+        Thread(target=self._loop.run_forever, name="ollama-direct", daemon=True).start()
+        limits = Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client: "AsyncClient" = AsyncClient(limits=limits, timeout=Timeout(timeout, connect=10.0))
+        self._messages: Dict[str, List[Tuple[str, str, str]]] = {}
+        self._schemas: Dict[Type[BaseModel], Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def chat(
+        self,
+        base_url: str,
+        prompt: ChatPromptTemplate,
+        page_content: str,
+        schema: Type[BaseModel] | None = None,
+        model: str | None = None,
+        options: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> DirectResponse:
+        """
+        Sends a chat prompt with the page content and waits for the complete answer.
+
+        Args:
+            model: An optional other model for this request.
+            options: Model options replacing those of the client for this request.
+            timeout: An optional time limit after which the request is cancelled.
+
+        Raises:
+            httpx.HTTPError: If the request fails or Ollama answers with an error status.
+            TimeoutError: If no answer arrived within the time limit.
+        """
+        body: Dict[str, Any] = {
+            "model": model or self.model,
+            "messages": [{"role": role, "content": before + page_content + after} for role, before, after in self._compile(prompt)],
+            "stream": False,
+            "options": {**self.options, **options} if options else self.options,
+            "keep_alive": self.keep_alive,
+        }
+        if schema is not None:
+            body["format"] = self._schema(schema)
+        future: Future = run_coroutine_threadsafe(self._post(base_url, body), self._loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            # Cancels the request on the event loop, which closes its connection.
+            future.cancel()
+            raise
+
+    async def _post(self, base_url: str, body: Dict[str, Any]) -> DirectResponse:
+        """Posts a chat request on the shared connection pool."""
+        response = await self._client.post(f"{base_url.rstrip('/')}/api/chat", json=body)
+        response.raise_for_status()
+        data: Dict[str, Any] = response.json()
+        message: Dict[str, Any] = data.pop("message", None) or {}
+        return DirectResponse(content=message.get("content") or "", response_metadata=data)
+
+    def _compile(self, prompt: ChatPromptTemplate) -> List[Tuple[str, str, str]]:
+        """
+        Returns the role and the text before and after the page content of each message of a prompt.
+
+        Prompts are cached by the template name in their metadata; ad-hoc
+        prompts without one are compiled for every request.
+        """
+        template: str | None = (prompt.metadata or {}).get("template")
+        compiled: List[Tuple[str, str, str]] | None = self._messages.get(template) if template else None
+        if compiled is None:
+            roles: Dict[str, str] = {"human": "user", "ai": "assistant"}
+            compiled = []
+            for message in prompt.format_messages(page_content=_CONTENT_MARKER):
+                text: str = str(message.content)
+                before, marker, after = text.partition(_CONTENT_MARKER)
+                compiled.append((roles.get(message.type, message.type), before if marker else text, after))
+            if template:
+                with self._lock:
+                    self._messages[template] = compiled
+        return compiled
+
+    def _schema(self, schema: Type[BaseModel]) -> Dict[str, Any]:
+        """Returns the JSON schema of an output model, generated once per model."""
+        if schema not in self._schemas:
+            with self._lock:
+                self._schemas[schema] = schema.model_json_schema()
+        return self._schemas[schema]
 
 
 @dataclass(frozen=True, order=True)
@@ -52,14 +256,57 @@ class Ollama:
         if not hasattr(self, "_initialized"):
             self._initialized: bool = False
             self._is_connected: bool = False
-            self._llm: ChatOllama
+            self._llm: "ChatOllama"
+            self._hedge_llm: "ChatOllama | None" = None
+            self._direct: DirectChatClient | None = None
+            # Instances for other models or output caps, by model key and cap.
+            self._variants: Dict[Tuple[str, int | None], "ChatOllama"] = {}
+            self._variants_lock = Lock()
+            self._model_name: str | None = None
+            self._backend: str | None = None
             self._load_all_configs()
+            self.request_stats: RequestStats = RequestStats()
+            self.throughput: ThroughputRecorder = ThroughputRecorder()
+            self.throughput_path: str = DEFAULT_THROUGHPUT_PATH
+            # The tokens of each prompt template without content, counted once for the throughput records.
+            self._template_tokens: Dict[str, int] = {}
+            self._invoker: ResilientInvoker = ResilientInvoker(policy=self.request_policy, stats=self.request_stats)
+            self.single_flight: SingleFlight | None = self._create_single_flight()
+            self.limiter: AdaptiveLimiter = AdaptiveLimiter(
+                initial_limit=int(getenv("OLLAMA_PARALLEL_INITIAL", 1)),
+                max_limit=int(getenv("OLLAMA_MAX_PARALLEL", 4)),
+                tolerance=float(getenv("OLLAMA_PARALLEL_TOLERANCE", 0.2)),
+            )
 
     def _load_all_configs(self) -> None:
         """Loads all model configurations from environment variables."""
         self.base_url: str = getenv("OLLAMA_MODEL_BASE_URL", "http://localhost:11434")
         self.temperature = float(getenv("OLLAMA_MODEL_TEMPERATURE", 0.1))
         self.num_gpu = int(getenv("OLLAMA_GPU", 8))
+        # How long Ollama keeps the model and its prompt cache loaded after a request (e.g., "30m", or -1 for indefinitely).
+        keep_alive: str = getenv("OLLAMA_MODEL_KEEP_ALIVE", "30m").strip()
+        self.keep_alive: int | str = int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+        # Throughput assumptions used to estimate request costs for scheduling.
+        self.prefill_rate = float(getenv("OLLAMA_PREFILL_TOKENS_PER_SECOND", 1000))
+        self.decode_rate = float(getenv("OLLAMA_DECODE_TOKENS_PER_SECOND", 30))
+        # The share of a model's context the whole specification prompt may use; the rest is left for the output.
+        self.specification_context_fraction = float(getenv("OLLAMA_SPECIFICATION_CONTEXT_FRACTION", 0.5))
+        # An optional second endpoint that receives hedged duplicates of slow requests.
+        self.hedge_base_url: str | None = getenv("OLLAMA_HEDGE_BASE_URL") or None
+        # How requests are sent: through LangChain's ChatOllama or directly to the chat API.
+        self.backend: str = getenv("OLLAMA_BACKEND", "langchain").strip().lower()
+        # An optional smaller model (e.g., "LLAMA") that takes over the remaining requests when a run falls behind its deadline.
+        self.deadline_model: str | None = (getenv("OLLAMA_DEADLINE_MODEL") or "").strip().upper() or None
+        # Where identical in-flight requests are coalesced: not at all, within the process, or across the processes of the host.
+        self.single_flight_scope: str = getenv("OLLAMA_SINGLE_FLIGHT", "process").strip().lower()
+
+        self.request_policy = RequestPolicy(
+            default_timeout=float(getenv("OLLAMA_REQUEST_TIMEOUT", 600)),
+            min_timeout=float(getenv("OLLAMA_REQUEST_MIN_TIMEOUT", 30)),
+            timeout_multiplier=float(getenv("OLLAMA_REQUEST_TIMEOUT_MULTIPLIER", 3)),
+            max_retries=int(getenv("OLLAMA_REQUEST_MAX_RETRIES", 2)),
+            backoff_base=float(getenv("OLLAMA_REQUEST_BACKOFF", 2)),
+        )
 
         self.model_configs: Dict[str, ModelConfig] = {}
         for model_key in ["QWEN", "GEMMA", "LLAMA", "DEEPSEEK", "CODELLAMA", "MISTRAL"]:  # Use a different variable name for clarity
@@ -89,39 +336,306 @@ class Ollama:
         if not config:
             print(f"[ERROR] Configuration for model '{model_name}' not found.")
             return False
+        if self.backend not in BACKENDS:
+            print(f"[ERROR] Unknown backend '{self.backend}'. Choose one of: {', '.join(BACKENDS)}")
+            return False
+        if self._initialized and self._model_name == model_name.upper() and self._backend == self.backend:
+            print(f"[INFO] Reusing warm connection for model '{model_name}'")
+            return True
 
         try:
-            self._llm = self._create_llm_instance(config)
+            if self.backend == "direct":
+                self._direct = self._create_direct_client(config)
+                print(f"[INFO] Sending requests directly to the Ollama chat API of {self.base_url}")
+            else:
+                self._llm = self._create_llm_instance(config)
+                self._direct = None
+            self._variants = {}
+            if self.hedge_base_url:
+                if self._direct is None:
+                    self._hedge_llm = self._create_llm_instance(config, base_url=self.hedge_base_url)
+                print(f"[INFO] Hedged requests enabled against {self.hedge_base_url}")
             self._is_connected = self._test_connection()
             self._initialized = self._is_connected
+            self._model_name = model_name.upper()
+            self._backend = self.backend
             return self._is_connected
         except Exception as error:
             print(f"[ERROR] Ollama initialization failed: {str(error)}")
             return False
 
-    def get_llm_model(self) -> ChatOllama:
+    def get_llm_model(self) -> "ChatOllama":
         """Provides access to the initialized ChatOllama model instance."""
         if not self._initialized or not hasattr(self, "_llm"):
             raise Exception("LLM not initialized. Call initialize_llm() first.")
         return self._llm
 
-    def _create_llm_instance(self, config: ModelConfig) -> ChatOllama:
+    def invoke(
+        self,
+        stage: str,
+        prompt: ChatPromptTemplate,
+        page_content: str,
+        schema: Type[BaseModel] | None = None,
+        model_name: str | None = None,
+        max_output_tokens: int | None = None,
+    ) -> BaseModel | str | None:
+        """
+        Sends a prompt to the model through the resilient request layer.
+
+        An identical request (same model parameters, schema, template and
+        content) that is already in flight is not sent again; this request
+        waits for its result. Requests for another model or with an output
+        cap are neither hedged nor recorded by the limiter and the throughput
+        profile, whose baselines describe the regular requests of the
+        initialized model.
+
+        Args:
+            stage: The pipeline stage of the request (e.g., "analysis").
+            prompt: The prompt template to fill with the page content.
+            page_content: The content substituted into the template.
+            schema: An optional Pydantic model for structured output. If
+                    omitted, the plain text of the response is returned.
+            model_name: An optional other configured model (e.g., "LLAMA") for this request.
+            max_output_tokens: An optional cap of the tokens generated for this request.
+
+        Returns:
+            The parsed model instance or response text, or None if the request
+            failed after all retries.
+        """
+        config: ModelConfig | None = self.model_configs.get((model_name or self._model_name or "").upper())
+        if self.single_flight is None or config is None:
+            return self._invoke(stage, prompt, page_content, schema, model_name, max_output_tokens)
+        output_tokens: int = min(max_output_tokens or config.max_tokens, config.max_tokens)
+        parameters: Tuple[Any, ...] = (self.base_url, config.name, config.max_tokens, output_tokens, self.temperature)
+        return self.single_flight.run(
+            self.single_flight.key(parameters, prompt, page_content, schema),
+            lambda: self._invoke(stage, prompt, page_content, schema, model_name, max_output_tokens),
+        )
+
+    def _invoke(
+        self,
+        stage: str,
+        prompt: ChatPromptTemplate,
+        page_content: str,
+        schema: Type[BaseModel] | None,
+        model_name: str | None,
+        max_output_tokens: int | None,
+    ) -> BaseModel | str | None:
+        """Sends a prompt through the backend of the initialized model (see `invoke`)."""
+        variant: bool = model_name is not None or max_output_tokens is not None
+        if self._direct is not None:
+            return self._invoke_direct(self._direct, stage, prompt, page_content, schema, model_name, max_output_tokens)
+        constructing: float = perf_counter()
+        primary: Runnable = self._create_chain(self._variant_llm(model_name, max_output_tokens) if variant else self.get_llm_model(), prompt, schema)
+        hedge: Runnable | None = self._create_chain(self._hedge_llm, prompt, schema) if self._hedge_llm and not variant else None
+        record_timing("chain construction", perf_counter() - constructing)
+        inputs: Dict[str, str] = {"page_content": page_content}
+        prompt_tokens: int = self._count_prompt(prompt, page_content) if not variant else 0
+
+        def parse(response: Any) -> BaseModel | str | None:
+            if schema is None:
+                content: Any = getattr(response, "content", None)
+                return content if isinstance(content, str) and content.strip() else None
+            if isinstance(response.get("parsed"), schema):
+                return response["parsed"]
+            repairing: float = perf_counter()
+            repaired: BaseModel | None = reparse_structured_output(response.get("raw"), schema)
+            record_timing("structured output repair", perf_counter() - repairing)
+            if repaired is not None:
+                self.request_stats.increment("repaired")
+            return repaired
+
+        return self._invoker.invoke(
+            stage=stage,
+            request=lambda request_attempt: self._send(stage, primary, inputs, request_attempt, record=not variant, prompt_tokens=prompt_tokens),
+            parse=parse,
+            hedge_request=(lambda: hedge.invoke(inputs)) if hedge else None,
+        )
+
+    def _invoke_direct(
+        self,
+        client: DirectChatClient,
+        stage: str,
+        prompt: ChatPromptTemplate,
+        page_content: str,
+        schema: Type[BaseModel] | None,
+        model_name: str | None = None,
+        max_output_tokens: int | None = None,
+    ) -> BaseModel | str | None:
+        """Sends a prompt through the direct backend with the same retries, hedging and repair as the LangChain chain."""
+        variant: bool = model_name is not None or max_output_tokens is not None
+        model: str | None = None
+        options: Dict[str, Any] = {}
+        if model_name is not None:
+            config: ModelConfig = self.model_configs[model_name.upper()]
+            model, options = config.name, {"num_ctx": config.max_tokens, "num_predict": config.max_tokens}
+        if max_output_tokens is not None:
+            options["num_predict"] = min(max_output_tokens, options.get("num_predict") or client.options["num_predict"])
+        prompt_tokens: int = self._count_prompt(prompt, page_content) if not variant else 0
+
+        def parse(response: DirectResponse) -> BaseModel | str | None:
+            if schema is None:
+                return response.content if response.content.strip() else None
+            parsing: float = perf_counter()
+            try:
+                return schema.model_validate_json(response.content)
+            except ValidationError:
+                repaired: BaseModel | None = reparse_structured_output(response.content, schema)
+                if repaired is not None:
+                    self.request_stats.increment("repaired")
+                return repaired
+            finally:
+                record_timing("output validation", perf_counter() - parsing)
+
+        def send(base_url: str, request_attempt: RequestAttempt) -> DirectResponse:
+            waiting: float = perf_counter()
+            with self.limiter.slot() as slot:
+                request_attempt.start()
+                request_attempt.on_timeout(lambda: self.limiter.abandon(slot))
+                if is_profiling():
+                    record_timing("concurrency slot wait", perf_counter() - waiting)
+                sending: float = perf_counter()
+                response: DirectResponse = client.chat(base_url, prompt, page_content, schema, model, options, request_attempt.timeout)
+                if is_profiling():
+                    record_timing("model wait", perf_counter() - sending)
+                if request_attempt.timed_out:
+                    slot.failed = True
+                elif not variant:
+                    slot.record_response(response)
+                    self.throughput.record(stage, response, monotonic() - slot.started, prompt_tokens)
+                return response
+
+        hedge_url: str | None = self.hedge_base_url if not variant else None
+        return self._invoker.invoke(
+            stage=stage,
+            request=lambda request_attempt: send(self.base_url, request_attempt),
+            parse=parse,
+            hedge_request=(lambda: client.chat(hedge_url, prompt, page_content, schema)) if hedge_url else None,
+        )
+
+    def _send(self, stage: str, chain: Runnable, inputs: Dict[str, str], request_attempt: RequestAttempt, record: bool = True, prompt_tokens: int = 0) -> Any:
+        """
+        Sends a request to the primary endpoint within the adaptive concurrency limit.
+
+        The attempt's timeout starts once the request holds a slot. A request
+        that timed out frees its slot at once, although the chain keeps
+        waiting for the model until the backstop timeout of its HTTP client,
+        and is reported to the limiter as a failure.
+        While profiling, the time spent waiting for a concurrency slot and for
+        the model is recorded apart from the local work of the chain, i.e.
+        formatting the prompt and parsing the response into the Pydantic schema.
+        With `record` unset, the response is not reported to the limiter and
+        the throughput recorder. `prompt_tokens` is the size of the prompt as
+        counted by the application, which the throughput recorder relates the
+        output to.
+        """
+        waiting: float = perf_counter()
+        with self.limiter.slot() as slot:
+            request_attempt.start()
+            request_attempt.on_timeout(lambda: self.limiter.abandon(slot))
+            if is_profiling():
+                record_timing("concurrency slot wait", perf_counter() - waiting)
+                model_wait = _ModelWait()
+                sending: float = perf_counter()
+                response: Any = chain.invoke(inputs, config={"callbacks": [model_wait]})
+                record_timing("model wait", model_wait.seconds)
+                record_timing("prompt formatting and output parsing", perf_counter() - sending - model_wait.seconds)
+            else:
+                response = chain.invoke(inputs)
+            if request_attempt.timed_out:
+                slot.failed = True
+            elif record:
+                slot.record_response(response)
+                self.throughput.record(stage, response, monotonic() - slot.started, prompt_tokens)
+            return response
+
+    def _count_prompt(self, prompt: ChatPromptTemplate, page_content: str) -> int:
+        """Counts the tokens of a prompt the way the `Scheduler` estimates it: the template plus the content."""
+        template: str = (prompt.metadata or {}).get("template") or prompt.format(page_content="")
+        if template not in self._template_tokens:
+            self._template_tokens[template] = self.count_tokens(prompt.format(page_content=""))
+        return self._template_tokens[template] + self.count_tokens(page_content)
+
+    def save_throughput(self) -> None:
+        """Stores the throughput of the current run in the profile of the active model."""
+        if self._model_name:
+            self.throughput.save(self.throughput_path, self._model_name)
+
+    def load_throughput(self, model_name: str) -> ThroughputProfile | None:
+        """Returns the throughput recorded by previous runs of a model, if any."""
+        return load_profile(self.throughput_path, model_name)
+
+    @staticmethod
+    def _create_chain(llm: "ChatOllama", prompt: ChatPromptTemplate, schema: Type[BaseModel] | None) -> Runnable:
+        """Builds the chain for a request, keeping the raw message for JSON repair."""
+        if schema is None:
+            return prompt | llm
+        return prompt | llm.with_structured_output(schema, include_raw=True)
+
+    def _variant_llm(self, model_name: str | None, max_output_tokens: int | None) -> "ChatOllama":
+        """Returns the ChatOllama instance for another model or an output cap, created once per combination."""
+        key: Tuple[str, int | None] = ((model_name or self._model_name or "").upper(), max_output_tokens)
+        with self._variants_lock:
+            if key not in self._variants:
+                config: ModelConfig = self.model_configs[key[0]]
+                self._variants[key] = self._create_llm_instance(config, num_predict=min(max_output_tokens or config.max_tokens, config.max_tokens))
+            return self._variants[key]
+
+    def _create_llm_instance(self, config: ModelConfig, base_url: str | None = None, num_predict: int | None = None) -> "ChatOllama":
         """Creates an instance of the ChatOllama model."""
+        from langchain_ollama import ChatOllama
+
         return ChatOllama(
             model=config.name,
-            base_url=self.base_url,
+            base_url=base_url or self.base_url,
             temperature=self.temperature,
             num_ctx=config.max_tokens,
-            num_predict=config.max_tokens,
+            num_predict=num_predict or config.max_tokens,
             num_gpu=self.num_gpu,
+            keep_alive=self.keep_alive,
             top_k=2,
             top_p=0.5,
+            # Backstop for the HTTP client so abandoned requests eventually release their thread.
+            client_kwargs={"timeout": self.request_policy.default_timeout},
+        )
+
+    def _create_single_flight(self) -> SingleFlight | None:
+        """Creates the layer coalescing identical in-flight requests in the configured scope."""
+        if self.single_flight_scope not in SINGLE_FLIGHT_SCOPES:
+            print(f"[WARNING] Unknown single-flight scope '{self.single_flight_scope}', coalescing within the process only")
+        if self.single_flight_scope == "off":
+            return None
+        return SingleFlight(stats=self.request_stats, database_path=DEFAULT_SINGLE_FLIGHT_PATH if self.single_flight_scope == "host" else None)
+
+    def _create_direct_client(self, config: ModelConfig) -> DirectChatClient:
+        """Creates the client of the direct backend with the same model options as the ChatOllama instance."""
+        return DirectChatClient(
+            model=config.name,
+            options={
+                "temperature": self.temperature,
+                "num_ctx": config.max_tokens,
+                "num_predict": config.max_tokens,
+                "num_gpu": self.num_gpu,
+                "top_k": 2,
+                "top_p": 0.5,
+            },
+            keep_alive=self.keep_alive,
+            timeout=self.request_policy.default_timeout,
+            # Room for a hedged duplicate of every request in flight.
+            max_connections=2 * self.limiter.max_limit,
         )
 
     def _test_connection(self) -> bool:
         """Sends a simple test message to the LLM to verify the connection."""
         try:
             test_message = "Hello, respond with one word."
+            if self._direct is not None:
+                reply: DirectResponse = self._direct.chat(self.base_url, ChatPromptTemplate([("human", "{page_content}")]), test_message)
+                if reply.content:
+                    print("[INFO] Model connection test successful")
+                    return True
+                print("[WARNING] Model connection test returned empty response")
+                return False
             response: BaseMessage = self._llm.invoke(input=test_message)
             if response and response.content:
                 print("[INFO] Model connection test successful")
@@ -150,8 +664,10 @@ class Ollama:
     @staticmethod
     def count_tokens(content: str) -> int:
         """Counts the number of tokens in a string using Tiktoken."""
+        encoding: "Encoding | None" = _load_encoding()
+        if encoding is None:
+            return len(content)  # Fallback to character count
         try:
-            encoding: Encoding = get_encoding("cl100k_base")
             return len(encoding.encode(content))
         except Exception:
-            return len(content)  # Fallback to character count
+            return len(content)
@@ -4,10 +4,11 @@ Contains ABAP language-specific constants and configurations.
 This module provides a central, non-instantiable class `ABAP` that serves as a
 namespace for holding data used across the application for parsing and
 categorizing ABAP code. This includes keywords for object type identification,
-high-level categories for prompt selection, and separators for text splitting.
+the object types of abapGit file names, high-level categories for prompt
+selection, and separators for text splitting.
 """
 
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 
 class ABAP:
@@ -241,6 +242,55 @@ class ABAP:
         ],
     }
 
+    # abapGit object types (the second part of file names such as "zcl_demo.clas.abap") and the document type of their sources.
+    _FILE_TYPES: Dict[str, str] = {
+        # === Object-Oriented Programming ===
+        "clas": "CLASS",
+        "intf": "CLASS",
+        # === Classical ABAP & Function Modules ===
+        "prog": "INCLUDE PROGRAM",
+        "fugr": "FUNCTION MODULE",
+        # === RAP Objects & CDS Definitions ===
+        "ddls": "ENTITY",
+        "ddlx": "METADATA ENTITY",
+        "bdef": "MANAGED BEHAVIOR DEFINITION",
+        "srvd": "SERVICE DEFINITION",
+        # === Dictionary Objects (abapGit stores them as XML only) ===
+        "tabl": "DATABASE TABLE",
+        "enqu": "LOCK OBJECT",
+        "nrob": "NUMBER RANGE",
+    }
+
+    # Patterns refining the document type of abapGit object types that cover several kinds of objects.
+    # They are matched in order against the lowercased start of the source; the first match wins.
+    # Patterns start with a literal rather than "\b", which lets the regular expression engine skip ahead quickly.
+    _FILE_TYPE_REFINEMENTS: Dict[str, List[Tuple[str, str]]] = {
+        "ddls": [
+            (r"projection\s+on\b", "PROJECTION ENTITY"),
+            (r"root\s+view\s+entity\b", "ROOT ENTITY"),
+            (r"abstract\s+entity\b", "ABSTRACT ENTITY"),
+            (r"custom\s+entity\b", "CUSTOM ENTITY"),
+            (r"define\s+structure\b", "STRUCTURE"),
+            (r"@objectmodel\.datacategory\s*:\s*#value_help", "VALUE HELP ENTITY"),
+        ],
+        "bdef": [
+            (r"projection\s*(?:;|implementation\b)", "BEHAVIOR PROJECTION"),
+            (r"unmanaged\s*(?:;|implementation\b)", "UNMANAGED BEHAVIOR DEFINITION"),
+        ],
+        "prog": [
+            (r"^\s*(?:report|program)\b", "REPORT PROGRAM"),
+        ],
+        "tabl": [
+            (r"<tabclass>inttab</tabclass>", "STRUCTURE"),
+        ],
+    }
+
+    # abapGit object types whose only file is their XML description, which is therefore loaded as their source.
+    _XML_FILE_TYPES: Tuple[str, ...] = ("tabl", "enqu", "nrob")
+
+    # File extensions of the sources in an abapGit repository; XML files only describe an object unless it has no other source.
+    _SOURCE_EXTENSIONS: Tuple[str, ...] = (".abap", ".asddls", ".asddlxs", ".asbdef", ".srvdsrv", ".xml")
+
     # A list of ABAP keywords used as separators for `RecursiveCharacterTextSplitter`.
     # These represent logical boundaries in the code, allowing for more coherent chunks.
     _SEPARATOR: List[str] = [
@@ -269,6 +319,23 @@ class ABAP:
         "\nENDINTERFACE.",
     ]
 
+    # Regular expressions matching the first line of a repository object in a multi-object source dump
+    # (e.g., a transport or SE80 download). Each pattern captures the object name if it is available.
+    _OBJECT_BOUNDARIES: List[str] = [
+        # === Object-Oriented Programming (global classes and interfaces only, not local classes) ===
+        # The additions with an operand are matched whole, so "CREATE PUBLIC" of a local class is not read as PUBLIC;
+        # DEFERRED and LOAD declare a class defined elsewhere.
+        r"CLASS\s+([\w/]+)\s+DEFINITION(?:\s+(?:CREATE\s+(?:PUBLIC|PROTECTED|PRIVATE)\b|INHERITING\s+FROM\s+[\w/]+|(?!(?:PUBLIC|CREATE|INHERITING|DEFERRED|LOAD)\b)[\w/-]+))*?\s+PUBLIC\b",
+        r"INTERFACE\s+([\w/]+)\s+PUBLIC\b",
+        # === Classical ABAP & Function Modules ===
+        r"(?:REPORT|PROGRAM|FUNCTION-POOL)\s+([\w/]+)",
+        r"FUNCTION\s+([\w/]+)\s*\.",
+        # === RAP Objects & CDS Definitions ===
+        r"DEFINE\s+(?:ROOT\s+)?(?:VIEW\s+ENTITY|VIEW|ABSTRACT\s+ENTITY|CUSTOM\s+ENTITY|TABLE\s+FUNCTION|TABLE|STRUCTURE|SERVICE)\s+([\w/]+)",
+        r"ANNOTATE\s+(?:ENTITY|VIEW)\s+([\w/]+)\s+WITH",
+        r"(?:UNMANAGED|MANAGED|PROJECTION)\b[^;]*;[\s\S]{0,500}?DEFINE\s+BEHAVIOR\s+FOR\s+([\w/]+)",
+    ]
+
     @classmethod
     def get_document_keywords(cls) -> Dict[str, List[str]]:
         """Returns a copy of the dictionary mapping ABAP object types to keywords."""
@@ -279,7 +346,32 @@ class ABAP:
         """Returns a copy of the dictionary mapping high-level categories to specific document types."""
         return cls._DOCUMENT_CATEGORIES.copy()
 
+    @classmethod
+    def get_file_types(cls) -> Dict[str, str]:
+        """Returns a copy of the dictionary mapping abapGit object types to document types."""
+        return cls._FILE_TYPES.copy()
+
+    @classmethod
+    def get_file_type_refinements(cls) -> Dict[str, List[Tuple[str, str]]]:
+        """Returns a copy of the dictionary mapping abapGit object types to the patterns refining their document type."""
+        return {file_type: list(patterns) for file_type, patterns in cls._FILE_TYPE_REFINEMENTS.items()}
+
+    @classmethod
+    def get_xml_file_types(cls) -> Tuple[str, ...]:
+        """Returns the abapGit object types stored as XML only."""
+        return cls._XML_FILE_TYPES
+
+    @classmethod
+    def get_source_extensions(cls) -> Tuple[str, ...]:
+        """Returns the file extensions of the sources in an abapGit repository."""
+        return cls._SOURCE_EXTENSIONS
+
     @classmethod
     def get_separators(cls) -> List[str]:
         """Returns a copy of the list of separators for code splitting."""
         return cls._SEPARATOR.copy()
+
+    @classmethod
+    def get_object_boundaries(cls) -> List[str]:
+        """Returns a copy of the list of patterns marking the start of an object in a source dump."""
+        return cls._OBJECT_BOUNDARIES.copy()
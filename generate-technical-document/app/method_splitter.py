@@ -0,0 +1,70 @@
+"""
+Decomposes ABAP class sources into their definition and individual methods.
+
+This module contains the `split_class` function, which cuts the
+`METHOD ... ENDMETHOD.` blocks out of the implementation parts of a class
+source. What remains, the definition sections with all declarations and the
+empty implementation frames, describes the class as a whole, while each
+method can be analyzed, and cached, on its own. A change to one method then
+only invalidates the result of that method.
+"""
+
+from dataclasses import dataclass, field
+from re import IGNORECASE, MULTILINE, Match, Pattern, compile
+from typing import Dict, List, Tuple
+
+# A method implementation from its METHOD statement (including additions such as BY DATABASE PROCEDURE) through its ENDMETHOD statement.
+_METHOD_BLOCK: Pattern = compile(r"^[ \t]*METHOD[ \t]+([\w/~]+)[^.]*\.[\s\S]*?^[ \t]*ENDMETHOD[ \t]*\.[^\n]*(?:\n|$)", IGNORECASE | MULTILINE)
+# The start of the implementation part of a global or local class.
+_CLASS_IMPLEMENTATION: Pattern = compile(r"^[ \t]*CLASS[ \t]+([\w/]+)[ \t]+IMPLEMENTATION\b", IGNORECASE | MULTILINE)
+# The blank lines left behind by the removed method blocks.
+_BLANK_LINES: Pattern = compile(r"\n[ \t]*(?:\n[ \t]*)+\n")
+
+
+@dataclass(frozen=True, slots=True)
+class ClassMethod:
+    """The implementation of one method."""
+
+    # The method name, prefixed with its class for methods of local classes (e.g., "lhc_agency->validate").
+    name: str
+    text: str
+
+
+@dataclass(slots=True)
+class ClassSections:
+    """A class source split into its definition and its method implementations."""
+
+    definition: str
+    methods: List[ClassMethod] = field(default_factory=list)
+
+
+def split_class(text: str, class_name: str) -> ClassSections | None:
+    """
+    Splits a class source into its definition and method implementations.
+
+    Args:
+        text: The source of the class, including any local classes.
+        class_name: The name of the global class; methods of other (local)
+                    classes are qualified with the name of their class.
+
+    Returns:
+        The sections of the class, or None if it has no method implementations.
+    """
+    implementations: List[Tuple[int, str]] = [(match.start(), match.group(1)) for match in _CLASS_IMPLEMENTATION.finditer(text)]
+    methods: List[ClassMethod] = []
+    definition: List[str] = []
+    names: Dict[str, int] = {}
+    position: int = 0
+    match: Match
+    for match in _METHOD_BLOCK.finditer(text):
+        definition.append(text[position : match.start()])
+        position = match.end()
+        owner: str = next((name for start, name in reversed(implementations) if start < match.start()), class_name)
+        name: str = match.group(1).lower() if owner.lower() == class_name.lower() else f"{owner.lower()}->{match.group(1).lower()}"
+        # Redefinitions in several local classes, or a broken source, may repeat a name.
+        names[name] = names.get(name, 0) + 1
+        methods.append(ClassMethod(name=name if names[name] == 1 else f"{name} ({names[name]})", text=match.group(0).strip()))
+    if not methods:
+        return None
+    definition.append(text[position:])
+    return ClassSections(definition=_BLANK_LINES.sub("\n\n", "".join(definition)).strip(), methods=methods)
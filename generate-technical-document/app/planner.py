@@ -0,0 +1,287 @@
+"""
+Estimates the cost of a run without contacting the language model.
+
+This module contains the `Planner` class used by the `--plan` mode of
+`main.py`. It takes the chunks produced by the `Document_Splitter`, assembles
+the prompts with the `PromptGenerator` exactly as a run would, including the
+decomposition of large classes into their methods, and estimates the prompt
+tokens, output tokens and wall time of every request with the `Scheduler`.
+Requests answered by the `ResponseCache` are left out of the estimate. The
+specification requests, whose input is only generated during a run, are
+estimated from the expected analysis and structure output.
+"""
+
+from app.chunk_model import Chunk
+from app.prompt_generator import PromptGenerator
+from app.response_cache import ResponseCache
+from app.scheduler import Scheduler, StageTask
+from app.throughput import ThroughputProfile
+from csv import writer
+from dataclasses import dataclass, field
+from langchain_core.documents.base import Document
+from langchain_core.prompts.chat import ChatPromptTemplate
+from pathlib import Path
+from sqlite3 import Error
+from typing import Dict, List, Tuple
+
+# Token overhead of the section headings wrapping the analysis and structure in the specification prompt.
+_SPECIFICATION_HEADER_TOKENS: int = 16
+
+
+@dataclass
+class DocumentPlan:
+    """The planned requests of a single document."""
+
+    document_name: str
+    document_type: str
+    category: str
+    structure_template: str | None
+    chunks: int
+    document_tokens: int
+    # The tokens the analysis template adds to the code of the document.
+    template_tokens: int = 0
+    # The prompt tokens, output tokens and estimated seconds of the requests of each stage.
+    stages: Dict[str, Tuple[int, int, float]] = field(default_factory=dict)
+    # The number of requests of each stage; a decomposed class has one method request per method.
+    requests: Dict[str, int] = field(default_factory=dict)
+    # The requests answered from the response cache, which are not part of the estimate.
+    cached: int = 0
+
+
+@dataclass
+class RunPlan:
+    """The estimated cost of a run."""
+
+    model_name: str
+    max_tokens: int
+    workers: int
+    profile: ThroughputProfile | None
+    prefill_rate: float
+    decode_rate: float
+    documents: List[DocumentPlan] = field(default_factory=list)
+    # The estimated wall time of each processing phase with the given number of workers and sequentially.
+    makespans: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+    def oversized(self) -> List[DocumentPlan]:
+        """Returns the documents whose full source and analysis template do not fit into the model's context."""
+        return [document for document in self.documents if document.document_tokens + document.template_tokens > self.max_tokens]
+
+
+class Planner:
+    """
+    Builds a `RunPlan` from split documents using the real prompt assembly.
+
+    Nothing is sent to the model: the planner only counts tokens, looks up
+    the response cache and applies the cost model of the `Scheduler`, so it
+    finishes in seconds even for tens of thousands of objects.
+    """
+
+    # The stages of a run in processing order.
+    _STAGES: Tuple[str, ...] = ("analysis", "method", "structure", "specification")
+
+    def __init__(
+        self,
+        prompt_generator: PromptGenerator,
+        scheduler: Scheduler,
+        model_name: str,
+        max_tokens: int,
+        workers: int,
+        specification_budget: int | None = None,
+        method_min_tokens: int = 0,
+        response_cache: ResponseCache | None = None,
+    ) -> None:
+        """
+        Initializes the planner.
+
+        Args:
+            prompt_generator: The generator assembling the prompts.
+            scheduler: The scheduler estimating the cost of each request.
+            model_name: The name of the model the plan is made for.
+            max_tokens: The context size of the model (`ModelConfig.max_tokens`).
+            workers: The number of concurrent requests expected during the run.
+            specification_budget: The token budget of the specification input, if limited.
+            method_min_tokens: The source size in tokens from which classes are
+                               analyzed method by method, or 0 to analyze them whole.
+            response_cache: The cache whose results answer requests of the run, if any.
+        """
+        self.prompt_generator: PromptGenerator = prompt_generator
+        self.scheduler: Scheduler = scheduler
+        self.model_name: str = model_name
+        self.max_tokens: int = max_tokens
+        self.workers: int = max(1, workers)
+        self.specification_budget: int | None = specification_budget
+        self.method_min_tokens: int = method_min_tokens
+        self.response_cache: ResponseCache | None = response_cache
+
+    def plan(self, documents: Dict[str, List[Chunk]], profile: ThroughputProfile | None = None) -> RunPlan | None:
+        """
+        Assembles the prompts for the documents and estimates every request.
+
+        Args:
+            documents: The chunks from the `Document_Splitter`.
+            profile: The throughput profile the scheduler's rates came from, if any.
+
+        Returns:
+            The plan, or None if no prompts could be created.
+        """
+        if not self.prompt_generator.create_analysis_prompts(documents=documents):
+            return None
+        methods: Dict[str, List[Tuple[Document, ChatPromptTemplate]]] = {}
+        if self.method_min_tokens > 0:
+            methods = self.prompt_generator.create_method_prompts(documents=documents, min_tokens=self.method_min_tokens)
+        prompts: Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]] = self.prompt_generator.get_documents
+        run_plan = RunPlan(
+            model_name=self.model_name,
+            max_tokens=self.max_tokens,
+            workers=self.workers,
+            profile=profile,
+            prefill_rate=self.scheduler.prefill_rate,
+            decode_rate=self.scheduler.decode_rate,
+        )
+
+        requests: List[Tuple[str, str, Chunk | Document, ChatPromptTemplate]] = [
+            (document_name, "method", document, prompt) for document_name, method_prompts in methods.items() for document, prompt in method_prompts
+        ]
+        planned_tasks: List[StageTask] = self.scheduler.plan(prompts=prompts, stages=("analysis", "structure"), requests=requests)
+        cached: List[bool] = self._find_cached(planned_tasks)
+        first_tasks: List[StageTask] = [task for task, hit in zip(planned_tasks, cached, strict=True) if not hit]
+        # The specification input is generated from the analysis and structure, whether they come from the cache or not;
+        # its cache key is only known once they exist, so every specification request is estimated.
+        specification_tasks: List[StageTask] = self._plan_specifications(prompts, planned_tasks)
+
+        plans: Dict[str, DocumentPlan] = {}
+        for document_name, chunks in documents.items():
+            if not chunks:
+                continue
+            source = chunks[0].document
+            category: str = self.prompt_generator.get_category(source.document_type)
+            plans[document_name] = DocumentPlan(
+                document_name=document_name,
+                document_type=source.document_type,
+                category=category,
+                structure_template=self.prompt_generator.get_template_name(category),
+                chunks=len(chunks),
+                document_tokens=source.document_tokens,
+            )
+        for task, hit in zip(planned_tasks, cached, strict=True):
+            if task.document_name not in plans:
+                continue
+            document_plan: DocumentPlan = plans[task.document_name]
+            if task.stage == "analysis":
+                document_plan.template_tokens = task.prompt_tokens - self._count_input(task)
+            document_plan.cached += hit
+        for task in first_tasks + specification_tasks:
+            if task.document_name not in plans:
+                continue
+            document_plan = plans[task.document_name]
+            prompt_tokens, output_tokens, seconds = document_plan.stages.get(task.stage, (0, 0, 0.0))
+            document_plan.stages[task.stage] = (prompt_tokens + task.prompt_tokens, output_tokens + task.output_tokens, seconds + task.estimated_seconds)
+            document_plan.requests[task.stage] = document_plan.requests.get(task.stage, 0) + 1
+        run_plan.documents = list(plans.values())
+
+        for phase, tasks in (("analysis/structure", first_tasks), ("specification", specification_tasks)):
+            run_plan.makespans[phase] = (
+                Scheduler.estimate_makespan(tasks, workers=self.workers),
+                Scheduler.estimate_makespan(tasks, workers=1),
+            )
+        return run_plan
+
+    def _find_cached(self, tasks: List[StageTask]) -> List[bool]:
+        """Returns for each task whether the response cache already holds its result."""
+        if self.response_cache is None or not tasks:
+            return [False] * len(tasks)
+        keys: List[str] = [self.response_cache.key(self.model_name, task.stage, task.prompt, task.document.page_content) for task in tasks]
+        try:
+            found: set[str] = set(self.response_cache.get(keys))
+        except Error as error:
+            print(f"[WARNING] Could not read the response cache {self.response_cache.database_path}: {error}")
+            return [False] * len(tasks)
+        return [key in found for key in keys]
+
+    def _count_input(self, task: StageTask) -> int:
+        """Returns the tokens of a task's input; the splitter already counted the chunks."""
+        return task.document.token_count if isinstance(task.document, Chunk) else self.scheduler.token_counter(task.document.page_content)
+
+    def _plan_specifications(self, prompts: Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]], first_tasks: List[StageTask]) -> List[StageTask]:
+        """Estimates the specification requests from the expected analysis and structure output."""
+        template: ChatPromptTemplate | None = self.prompt_generator.get_template("SPECIFICATION")
+        if template is None:
+            return []
+        generated: Dict[str, int] = {}
+        for task in first_tasks:
+            generated[task.document_name] = generated.get(task.document_name, 0) + task.output_tokens
+        if self.specification_budget is not None:
+            generated = {document_name: min(tokens, self.specification_budget - _SPECIFICATION_HEADER_TOKENS) for document_name, tokens in generated.items()}
+        tasks: List[StageTask] = [
+            self.scheduler.estimate(document_name, "specification", prompts[document_name]["analysis"][0], template, output_tokens + _SPECIFICATION_HEADER_TOKENS)
+            for document_name, output_tokens in generated.items()
+            if "analysis" in prompts[document_name]
+        ]
+        return sorted(tasks, key=lambda task: task.estimated_seconds, reverse=True)
+
+    @staticmethod
+    def print_summary(run_plan: RunPlan, top: int = 10) -> None:
+        """Prints the totals of a plan, its most expensive documents and the oversized objects."""
+        print(f"\tModel: {run_plan.model_name} (context: {run_plan.max_tokens} tokens)")
+        if run_plan.profile:
+            print(f"\tThroughput: recorded from {run_plan.profile.requests} previous requests (updated {run_plan.profile.updated_at})")
+        else:
+            print("\tThroughput: no previous runs recorded, using the configured rates")
+        print(f"\t\tPrefill: {run_plan.prefill_rate:.1f} tokens/s, decode: {run_plan.decode_rate:.1f} tokens/s per request")
+
+        print(f"\tDocuments: {len(run_plan.documents)}")
+        for stage in Planner._STAGES:
+            stage_plans: List[Tuple[int, int, float]] = [document.stages[stage] for document in run_plan.documents if stage in document.stages]
+            requests: int = sum(document.requests.get(stage, 0) for document in run_plan.documents)
+            if stage == "method" and not requests:
+                continue
+            prompt_tokens: int = sum(prompt for prompt, _, _ in stage_plans)
+            output_tokens: int = sum(output for _, output, _ in stage_plans)
+            print(f"\t\t{stage.capitalize():<14} requests: {requests:>6}  prompt tokens: {prompt_tokens:>10}  output tokens: {output_tokens:>9}")
+        cached: int = sum(document.cached for document in run_plan.documents)
+        if cached:
+            print(f"\t\t{cached} analysis, method and structure requests are answered from the response cache and not estimated")
+
+        total_parallel: float = sum(parallel for parallel, _ in run_plan.makespans.values())
+        total_sequential: float = sum(sequential for _, sequential in run_plan.makespans.values())
+        for phase, (parallel, sequential) in run_plan.makespans.items():
+            print(f"\tEstimated wall time {phase}: {_format_duration(parallel)} with {run_plan.workers} parallel requests ({_format_duration(sequential)} sequentially)")
+        print(f"\tEstimated wall time total: {_format_duration(total_parallel)} with {run_plan.workers} parallel requests ({_format_duration(total_sequential)} sequentially)")
+
+        expensive: List[DocumentPlan] = sorted(run_plan.documents, key=lambda document: sum(seconds for _, _, seconds in document.stages.values()), reverse=True)[:top]
+        if expensive:
+            print(f"\tMost expensive documents (top {len(expensive)}):")
+            for document in expensive:
+                seconds: float = sum(seconds for _, _, seconds in document.stages.values())
+                print(f"\t\t{document.document_name}: {document.document_type} -> {document.structure_template or 'no structure template'}, {_format_duration(seconds)}")
+
+        oversized: List[DocumentPlan] = run_plan.oversized()
+        if oversized:
+            print(f"\t[WARNING] {len(oversized)} objects exceed the context of {run_plan.max_tokens} tokens; only their first chunk is analyzed:")
+            for document in sorted(oversized, key=lambda document: document.document_tokens, reverse=True):
+                print(f"\t\t{document.document_name}: {document.document_tokens} tokens in {document.chunks} chunks")
+
+    @staticmethod
+    def write_csv(run_plan: RunPlan, file_path: str) -> None:
+        """Writes one row per document with its category, template and per-stage estimates."""
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w", encoding="utf-8", newline="") as file:
+            rows = writer(file)
+            header: List[str] = ["document", "document_type", "category", "structure_template", "chunks", "document_tokens"]
+            for stage in Planner._STAGES:
+                header += [f"{stage}_requests", f"{stage}_prompt_tokens", f"{stage}_output_tokens", f"{stage}_seconds"]
+            rows.writerow(header + ["cached_requests", "exceeds_context"])
+            oversized: set[str] = {document.document_name for document in run_plan.oversized()}
+            for document in run_plan.documents:
+                row: List[object] = [document.document_name, document.document_type, document.category, document.structure_template or "", document.chunks, document.document_tokens]
+                for stage in Planner._STAGES:
+                    prompt_tokens, output_tokens, seconds = document.stages.get(stage, (0, 0, 0.0))
+                    row += [document.requests.get(stage, 0), prompt_tokens, output_tokens, f"{seconds:.1f}"]
+                rows.writerow(row + [document.cached, document.document_name in oversized])
+
+
+def _format_duration(seconds: float) -> str:
+    """Formats a duration as hours, minutes and seconds."""
+    minutes, remainder = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m {remainder:02d}s" if hours else f"{minutes}m {remainder:02d}s"
@@ -0,0 +1,266 @@
+"""
+Profiles the stages of a run with cProfile, stack sampling or tracemalloc.
+
+This module contains the `RunProfiler` class, which is configured per stage
+(loading, splitting, prompts, llm, rendering) with any of three modes:
+
+- `cprofile`: deterministic function profile, written as a `.pstats` file
+  and a text report of the functions with the highest cumulative time.
+- `sampling`: the stacks of all threads are sampled at a fixed interval and
+  written in the collapsed format of flame graph tools (`frame;frame count`).
+- `memory`: allocations are traced with tracemalloc; the peak and the
+  largest allocation sites still alive at the end of the stage are reported.
+
+The pipeline marks its stages with the module-level `profiled_stage` context
+manager and reports request timings with `record_timing`; both do nothing
+unless a profiler has been activated, so an unprofiled run pays no overhead.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from cProfile import Profile
+from dataclasses import dataclass, field
+from io import StringIO
+from pathlib import Path
+from pstats import SortKey, Stats
+from re import sub
+from sys import _current_frames
+from threading import Event, Lock, Thread, enumerate as enumerate_threads, get_ident
+from time import perf_counter, process_time
+from tracemalloc import get_traced_memory, is_tracing, reset_peak, start, stop, take_snapshot
+from types import FrameType
+from typing import Dict, Iterator, List, Set, Tuple
+
+# The stages marked by the pipeline, in run order.
+STAGES: Tuple[str, ...] = ("loading", "splitting", "prompts", "llm", "rendering")
+# The available profiling modes.
+MODES: Tuple[str, ...] = ("cprofile", "sampling", "memory")
+
+# Seconds between two stack samples.
+_SAMPLE_INTERVAL: float = 0.005
+# Frames kept per allocation traceback, and allocation sites and functions listed per report.
+_TRACEBACK_FRAMES: int = 8
+_TOP_ENTRIES: int = 25
+
+_active: "RunProfiler | None" = None
+
+
+@dataclass
+class StageProfile:
+    """The measurements of one stage, accumulated over all times it was entered."""
+
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_memory: int = 0
+    profile: Profile | None = None
+    samples: Counter = field(default_factory=Counter)
+    allocations: Counter = field(default_factory=Counter)
+
+
+class RunProfiler:
+    """
+    Collects per-stage profiles and request timings of a run and writes the reports.
+
+    Wall time, process CPU time (of all threads) and request timings are
+    always recorded once the profiler is active; the modes add the detailed
+    profiles of the stages they are enabled for.
+    """
+
+    def __init__(self, modes: Dict[str, Set[str]]) -> None:
+        """
+        Initializes the profiler.
+
+        Args:
+            modes: The profiling modes enabled for each stage.
+        """
+        self.modes: Dict[str, Set[str]] = modes
+        self.stages: Dict[str, StageProfile] = {}
+        # Accumulated seconds and counts of the request phases (e.g., "model wait").
+        self.timings: Dict[str, Tuple[float, int]] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def parse(specifications: List[str]) -> Dict[str, Set[str]]:
+        """
+        Parses `MODE` and `STAGE:MODE` entries into the modes of each stage.
+
+        Raises:
+            ValueError: If a stage or mode is unknown.
+        """
+        modes: Dict[str, Set[str]] = {stage: set() for stage in STAGES}
+        for specification in specifications:
+            for entry in filter(None, specification.split(",")):
+                stage, _, mode = entry.rpartition(":")
+                if mode not in MODES:
+                    raise ValueError(f"Unknown profiling mode '{mode}'. Choose one of: {', '.join(MODES)}")
+                if stage and stage not in STAGES:
+                    raise ValueError(f"Unknown stage '{stage}'. Choose one of: {', '.join(STAGES)}")
+                for name in [stage] if stage else STAGES:
+                    modes[name].add(mode)
+        return modes
+
+    def activate(self) -> None:
+        """Makes this profiler receive the stages and timings of the pipeline."""
+        global _active
+        _active = self
+
+    def deactivate(self) -> None:
+        """Stops receiving stages and timings."""
+        global _active
+        if _active is self:
+            _active = None
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Profiles a stage with its enabled modes."""
+        modes: Set[str] = self.modes.get(name, set())
+        profile: StageProfile = self.stages.setdefault(name, StageProfile())
+        sampler: _StackSampler | None = _StackSampler(profile.samples) if "sampling" in modes else None
+        tracing: bool = "memory" in modes and not is_tracing()
+        if tracing:
+            start(_TRACEBACK_FRAMES)
+        elif "memory" in modes:
+            reset_peak()
+        if "cprofile" in modes:
+            profile.profile = profile.profile or Profile()
+            try:
+                profile.profile.enable()
+            except ValueError as error:
+                # Another profiler (e.g., a debugger) already holds the interpreter's profiling hook.
+                print(f"[WARNING] cProfile unavailable for stage '{name}': {error}")
+                modes = modes - {"cprofile"}
+        if sampler is not None:
+            sampler.start()
+
+        started, started_cpu = perf_counter(), process_time()
+        try:
+            yield
+        finally:
+            profile.calls += 1
+            profile.wall_seconds += perf_counter() - started
+            profile.cpu_seconds += process_time() - started_cpu
+            if sampler is not None:
+                sampler.stop()
+            if "cprofile" in modes and profile.profile is not None:
+                profile.profile.disable()
+            if "memory" in modes:
+                profile.peak_memory = max(profile.peak_memory, get_traced_memory()[1])
+                for statistic in take_snapshot().statistics("traceback"):
+                    profile.allocations[_format_traceback(statistic.traceback)] += statistic.size
+                if tracing:
+                    stop()
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        """Adds the duration of one request phase."""
+        with self._lock:
+            total, count = self.timings.get(name, (0.0, 0))
+            self.timings[name] = (total + seconds, count + 1)
+
+    def write(self, output_path: str) -> List[Path]:
+        """
+        Writes the reports of all profiled stages into a `profile` directory.
+
+        Returns:
+            The paths of the written files.
+        """
+        directory: Path = Path(output_path) / "profile"
+        directory.mkdir(parents=True, exist_ok=True)
+        written: List[Path] = []
+        for name, profile in self.stages.items():
+            if profile.profile is not None:
+                stats_path: Path = directory / f"{name}.pstats"
+                profile.profile.dump_stats(stats_path)
+                report = StringIO()
+                Stats(profile.profile, stream=report).sort_stats(SortKey.CUMULATIVE).print_stats(_TOP_ENTRIES)
+                (directory / f"{name}_cprofile.txt").write_text(report.getvalue(), encoding="utf-8")
+                written += [stats_path, directory / f"{name}_cprofile.txt"]
+            if profile.samples:
+                collapsed: Path = directory / f"{name}.collapsed"
+                collapsed.write_text("".join(f"{stack} {count}\n" for stack, count in profile.samples.most_common()), encoding="utf-8")
+                written.append(collapsed)
+            if profile.allocations:
+                memory: Path = directory / f"{name}_memory.txt"
+                lines: List[str] = [f"Peak traced memory: {profile.peak_memory / 2**20:.2f} MiB", f"Largest allocations alive at the end of the stage (top {_TOP_ENTRIES}):", ""]
+                for traceback, size in profile.allocations.most_common(_TOP_ENTRIES):
+                    lines += [f"{size / 2**10:10.1f} KiB", traceback, ""]
+                memory.write_text("\n".join(lines), encoding="utf-8")
+                written.append(memory)
+        return written
+
+    def print_summary(self) -> None:
+        """Prints the wall and CPU time of every stage and the breakdown of the request time."""
+        print("\n=== Profile ===")
+        for name in [stage for stage in STAGES if stage in self.stages]:
+            profile: StageProfile = self.stages[name]
+            memory: str = f", peak memory {profile.peak_memory / 2**20:.2f} MiB" if profile.peak_memory else ""
+            modes: str = ", ".join(sorted(self.modes.get(name, set()))) or "timing only"
+            print(f"\t{name:<10} wall {profile.wall_seconds:8.2f}s  CPU {profile.cpu_seconds:8.2f}s{memory}  ({modes})")
+        if self.timings:
+            print("\tModel requests (summed over all parallel requests):")
+            for name, (seconds, count) in sorted(self.timings.items(), key=lambda item: item[1][0], reverse=True):
+                print(f"\t\t{name:<36} {seconds:9.3f}s in {count} calls ({seconds / count * 1000:.1f} ms each)")
+
+
+class _StackSampler:
+    """Samples the stacks of all other threads from a background thread."""
+
+    def __init__(self, samples: Counter) -> None:
+        """Initializes the sampler with the counter receiving the collapsed stacks."""
+        self.samples: Counter = samples
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        """Starts sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling and waits for the sampling thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        """Adds one sample per thread and interval until stopped."""
+        own: int = get_ident()
+        while not self._stop.wait(_SAMPLE_INTERVAL):
+            names: Dict[int | None, str] = {thread.ident: thread.name for thread in enumerate_threads()}
+            for ident, frame in _current_frames().items():
+                if ident != own:
+                    # Numbered pool threads are merged into one root, e.g. "ThreadPoolExecutor-0_3" -> "ThreadPoolExecutor".
+                    self.samples[";".join([sub(r"[-_]\d+", "", names.get(ident, "thread")), *_collapse(frame)])] += 1
+
+
+def _collapse(frame: FrameType | None) -> List[str]:
+    """Returns the frames of a stack from the outermost to the innermost as `module:function`."""
+    frames: List[str] = []
+    while frame is not None:
+        frames.append(f"{Path(frame.f_code.co_filename).stem}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return frames[::-1]
+
+
+def _format_traceback(traceback: object) -> str:
+    """Formats an allocation traceback from the innermost frame outwards."""
+    return "\n".join(f"\t{frame.filename}:{frame.lineno}" for frame in reversed(list(traceback)))  # type: ignore[call-overload]
+
+
+@contextmanager
+def profiled_stage(name: str) -> Iterator[None]:
+    """Marks a stage of the pipeline for the active profiler, if any."""
+    if _active is None:
+        yield
+        return
+    with _active.measure(name):
+        yield
+
+
+def is_profiling() -> bool:
+    """Returns whether a profiler is collecting request timings."""
+    return _active is not None
+
+
+def record_timing(name: str, seconds: float) -> None:
+    """Adds the duration of a request phase to the active profiler, if any."""
+    if _active is not None:
+        _active.add_timing(name, seconds)
@@ -1,11 +1,24 @@
 """
 Generates tailored prompts for different types of ABAP objects by loading
 templates from external files and selecting them dynamically.
+
+Every template is turned into a chat prompt once: the static persona and
+instruction block becomes the system message and the closing paragraph with
+the `{page_content}` placeholder becomes the user message. All requests of a
+template therefore start with an identical prefix, which the model server can
+keep in its KV cache instead of processing it again for every document.
+
+Large classes can be decomposed into their definition and their methods: the
+analysis and structure prompts then receive only the definition, and every
+method gets its own, much smaller, analysis prompt.
 """
 
+from app.chunk_model import Chunk
+from app.context_budget import SpecificationContext
 from app.language_separator import ABAP
+from app.method_splitter import ClassSections, split_class
 from langchain_core.documents.base import Document
-from langchain_core.prompts import PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 from pathlib import Path
 from typing import ClassVar, Dict, List, Self, Tuple
 
@@ -35,13 +48,15 @@ class PromptGenerator:
         """
         if not hasattr(self, "_initialized"):
             self._initialized: bool = True
-            self._prompts: Dict[str, Dict[str, Tuple[Document, PromptTemplate]]] = {}
+            self._prompts: Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]] = {}
+            self._brief_prompts: Dict[Tuple[str, int], ChatPromptTemplate] = {}
             self._load_prompt_templates()
 
             # Map document categories to their corresponding template file names.
             # This makes adding new categories and prompts much easier.
             self._category_to_template_map: Dict[str, str] = {
                 "ANALYSIS": "analysis_summary_template.md",
+                "METHOD": "method_analysis_template.md",
                 "DATABASE": "structure_database_template.md",
                 "OBJECT ORIENTED": "structure_class_template.md",
                 "FUNCTION MODULE": "structure_function_module_template.md",
@@ -55,6 +70,7 @@ class PromptGenerator:
         Loads all .md files from the prompts directory into memory.
         """
         self._prompt_templates: Dict[str, str] = {}
+        self._chat_prompts: Dict[str, ChatPromptTemplate] = {}
         if not self._PROMPTS_DIR.is_dir():
             print(f"[WARNING] Prompts directory not found at: {self._PROMPTS_DIR}")
             return
@@ -63,16 +79,17 @@ class PromptGenerator:
             try:
                 with open(file_path, "r", encoding="utf-8") as file:
                     self._prompt_templates[file_path.name] = file.read()
+                self._chat_prompts[file_path.name] = self._create_chat_prompt(file_path.name, self._prompt_templates[file_path.name])
                 print(f"[INFO] Loaded prompt template: {file_path.name}")
             except IOError as error:
                 print(f"[ERROR] Failed to load prompt {file_path.name}: {error}")
 
-    def create_analysis_prompts(self, documents: Dict[str, List[Document]]) -> bool:
+    def create_analysis_prompts(self, documents: Dict[str, List[Chunk]]) -> bool:
         """
         Creates and assigns analysis and structure prompts for each document in a single pass.
 
         Args:
-            documents: A dictionary of documents from the `Document_Splitter`.
+            documents: A dictionary of chunks from the `Document_Splitter`.
 
         Returns:
             True if any prompts were successfully created, False otherwise.
@@ -82,48 +99,149 @@ class PromptGenerator:
             if not document_list or not hasattr(document_list[0], "metadata"):
                 continue
 
-            document: Document = document_list[0]  # Use the first document chunk
+            document: Chunk = document_list[0]  # Use the first document chunk
 
             # --- 1. Create Analysis Prompt ---
             analysis_template_file: str | None = self._category_to_template_map.get("ANALYSIS")
             if analysis_template_file:
-                template_string: str | None = self._prompt_templates.get(analysis_template_file)
-                if template_string:
-                    prompt = PromptTemplate(input_variables=["page_content"], template=template_string)
+                prompt: ChatPromptTemplate | None = self._chat_prompts.get(analysis_template_file)
+                if prompt:
                     self._prompts.setdefault(document_name, {})["analysis"] = (document, prompt)
                 else:
                     print(f"[WARNING] Analysis template file '{analysis_template_file}' not found.")
 
             # --- 2. Create Structure Prompt ---
-            document_type: str = document.metadata.get("document_type", "GENERIC")
-            assigned_category: str = "GENERIC"  # Default
-            for category, types_list in ABAP.get_document_categories().items():
-                if document_type in types_list:
-                    assigned_category = category
-                    break
-
+            assigned_category: str = self.get_category(document.document.document_type)
             structure_template_file: str | None = self._category_to_template_map.get(assigned_category)
             if structure_template_file:
-                template_string = self._prompt_templates.get(structure_template_file)
-                if template_string:
-                    prompt = PromptTemplate(input_variables=["page_content"], template=template_string)
+                prompt = self._chat_prompts.get(structure_template_file)
+                if prompt:
                     self._prompts.setdefault(document_name, {})["structure"] = (document, prompt)
                 else:
                     print(f"[WARNING] Structure template file '{structure_template_file}' not found.")
 
         return bool(self._prompts)
 
-    def create_specification_prompts(self, processed_documents: Dict[str, Dict[str, List[Document]]]) -> bool:
+    def create_method_prompts(self, documents: Dict[str, List[Chunk]], min_tokens: int) -> Dict[str, List[Tuple[Document, ChatPromptTemplate]]]:
+        """
+        Decomposes the large classes into their definition and one analysis prompt per method.
+
+        Must be called after `create_analysis_prompts`. The analysis and
+        structure prompts of every decomposed class are switched to the
+        definition of the class (declarations without the method bodies).
+
+        Args:
+            documents: A dictionary of chunks from the `Document_Splitter`.
+            min_tokens: The size of a class source from which it is decomposed.
+
+        Returns:
+            The method prompts of each decomposed class, in source order. The
+            metadata of each input holds the method name under "method_name".
+        """
+        template_file: str | None = self._category_to_template_map.get("METHOD")
+        prompt: ChatPromptTemplate | None = self._chat_prompts.get(template_file or "")
+        if prompt is None:
+            print(f"[WARNING] Method template file '{template_file}' not found; classes are analyzed as a whole.")
+            return {}
+
+        methods: Dict[str, List[Tuple[Document, ChatPromptTemplate]]] = {}
+        for document_name, document_list in documents.items():
+            if not document_list or document_name not in self._prompts:
+                continue
+            source = document_list[0].document
+            if self.get_category(source.document_type) != "OBJECT ORIENTED" or source.document_tokens < min_tokens:
+                continue
+            sections: ClassSections | None = split_class(source.text, source.object_name)
+            if sections is None:
+                continue
+            metadata = document_list[0].metadata
+            definition: Document = Document(page_content=sections.definition, metadata=metadata)
+            for stage, (_, stage_prompt) in list(self._prompts[document_name].items()):
+                self._prompts[document_name][stage] = (definition, stage_prompt)
+            methods[document_name] = [(Document(page_content=method.text, metadata={**metadata, "method_name": method.name}), prompt) for method in sections.methods]
+            print(f"\tDecomposed {document_name} into its definition and {len(sections.methods)} methods")
+        return methods
+
+    @staticmethod
+    def get_category(document_type: str | None) -> str:
+        """Returns the high-level category of a document type, or "GENERIC" if it has none."""
+        for category, types_list in ABAP.get_document_categories().items():
+            if document_type in types_list:
+                return category
+        return "GENERIC"
+
+    def get_template_name(self, category: str) -> str | None:
+        """Returns the file name of the template used for a category (e.g., "ANALYSIS"), if any."""
+        template_file: str | None = self._category_to_template_map.get(category)
+        return template_file if template_file in self._prompt_templates else None
+
+    def get_template(self, category: str) -> ChatPromptTemplate | None:
+        """Returns the chat prompt used for a category, if it is available."""
+        template_file: str | None = self.get_template_name(category)
+        if template_file is None:
+            return None
+        return self._chat_prompts[template_file]
+
+    def get_prompt(self, template_file: str) -> ChatPromptTemplate | None:
+        """Returns the chat prompt loaded from a template file, if it is available."""
+        return self._chat_prompts.get(template_file)
+
+    @staticmethod
+    def _create_chat_prompt(template_file: str, template_string: str) -> ChatPromptTemplate:
+        """
+        Splits a template into a static system message and a user message carrying the code.
+
+        The user message is the paragraph holding the `{page_content}`
+        placeholder and everything after it; all text before it is the system
+        message. The template file name is kept in the prompt's metadata so
+        requests of similar cost can be grouped by template.
+        """
+        placeholder: int = template_string.find("{page_content}")
+        boundary: int = template_string.rfind("\n\n", 0, placeholder) if placeholder >= 0 else -1
+        messages: List[Tuple[str, str]] = [("human", template_string)]
+        if boundary >= 0:
+            messages = [("system", template_string[:boundary].rstrip()), ("human", template_string[boundary:].strip())]
+        return ChatPromptTemplate(messages, metadata={"template": template_file})
+
+    def create_brief_prompt(self, prompt: ChatPromptTemplate, output_tokens: int) -> ChatPromptTemplate:
+        """
+        Returns a variant of a chat prompt that asks for a short answer.
+
+        The variant keeps the messages of the prompt, so the model can reuse
+        its cached prefix, and adds a closing instruction limiting the answer
+        to about the given number of tokens.
+
+        Args:
+            prompt: The chat prompt of a template.
+            output_tokens: The number of tokens the answer should stay within.
+        """
+        template: str = (prompt.metadata or {}).get("template") or str(id(prompt))
+        if (template, output_tokens) not in self._brief_prompts:
+            instruction: str = (
+                f"Time is short: keep the whole answer brief, about {output_tokens * 3 // 4} words at most, "
+                "and cover only the most important points of every field."
+            )
+            self._brief_prompts[(template, output_tokens)] = ChatPromptTemplate(
+                [*prompt.messages, ("human", instruction)], metadata={"template": f"{template}#brief-{output_tokens}"}
+            )
+        return self._brief_prompts[(template, output_tokens)]
+
+    def create_specification_prompts(self, processed_documents: Dict[str, Dict[str, List[Document]]], context: SpecificationContext | None = None) -> bool:
         """
         Creates technical specification prompts using the generated analysis and structure.
+
+        Args:
+            processed_documents: The formatted analysis and structure of each document.
+            context: An optional builder that fits the combined analysis and
+                     structure of each document into a token budget.
         """
         spec_template_file: str | None = self._category_to_template_map.get("SPECIFICATION")
         if not spec_template_file:
             print("[WARNING] Technical specification template not found in map.")
             return False
 
-        template_string: str | None = self._prompt_templates.get(spec_template_file)
-        if not template_string:
+        prompt: ChatPromptTemplate | None = self._chat_prompts.get(spec_template_file)
+        if not prompt:
             print(f"[WARNING] Specification template file '{spec_template_file}' not found.")
             return False
 
@@ -132,7 +250,8 @@ class PromptGenerator:
             structure_content: str = data.get("structure", [Document(page_content="")])[0].page_content
             # Combine analysis and structure to form the context
             page_content: str = f"## Code Analysis\n{analysis_content}\n\n## Code Structure\n{structure_content}"
-            prompt = PromptTemplate(input_variables=["page_content"], template=template_string)
+            if context is not None:
+                page_content = context.build(doc_name, page_content)
             document: Document = data["analysis"][0] if "analysis" in data else data["structure"][0]
             self._prompts.setdefault(doc_name, {})["specification"] = (Document(page_content=page_content, metadata=document.metadata), prompt)
             print(f"\tCreating specification prompt for document: {doc_name}")
@@ -140,7 +259,7 @@ class PromptGenerator:
         return True
 
     @property
-    def get_documents(self) -> Dict[str, Dict[str, Tuple[Document, PromptTemplate]]]:
+    def get_documents(self) -> Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]]:
         """
         Extracts and returns documents from the central prompt dictionary.
         This maintains compatibility with the calling code.
@@ -148,7 +267,7 @@ class PromptGenerator:
         return self._prompts
 
     @property
-    def get_analysis_documents(self) -> Dict[str, Tuple[Document, PromptTemplate]]:
+    def get_analysis_documents(self) -> Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]:
         """
         Extracts and returns only the analysis documents from the central prompt dictionary.
         This maintains compatibility with the calling code.
@@ -156,7 +275,7 @@ class PromptGenerator:
         return {doc_name: data["analysis"] for doc_name, data in self._prompts.items() if "analysis" in data}
 
     @property
-    def get_structure_documents(self) -> Dict[str, Tuple[Document, PromptTemplate]]:
+    def get_structure_documents(self) -> Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]:
         """
         Extracts and returns only the structure documents from the central prompt dictionary.
         This maintains compatibility with the calling code.
@@ -164,7 +283,7 @@ class PromptGenerator:
         return {doc_name: data["structure"] for doc_name, data in self._prompts.items() if "structure" in data}
 
     @property
-    def get_specification_documents(self) -> Dict[str, Tuple[Document, PromptTemplate]]:
+    def get_specification_documents(self) -> Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]:
         """
         Extracts and returns only the specification documents from the central prompt dictionary.
         This maintains compatibility with the calling code.
@@ -0,0 +1,146 @@
+"""
+Processes the jobs of a shared job queue against the local model.
+
+This module contains the `QueueWorker` class, which runs on every node that
+has a model server. It claims analysis, structure and specification jobs
+enqueued by a coordinator, sends them to its local Ollama endpoint through
+the same `Generate` orchestrator and resilient request layer as a local run,
+and writes the structured results back to the `JobQueue`. A heartbeat thread
+keeps the leases of the jobs in progress alive.
+"""
+
+from app.generate_document import Generate
+from app.job_queue import JobQueue, QueuedJob
+from app.results_store import serialize_result
+from json import dumps
+from langchain_core.documents.base import Document
+from langchain_core.prompts.chat import ChatPromptTemplate
+from os import getpid
+from pydantic import BaseModel
+from socket import gethostname
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import List
+
+# Seconds a worker thread waits before asking an empty queue again.
+_POLL_SECONDS: float = 1.0
+
+
+class QueueWorker:
+    """
+    Claims jobs from a `JobQueue` and runs them on the local model.
+
+    Up to the maximum concurrency of the `Ollama` manager's adaptive limiter,
+    jobs are claimed and processed in parallel; the limiter still decides how
+    many requests are in flight at the model server.
+    """
+
+    def __init__(self, app: Generate, job_queue: JobQueue, model_name: str, worker_id: str | None = None, idle_timeout: float | None = None) -> None:
+        """
+        Initializes the worker.
+
+        Args:
+            app: The orchestrator whose model and prompt templates are used.
+            job_queue: The shared queue to take jobs from.
+            model_name: The model used for all jobs of this worker.
+            worker_id: A unique name of the worker; defaults to host name and process id.
+            idle_timeout: Seconds without any queued job after which the worker
+                          stops, or None to run until interrupted.
+        """
+        self.app: Generate = app
+        self.job_queue: JobQueue = job_queue
+        self.model_name: str = model_name
+        self.worker_id: str = worker_id or f"{gethostname()}-{getpid()}"
+        self.idle_timeout: float | None = idle_timeout
+        self.completed: int = 0
+        self.failed: int = 0
+        self._stop = Event()
+        self._lock = Lock()
+        self._last_job: float = monotonic()
+
+    def run(self) -> bool:
+        """
+        Processes jobs until interrupted or idle for longer than the idle timeout.
+
+        Returns:
+            False if the model could not be initialized, True otherwise.
+        """
+        if not self.app.llm_manager.initialize_llm(self.model_name):
+            return False
+        self.app.llm_manager.request_stats.reset()
+        self.app.llm_manager.throughput.reset()
+        print(f"[INFO] Worker {self.worker_id} serving jobs from {self.job_queue.database_path}")
+
+        self.job_queue.heartbeat(self.worker_id, self.model_name.upper())
+        threads: List[Thread] = [Thread(target=self._heartbeat, daemon=True)]
+        threads += [Thread(target=self._work, daemon=True) for _ in range(self.app.llm_manager.limiter.max_limit)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads[1:]):
+                threads[1].join(timeout=0.5)
+        except KeyboardInterrupt:
+            print(f"\n[INFO] Stopping worker {self.worker_id}")
+        finally:
+            self._stop.set()
+            released: int = self.job_queue.release(self.worker_id)
+            if released:
+                print(f"[INFO] Returned {released} unfinished jobs to the queue")
+            self.app.llm_manager.save_throughput()
+        print(f"[INFO] Worker {self.worker_id} finished {self.completed} jobs ({self.failed} failed)")
+        return True
+
+    def _work(self) -> None:
+        """Claims and processes jobs until the worker stops."""
+        while not self._stop.is_set():
+            try:
+                job: QueuedJob | None = self.job_queue.claim(self.worker_id)
+            except Exception as error:
+                print(f"[WARNING] Claiming a job failed: {error}")
+                self._stop.wait(_POLL_SECONDS)
+                continue
+            if job is None:
+                with self._lock:
+                    idle: float = monotonic() - self._last_job
+                if self.idle_timeout is not None and idle >= self.idle_timeout:
+                    return
+                self._stop.wait(_POLL_SECONDS)
+                continue
+            self._process(job)
+            with self._lock:
+                self._last_job = monotonic()
+
+    def _process(self, job: QueuedJob) -> None:
+        """Runs a single job on the local model and stores its result in the queue."""
+        prompt: ChatPromptTemplate | None = self.app.prompt_generator.get_prompt(job.template)
+        result: BaseModel | str | None = None
+        error: str | None = None
+        if prompt is None:
+            error = f"Prompt template '{job.template}' not found on worker {self.worker_id}"
+            print(f"\t[ERROR] {error}")
+        else:
+            try:
+                result = self.app.request_section(job.document_name, job.stage, Document(page_content=job.page_content), prompt)
+            except Exception as exception:
+                error = str(exception)
+                print(f"\t[ERROR] {job.stage} of {job.document_name} failed: {error}")
+        if result is None and error is None:
+            error = "The model request failed"
+
+        stored: bool = self.job_queue.complete(job.id, self.worker_id, dumps(serialize_result(result)) if result is not None else None, error)
+        with self._lock:
+            if result is None:
+                self.failed += 1
+            elif stored:
+                self.completed += 1
+        if not stored:
+            print(f"\t[WARNING] Result of {job.stage} for {job.document_name} discarded; the job was finished by another worker")
+
+    def _heartbeat(self) -> None:
+        """Extends the leases of the jobs in progress at a third of the lease duration."""
+        while not self._stop.wait(self.job_queue.lease_seconds / 3):
+            try:
+                self.job_queue.heartbeat(self.worker_id, self.model_name.upper())
+            except Exception as error:
+                # A briefly unavailable mount must not stop the worker; the next heartbeat retries.
+                print(f"[WARNING] Heartbeat failed: {error}")
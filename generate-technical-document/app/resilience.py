@@ -0,0 +1,378 @@
+"""
+Provides a resilient request layer for calls to the language model.
+
+This module contains the building blocks that protect a run against slow or
+failing model requests:
+1. `LatencyTracker`: Records request latencies and derives percentile-based
+   timeouts and hedging delays from them.
+2. `ResilientInvoker`: Executes a request with a timeout, bounded retries with
+   jittered backoff, a cheap JSON repair of malformed structured output, and
+   optional hedged duplicate requests to a second endpoint.
+3. `RequestAttempt`: Tells the invoker when a request was actually sent, so
+   the time spent waiting for a concurrency slot does not count against the
+   timeout, and gives the request its timeout and a way to free its
+   resources once the attempt timed out.
+4. `RequestStats`: Thread-safe counters that are reported in the run summary.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from json import JSONDecodeError, loads
+from pydantic import BaseModel, ValidationError
+from random import uniform
+from re import DOTALL, compile
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Callable, Deque, Dict, List, Type
+
+# Matches a fenced code block (```json ... ```) around the model's answer.
+_CODE_FENCE = compile(r"```(?:json)?\s*(.*?)```", DOTALL)
+# Matches a trailing comma before a closing brace or bracket.
+_TRAILING_COMMA = compile(r",\s*([}\]])")
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """A structured container for the timeout, retry and hedging settings."""
+
+    default_timeout: float = 600.0
+    min_timeout: float = 30.0
+    timeout_percentile: float = 0.99
+    timeout_multiplier: float = 3.0
+    min_samples: int = 5
+    max_retries: int = 2
+    backoff_base: float = 2.0
+    backoff_max: float = 30.0
+    hedge_percentile: float = 0.95
+
+
+@dataclass
+class RequestStats:
+    """Thread-safe counters describing how requests were served during a run."""
+
+    requests: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    repaired: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    failures: int = 0
+    # Requests that waited for an identical request of this process, or of another process.
+    coalesced: int = 0
+    coalesced_remote: int = 0
+    _lock: Lock = field(default_factory=Lock, repr=False, compare=False)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Increments the named counter by the given amount."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def reset(self) -> None:
+        """Sets all counters back to zero, e.g. at the start of a new run."""
+        with self._lock:
+            self.requests = self.retries = self.timeouts = self.repaired = 0
+            self.hedged = self.hedge_wins = self.failures = 0
+            self.coalesced = self.coalesced_remote = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        """Returns a snapshot of all counters."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "repaired": self.repaired,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "failures": self.failures,
+                "coalesced": self.coalesced,
+                "coalesced_remote": self.coalesced_remote,
+            }
+
+
+class RequestAttempt:
+    """
+    Links one attempt of the `ResilientInvoker` with the request it runs.
+
+    The request calls `start` once it holds a concurrency slot and is about to
+    be sent; the timeout and the hedging delay of the attempt are measured
+    from then on. A request can pass `timeout` on to its HTTP call and
+    register callbacks with `on_timeout`, e.g. to free its concurrency slot,
+    which run when the invoker gives up on the attempt.
+    """
+
+    def __init__(self, timeout: float | None = None) -> None:
+        """
+        Initializes the attempt.
+
+        Args:
+            timeout: The seconds the invoker waits for the request once it was sent.
+        """
+        self.timeout: float | None = timeout
+        self.started = Event()
+        self.timed_out: bool = False
+        self.sent_at: float | None = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = Lock()
+
+    def start(self) -> None:
+        """Marks the request as sent and starts the clock of the attempt."""
+        self.sent_at = monotonic()
+        self.started.set()
+
+    def on_timeout(self, callback: Callable[[], None]) -> None:
+        """Registers a callback run once the attempt times out, or runs it at once if it already did."""
+        with self._lock:
+            if not self.timed_out:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def expire(self) -> None:
+        """Marks the attempt as timed out and runs the registered callbacks."""
+        with self._lock:
+            self.timed_out = True
+            callbacks: List[Callable[[], None]] = self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            callback()
+
+
+class LatencyTracker:
+    """
+    Keeps a sliding window of request latencies for each stage.
+
+    Latencies of an analysis request and a specification request differ by
+    an order of magnitude, so percentiles are tracked per stage.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        """
+        Initializes the tracker.
+
+        Args:
+            window: The number of most recent samples kept for each stage.
+        """
+        self._window: int = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = Lock()
+
+    def record(self, stage: str, latency: float) -> None:
+        """Records the latency of a successful request."""
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self._window)).append(latency)
+
+    def count(self, stage: str) -> int:
+        """Returns the number of samples recorded for a stage."""
+        with self._lock:
+            return len(self._samples.get(stage, ()))
+
+    def percentile(self, stage: str, percentile: float) -> float | None:
+        """
+        Returns the latency at the given percentile (0.0 - 1.0) for a stage.
+
+        Returns None if no samples were recorded for the stage yet.
+        """
+        with self._lock:
+            samples: List[float] = sorted(self._samples.get(stage, ()))
+        if not samples:
+            return None
+        index: int = min(len(samples) - 1, int(round(percentile * (len(samples) - 1))))
+        return samples[index]
+
+
+def repair_json(text: str) -> Any:
+    """
+    Attempts to recover a JSON object from a malformed model response.
+
+    The repair is intentionally cheap: it removes Markdown code fences, cuts
+    the text down to the outermost braces, removes trailing commas and allows
+    raw control characters inside strings.
+
+    Raises:
+        ValueError: If no JSON object can be recovered.
+    """
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start: int = text.find("{")
+    end: int = text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object found in the response.")
+    candidate: str = _TRAILING_COMMA.sub(r"\1", text[start : end + 1])
+    try:
+        return loads(candidate, strict=False)
+    except JSONDecodeError as error:
+        raise ValueError(f"Response is not valid JSON: {error}")
+
+
+def reparse_structured_output(raw: Any, schema: Type[BaseModel]) -> BaseModel | None:
+    """
+    Re-parses the raw message of a failed structured-output call.
+
+    Args:
+        raw: The raw `AIMessage` returned alongside the parsing error.
+        schema: The Pydantic model the response should conform to.
+
+    Returns:
+        The validated model instance, or None if the response cannot be repaired.
+    """
+    content: Any = getattr(raw, "content", raw)
+    if not isinstance(content, str) or not content.strip():
+        return None
+    try:
+        return schema.model_validate(repair_json(content))
+    except (ValueError, ValidationError):
+        return None
+
+
+class ResilientInvoker:
+    """
+    Executes model requests with timeouts, retries and optional hedging.
+
+    Each attempt runs in a daemon thread so that a hung request can be
+    abandoned without blocking the run or the interpreter shutdown.
+    """
+
+    def __init__(self, policy: RequestPolicy, stats: RequestStats | None = None) -> None:
+        """
+        Initializes the invoker.
+
+        Args:
+            policy: The timeout, retry and hedging settings.
+            stats: The counters to update. A new instance is created if omitted.
+        """
+        self.policy: RequestPolicy = policy
+        self.stats: RequestStats = stats or RequestStats()
+        self.latency: LatencyTracker = LatencyTracker()
+
+    def timeout_for(self, stage: str) -> float:
+        """Returns the timeout for the next request of a stage."""
+        if self.latency.count(stage) < self.policy.min_samples:
+            return self.policy.default_timeout
+        observed: float = self.latency.percentile(stage, self.policy.timeout_percentile) or self.policy.default_timeout
+        return max(self.policy.min_timeout, observed * self.policy.timeout_multiplier)
+
+    def hedge_delay_for(self, stage: str) -> float | None:
+        """Returns the delay after which a hedged request is sent, if known yet."""
+        if self.latency.count(stage) < self.policy.min_samples:
+            return None
+        return self.latency.percentile(stage, self.policy.hedge_percentile)
+
+    def invoke(
+        self,
+        stage: str,
+        request: Callable[[RequestAttempt], Any],
+        parse: Callable[[Any], Any],
+        hedge_request: Callable[[], Any] | None = None,
+    ) -> Any:
+        """
+        Executes a request until it yields a parsed result or retries run out.
+
+        Args:
+            stage: The pipeline stage the request belongs to (e.g., "analysis").
+            request: A callable sending the request to the primary endpoint.
+                     It receives the `RequestAttempt` and calls its `start`
+                     once the request is sent; until then, the attempt is
+                     not timed. A request returning without calling `start`
+                     is timed from its return.
+            parse: A callable turning the raw response into the final result.
+                   It returns None if the response cannot be used.
+            hedge_request: An optional callable sending the same request to a
+                           second endpoint.
+
+        Returns:
+            The parsed result, or None if every attempt failed.
+        """
+        self.stats.increment("requests")
+        for attempt in range(self.policy.max_retries + 1):
+            if attempt:
+                self.stats.increment("retries")
+                delay: float = uniform(0, min(self.policy.backoff_max, self.policy.backoff_base * 2 ** (attempt - 1)))
+                print(f"\t[WARNING] Retrying {stage} request (attempt {attempt + 1}) in {delay:.1f}s")
+                sleep(delay)
+
+            request_attempt = RequestAttempt(timeout=self.timeout_for(stage))
+            try:
+                response: Any = self._run_attempt(stage, request, hedge_request, request_attempt)
+            except TimeoutError:
+                self.stats.increment("timeouts")
+                print(f"\t[WARNING] {stage.capitalize()} request timed out after {monotonic() - (request_attempt.sent_at or monotonic()):.1f}s")
+                continue
+            except Exception as error:
+                print(f"\t[WARNING] {stage.capitalize()} request failed: {error}")
+                continue
+
+            result: Any = parse(response)
+            if result is not None:
+                self.latency.record(stage, monotonic() - (request_attempt.sent_at or monotonic()))
+                return result
+            print(f"\t[WARNING] {stage.capitalize()} response could not be parsed")
+
+        self.stats.increment("failures")
+        return None
+
+    def _run_attempt(
+        self,
+        stage: str,
+        request: Callable[[RequestAttempt], Any],
+        hedge_request: Callable[[], Any] | None,
+        request_attempt: RequestAttempt,
+    ) -> Any:
+        """Runs one attempt, sending a hedged duplicate once the p95 latency has passed."""
+
+        def primary() -> Any:
+            try:
+                return request(request_attempt)
+            finally:
+                # Unblocks the wait below if the request failed or returned before it was sent.
+                if not request_attempt.started.is_set():
+                    request_attempt.start()
+
+        timeout: float = request_attempt.timeout or self.timeout_for(stage)
+        pending: Dict[Future, str] = {self._spawn(primary): "primary"}
+        # The time spent waiting for a concurrency slot does not count against the timeout.
+        request_attempt.started.wait()
+        deadline: float = monotonic() + timeout
+
+        hedge_delay: float | None = self.hedge_delay_for(stage) if hedge_request else None
+        if hedge_request and hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                self.stats.increment("hedged")
+                print(f"\t[INFO] {stage.capitalize()} request passed p95 latency ({hedge_delay:.1f}s), sending hedged request")
+                pending[self._spawn(hedge_request)] = "hedge"
+
+        error: BaseException | None = None
+        while pending:
+            done, _ = wait(pending, timeout=max(0.0, deadline - monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                origin: str = pending.pop(future)
+                if future.exception() is None:
+                    if origin == "hedge":
+                        self.stats.increment("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        request_attempt.expire()
+        raise TimeoutError(f"No response within {timeout:.1f}s")
+
+    @staticmethod
+    def _spawn(function: Callable[[], Any]) -> Future:
+        """Runs a callable in a daemon thread and returns a future for its result."""
+        future: Future = Future()
+
+        def runner() -> None:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(function())
+            except BaseException as error:
+                future.set_exception(error)
+
+        Thread(target=runner, daemon=True).start()
+        return future
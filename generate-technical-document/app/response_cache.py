@@ -0,0 +1,108 @@
+"""
+Caches model results by the hash of the exact request that produced them.
+
+This module contains the `ResponseCache` class, an SQLite file mapping the
+content hash of a request (model, stage, prompt template and input text) to
+its structured result. A request whose input did not change since an earlier
+run, such as an unchanged method of an edited class, is answered from the
+cache instead of the model. Any change to the input or the template yields a
+different hash, so stale results are never returned; they are only left
+behind in the file.
+"""
+
+from app.results_store import deserialize_result, serialize_result
+from contextlib import contextmanager
+from hashlib import sha256
+from json import dumps, loads
+from langchain_core.prompts.chat import ChatPromptTemplate
+from pathlib import Path
+from pydantic import BaseModel
+from sqlite3 import Connection, connect
+from time import time
+from typing import Dict, Iterator, List, Tuple
+
+_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    stage TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+# Keys looked up per statement, below SQLite's limit of bound parameters.
+_BATCH_SIZE: int = 500
+
+
+class ResponseCache:
+    """
+    Stores and looks up stage results by request hash.
+
+    Every method opens its own short-lived connection, so one instance can be
+    used from any number of threads.
+    """
+
+    def __init__(self, database_path: str) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            database_path: The path of the SQLite database.
+        """
+        self.database_path = Path(database_path)
+        # The digest of each prompt template, computed once per template.
+        self._template_digests: Dict[str, str] = {}
+
+    @contextmanager
+    def _connect(self) -> Iterator[Connection]:
+        """Opens the database and commits the changes of the block."""
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        connection: Connection = connect(self.database_path, timeout=30)
+        try:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(_SCHEMA)
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def key(self, model_name: str, stage: str, prompt: ChatPromptTemplate, page_content: str) -> str:
+        """Returns the content hash identifying a request."""
+        template: str = (prompt.metadata or {}).get("template") or str(id(prompt))
+        if template not in self._template_digests:
+            self._template_digests[template] = sha256(prompt.format(page_content="").encode("utf-8")).hexdigest()
+        request: str = "\0".join((model_name.upper(), stage, self._template_digests[template], page_content))
+        return sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, keys: List[str]) -> Dict[str, BaseModel | str]:
+        """
+        Looks up the results of the given requests.
+
+        Returns:
+            The cached results by key; keys without a result are missing.
+        """
+        results: Dict[str, BaseModel | str] = {}
+        with self._connect() as connection:
+            for start in range(0, len(keys), _BATCH_SIZE):
+                batch: List[str] = keys[start : start + _BATCH_SIZE]
+                rows = connection.execute(f"SELECT key, result FROM responses WHERE key IN ({', '.join('?' * len(batch))})", batch)
+                for key, result in rows:
+                    try:
+                        results[key] = deserialize_result(loads(result))
+                    except ValueError:
+                        # A result of an older schema is treated as a miss and replaced by the new one.
+                        continue
+        return results
+
+    def put(self, results: Dict[str, Tuple[str, BaseModel | str]]) -> None:
+        """
+        Stores results, replacing any previous result of the same request.
+
+        Args:
+            results: The stage and result of each request, by key.
+        """
+        now: float = time()
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO responses (key, stage, result, created_at) VALUES (?, ?, ?, ?)",
+                [(key, stage, dumps(serialize_result(result), ensure_ascii=False), now) for key, (stage, result) in results.items()],
+            )
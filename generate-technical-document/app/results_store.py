@@ -0,0 +1,140 @@
+"""
+Persists the raw model results of a run so the report can be rendered again.
+
+This module contains the `ResultsStore` class, which writes the structured
+results of every document (the fields of `Code_Analysis` and
+`Code_Structure` and the specification text) together with the document's
+metadata to a JSON Lines file next to the report. The first line is a header
+with the format version; every further line holds one document. The
+`--render-only` mode reads the file to rebuild the Markdown report and the
+other export formats without sending a single request to the model.
+"""
+
+from app.structured_output import Code_Analysis, Code_Structure, Technical_Specification
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from json import JSONDecodeError, dumps, loads
+from os import replace
+from pathlib import Path
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Type
+
+# The file name of the store inside the output directory.
+RESULTS_FILENAME: str = "results.jsonl"
+
+# Identifies the file and the layout of its lines.
+_FORMAT: str = "abap-documentation-results"
+_VERSION: int = 1
+# The structured output schemas a stored result can be restored into, by name.
+_SCHEMAS: Dict[str, Type[BaseModel]] = {schema.__name__: schema for schema in (Code_Analysis, Code_Structure, Technical_Specification)}
+
+
+@dataclass
+class StoredDocument:
+    """The metadata and the raw stage results of one document."""
+
+    name: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # The result of each stage (e.g., "analysis") as returned by the model.
+    results: Dict[str, BaseModel | str] = field(default_factory=dict)
+    # The stages that were not regenerated before the deadline of the run; their result, if any, is from an earlier run.
+    stale: List[str] = field(default_factory=list)
+
+
+def serialize_result(result: BaseModel | str) -> Dict[str, Any]:
+    """Returns a JSON-compatible form of a stage result, tagged with its schema."""
+    if isinstance(result, BaseModel):
+        return {"type": type(result).__name__, **result.model_dump()}
+    return {"type": "text", "text": result}
+
+
+def deserialize_result(data: Dict[str, Any]) -> BaseModel | str:
+    """
+    Restores a stage result from its serialized form.
+
+    Raises:
+        ValueError: If the schema is unknown or the fields do not match it.
+    """
+    fields: Dict[str, Any] = dict(data)
+    kind: Any = fields.pop("type", None)
+    if kind == "text":
+        return str(fields.get("text", ""))
+    if kind not in _SCHEMAS:
+        raise ValueError(f"Unknown result type '{kind}'.")
+    try:
+        return _SCHEMAS[kind].model_validate(fields)
+    except ValidationError as error:
+        raise ValueError(f"Invalid {kind} result: {error}") from error
+
+
+class ResultsStore:
+    """Reads and writes the JSON Lines file holding the raw results of a run."""
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Initializes the store.
+
+        Args:
+            file_path: The path of the JSON Lines file.
+        """
+        self.file_path = Path(file_path)
+
+    def save(self, documents: Dict[str, StoredDocument], model_name: str | None = None) -> None:
+        """
+        Writes all documents, replacing the previous file only once the new one is complete.
+
+        Args:
+            documents: The stored documents by name.
+            model_name: The model that produced the results, recorded in the header.
+        """
+        header: Dict[str, Any] = {
+            "format": _FORMAT,
+            "version": _VERSION,
+            "model": model_name,
+            "documents": len(documents),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        temporary: Path = self.file_path.with_name(self.file_path.name + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(dumps(header) + "\n")
+            for document in documents.values():
+                line: Dict[str, Any] = {
+                    "name": document.name,
+                    "metadata": document.metadata,
+                    "results": {stage: serialize_result(result) for stage, result in document.results.items()},
+                }
+                if document.stale:
+                    line["stale"] = document.stale
+                # Metadata values that are not JSON types (e.g., paths) are stored as strings.
+                file.write(dumps(line, ensure_ascii=False, default=str) + "\n")
+        replace(temporary, self.file_path)
+
+    def load(self) -> Dict[str, StoredDocument]:
+        """
+        Reads all documents in the order they were written.
+
+        Raises:
+            FileNotFoundError: If the store does not exist.
+            ValueError: If the file is not a results store of a supported version or a line is corrupt.
+        """
+        documents: Dict[str, StoredDocument] = {}
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            try:
+                header: Any = loads(file.readline() or "null")
+            except JSONDecodeError as error:
+                raise ValueError(f"{self.file_path} is not a results store: {error}") from error
+            if not isinstance(header, dict) or header.get("format") != _FORMAT:
+                raise ValueError(f"{self.file_path} is not a results store.")
+            if header.get("version") != _VERSION:
+                raise ValueError(f"{self.file_path} has version {header.get('version')}, expected {_VERSION}.")
+
+            for line_number, line in enumerate(file, 2):
+                if not line.strip():
+                    continue
+                try:
+                    data: Dict[str, Any] = loads(line)
+                    results: Dict[str, BaseModel | str] = {stage: deserialize_result(result) for stage, result in data["results"].items()}
+                    documents[data["name"]] = StoredDocument(name=data["name"], metadata=data.get("metadata", {}), results=results, stale=list(data.get("stale", [])))
+                except (ValueError, KeyError, TypeError, AttributeError) as error:
+                    raise ValueError(f"Corrupt line {line_number} in {self.file_path}: {error}") from error
+        return documents
@@ -0,0 +1,190 @@
+"""
+Orders model requests by their estimated cost to minimize the run makespan.
+
+This module contains the `Scheduler` class, which estimates the cost of every
+stage request from its prompt tokens (template plus code) and the expected
+number of output tokens, and orders the requests longest-processing-time
+first (LPT). When requests run concurrently this keeps a huge object from
+starting last and extending the run long after all other work has finished.
+
+Among requests of nearly the same estimated cost, those sharing a prompt
+template are kept back to back, so the model server can reuse the cached
+prefill of the template's static system message from one request to the next
+instead of alternating between templates. The template never moves a request
+ahead of a clearly more expensive one, so the longest-first order is kept.
+"""
+
+from app.chunk_model import Chunk
+from dataclasses import dataclass
+from heapq import heapify, heapreplace
+from langchain_core.documents.base import Document
+from langchain_core.prompts.chat import ChatPromptTemplate
+from typing import Callable, Dict, List, Tuple
+
+
+@dataclass(frozen=True)
+class StageTask:
+    """A single stage request for a document together with its estimated cost."""
+
+    document_name: str
+    stage: str
+    document: Chunk | Document
+    prompt: ChatPromptTemplate
+    prompt_tokens: int
+    output_tokens: int
+    estimated_seconds: float
+
+
+class Scheduler:
+    """
+    Estimates request costs and produces longest-processing-time-first orders.
+
+    The cost of a request is the time to prefill its prompt plus the time to
+    decode the expected output, based on configurable token throughput rates.
+    """
+
+    # Expected output tokens per stage as a ratio of the code tokens, with lower and upper bounds.
+    _OUTPUT_ESTIMATES: Dict[str, Tuple[float, int, int]] = {
+        "analysis": (0.5, 400, 2500),
+        "structure": (0.3, 200, 2000),
+        "specification": (0.6, 800, 3000),
+        "method": (0.5, 150, 1200),
+    }
+    # Requests within this fraction of the cost of the first request of their window count as equally long.
+    _COST_WINDOW: float = 0.1
+
+    def __init__(
+        self,
+        token_counter: Callable[[str], int],
+        prefill_rate: float,
+        decode_rate: float,
+        max_output_tokens: int | None = None,
+        output_ratios: Dict[str, float] | None = None,
+    ) -> None:
+        """
+        Initializes the scheduler.
+
+        Args:
+            token_counter: A function that takes a string and returns the
+                           number of tokens.
+            prefill_rate: Prompt tokens processed per second.
+            decode_rate: Output tokens generated per second.
+            max_output_tokens: An optional upper bound for the output estimate,
+                               typically the model's `num_predict`.
+            output_ratios: Optional output tokens per prompt token for each
+                           stage, recorded by previous runs. They replace the
+                           built-in estimates for the stages they cover.
+        """
+        self.token_counter: Callable[[str], int] = token_counter
+        self.prefill_rate: float = max(prefill_rate, 1e-6)
+        self.decode_rate: float = max(decode_rate, 1e-6)
+        self.max_output_tokens: int | None = max_output_tokens
+        self.output_ratios: Dict[str, float] = output_ratios or {}
+        self._template_tokens: Dict[str, int] = {}
+
+    def plan(
+        self,
+        prompts: Dict[str, Dict[str, Tuple[Chunk | Document, ChatPromptTemplate]]],
+        stages: Tuple[str, ...],
+        requests: List[Tuple[str, str, Chunk | Document, ChatPromptTemplate]] | None = None,
+    ) -> List[StageTask]:
+        """
+        Builds the stage tasks for the given prompts, most expensive first.
+
+        The tasks are ordered by descending estimated cost and cut into
+        windows of tasks within `_COST_WINDOW` of the cost of the window's
+        first task. Within a window, the tasks are grouped by template,
+        starting with the template the previous window ended with, so
+        consecutive requests share their prefix where the order allows it.
+
+        Args:
+            prompts: The prompt dictionary from the `PromptGenerator`.
+            stages: The stages to schedule (e.g., "analysis", "structure").
+            requests: Additional (document name, stage, input, prompt) requests
+                      that are not part of the prompt dictionary, such as the
+                      methods of decomposed classes.
+
+        Returns:
+            The tasks in descending order of estimated cost, grouped by template within each window.
+        """
+        tasks: List[StageTask] = [
+            self._estimate(document_name, stage, *document_data[stage]) for document_name, document_data in prompts.items() for stage in stages if stage in document_data
+        ]
+        tasks += [self._estimate(*request) for request in requests or []]
+        tasks.sort(key=lambda task: task.estimated_seconds, reverse=True)
+
+        ordered: List[StageTask] = []
+        start: int = 0
+        while start < len(tasks):
+            end: int = start + 1
+            while end < len(tasks) and tasks[end].estimated_seconds >= tasks[start].estimated_seconds * (1 - self._COST_WINDOW):
+                end += 1
+            groups: Dict[str, List[StageTask]] = {self._template_key(ordered[-1].prompt): []} if ordered else {}
+            for task in tasks[start:end]:
+                groups.setdefault(self._template_key(task.prompt), []).append(task)
+            ordered += [task for group in groups.values() for task in group]
+            start = end
+        return ordered
+
+    def _estimate(self, document_name: str, stage: str, document: Chunk | Document, prompt: ChatPromptTemplate) -> StageTask:
+        """Estimates the prompt tokens, output tokens and duration of a request."""
+        # The splitter already counted the chunk; only synthesized inputs need counting.
+        code_tokens: int | None = document.token_count if isinstance(document, Chunk) else None
+        if code_tokens is None:
+            code_tokens = self.token_counter(document.page_content)
+        return self.estimate(document_name, stage, document, prompt, code_tokens)
+
+    def estimate(self, document_name: str, stage: str, document: Chunk | Document, prompt: ChatPromptTemplate, code_tokens: int) -> StageTask:
+        """
+        Estimates a request whose input tokens are already known.
+
+        This also serves requests whose input does not exist yet, such as the
+        specification of a document before its analysis was generated.
+        """
+        prompt_tokens: int = code_tokens + self._count_template(prompt)
+        if stage in self.output_ratios:
+            output_tokens: int = max(1, int(prompt_tokens * self.output_ratios[stage]))
+        else:
+            ratio, lower, upper = self._OUTPUT_ESTIMATES.get(stage, (0.5, 400, 2500))
+            output_tokens = min(upper, max(lower, int(code_tokens * ratio)))
+        if self.max_output_tokens:
+            output_tokens = min(output_tokens, self.max_output_tokens)
+
+        return StageTask(
+            document_name=document_name,
+            stage=stage,
+            document=document,
+            prompt=prompt,
+            prompt_tokens=prompt_tokens,
+            output_tokens=output_tokens,
+            estimated_seconds=prompt_tokens / self.prefill_rate + output_tokens / self.decode_rate,
+        )
+
+    def _count_template(self, prompt: ChatPromptTemplate) -> int:
+        """Counts the tokens of a prompt template once and caches the result."""
+        template: str = self._template_key(prompt)
+        if template not in self._template_tokens:
+            self._template_tokens[template] = self.token_counter(prompt.format(page_content=""))
+        return self._template_tokens[template]
+
+    @staticmethod
+    def _template_key(prompt: ChatPromptTemplate) -> str:
+        """Returns the name of the template file a prompt was created from, or its static text."""
+        return (prompt.metadata or {}).get("template") or prompt.format(page_content="")
+
+    @staticmethod
+    def estimate_makespan(tasks: List[StageTask], workers: int) -> float:
+        """
+        Simulates the given task order on a number of parallel workers.
+
+        Each task starts on the worker that becomes free first, which is how
+        a thread pool drains its queue.
+
+        Returns:
+            The estimated wall time in seconds until the last task finishes.
+        """
+        finish_times: List[float] = [0.0] * max(1, workers)
+        heapify(finish_times)
+        for task in tasks:
+            heapreplace(finish_times, finish_times[0] + task.estimated_seconds)
+        return max(finish_times)
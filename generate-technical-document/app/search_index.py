@@ -0,0 +1,260 @@
+"""
+Maintains a searchable SQLite index of the generated documentation.
+
+This module contains the `SearchIndex` class, which stores the summary,
+analysis, structure table and technical specification of every object in an
+SQLite FTS5 table next to the Markdown report, together with the object's
+metadata from the `Document_Splitter` (document type, token counts and source
+path). Keyword and field-name lookups are answered from the full-text index
+in milliseconds instead of scanning the report.
+
+The index is synchronized incrementally: each object is stored with a hash of
+its content, so a run only rewrites the rows of regenerated objects and
+deletes the rows of objects that no longer exist.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from hashlib import sha256
+from pathlib import Path
+from re import MULTILINE, compile
+from sqlite3 import Connection, OperationalError, connect
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Pattern, Tuple
+
+if TYPE_CHECKING:
+    # Only needed for annotations; the search command line must not load LangChain.
+    from langchain_core.documents.base import Document
+
+# The file name of the index inside the output directory.
+INDEX_FILENAME: str = "documentation.db"
+# The searchable columns of the full-text table, in table order.
+SEARCH_FIELDS: Tuple[str, ...] = ("name", "summary", "analysis", "structure", "fields", "specification")
+
+# Separates the summary from the analysis in the formatted analysis section.
+_ANALYSIS_MARKER: str = "### **Analysis**:"
+_SUMMARY_MARKER: str = "### **Summary**:"
+# Matches the first cell of a Markdown table row, which holds the component or field name.
+_TABLE_NAME: Pattern[str] = compile(r"^\s*\|\s*`?([^|`]+?)`?\s*\|", MULTILINE)
+# Header cells and separator rows that are not names.
+_TABLE_HEADERS: Tuple[str, ...] = ("name", "field name", "component", "component name", "parameter", "method", "element")
+
+_SCHEMA: str = f"""
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    document_type TEXT,
+    source TEXT,
+    document_tokens INTEGER,
+    analyzed_tokens INTEGER,
+    content_hash TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_type ON objects (document_type);
+CREATE VIRTUAL TABLE IF NOT EXISTS object_text USING fts5(
+    {", ".join(SEARCH_FIELDS)},
+    tokenize = "unicode61 tokenchars '_'"
+);
+"""
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    """A single object matching a search query."""
+
+    name: str
+    document_type: str | None
+    source: str | None
+    document_tokens: int | None
+    rank: float
+    snippet: str
+
+
+class SearchIndex:
+    """
+    Writes and queries the FTS5 index of the generated documentation.
+
+    The rows of the `objects` table and the full-text table share their
+    rowid, so metadata filters and full-text matches are joined directly.
+    """
+
+    def __init__(self, database_path: str) -> None:
+        """
+        Initializes the index.
+
+        Args:
+            database_path: The path of the SQLite database file.
+        """
+        self.database_path = Path(database_path)
+
+    def connect(self) -> Connection:
+        """Opens the database and creates the schema if it does not exist yet."""
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        connection: Connection = connect(self.database_path)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def synchronize(self, documents: Dict[str, Dict[str, List["Document"]]], names: Iterable[str] | None = None) -> Tuple[int, int, int]:
+        """
+        Brings the index in line with the given documents in one transaction.
+
+        Objects whose content hash is unchanged are left untouched, changed and
+        new objects are rewritten, and objects missing from `documents` are
+        deleted.
+
+        Args:
+            documents: The formatted analysis, structure and specification of each object.
+            names: The objects regenerated since the last synchronization, if
+                   known. Only these are compared and rewritten; without it
+                   every object is compared by its content hash.
+
+        Returns:
+            The number of written, unchanged and deleted objects.
+        """
+        connection: Connection = self.connect()
+        try:
+            with connection:
+                stored: Dict[str, Tuple[int, str]] = {name: (rowid, content_hash) for rowid, name, content_hash in connection.execute("SELECT id, name, content_hash FROM objects")}
+                written: int = 0
+                timestamp: str = datetime.now(timezone.utc).isoformat(timespec="seconds")
+                for name in documents if names is None else [name for name in dict.fromkeys(names) if name in documents]:
+                    document_data: Dict[str, List["Document"]] = documents[name]
+                    fields: Dict[str, str] = self._extract_fields(name, document_data)
+                    metadata: Dict[str, Any] = self._metadata(document_data)
+                    content_hash: str = self._hash(fields, metadata)
+                    if name in stored and stored[name][1] == content_hash:
+                        continue
+                    if name in stored:
+                        connection.execute("DELETE FROM object_text WHERE rowid = ?", (stored[name][0],))
+                        connection.execute("DELETE FROM objects WHERE id = ?", (stored[name][0],))
+                    rowid: int | None = connection.execute(
+                        "INSERT INTO objects (name, document_type, source, document_tokens, analyzed_tokens, content_hash, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (name, metadata.get("document_type"), metadata.get("source"), metadata.get("document_tokens"), metadata.get("chunk_token_count"), content_hash, timestamp),
+                    ).lastrowid
+                    connection.execute(
+                        f"INSERT INTO object_text (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (?, {', '.join('?' for _ in SEARCH_FIELDS)})",
+                        (rowid, *(fields[field] for field in SEARCH_FIELDS)),
+                    )
+                    written += 1
+
+                removed: List[Tuple[int]] = [(rowid,) for name, (rowid, _) in stored.items() if name not in documents]
+                connection.executemany("DELETE FROM object_text WHERE rowid = ?", removed)
+                connection.executemany("DELETE FROM objects WHERE id = ?", removed)
+            return written, len(documents) - written, len(removed)
+        finally:
+            connection.close()
+
+    def search(self, query: str, field: str | None = None, document_type: str | None = None, limit: int = 20) -> List[SearchResult]:
+        """
+        Finds the objects matching all terms of a query, best matches first.
+
+        Every whitespace-separated term is matched as a phrase, so names such
+        as `/dmo/agency` or `agency_id` need no FTS5 quoting.
+
+        Args:
+            query: The search terms.
+            field: An optional column to search in (see `SEARCH_FIELDS`).
+            document_type: An optional document type to filter by (e.g., "CLASS").
+            limit: The maximum number of results.
+
+        Raises:
+            ValueError: If the field is unknown or the query has no terms.
+        """
+        if field is not None and field not in SEARCH_FIELDS:
+            raise ValueError(f"Unknown search field '{field}'. Choose one of: {', '.join(SEARCH_FIELDS)}")
+        expression: str = self._match_expression(query, field)
+        if not self.database_path.is_file():
+            return []
+
+        column: int = SEARCH_FIELDS.index(field) if field else -1
+        sql: str = (
+            "SELECT objects.name, objects.document_type, objects.source, objects.document_tokens, object_text.rank, "
+            f"snippet(object_text, {column}, '[', ']', '...', 12) "
+            "FROM object_text JOIN objects ON objects.id = object_text.rowid "
+            "WHERE object_text MATCH ?"
+        )
+        parameters: List[Any] = [expression]
+        if document_type:
+            sql += " AND objects.document_type = ?"
+            parameters.append(document_type.upper())
+        sql += " ORDER BY object_text.rank LIMIT ?"
+        parameters.append(limit)
+
+        connection: Connection = connect(f"file:{self.database_path}?mode=ro", uri=True)
+        try:
+            return [SearchResult(*row) for row in connection.execute(sql, parameters)]
+        finally:
+            connection.close()
+
+    def count(self) -> int:
+        """Returns the number of indexed objects."""
+        if not self.database_path.is_file():
+            return 0
+        connection: Connection = connect(f"file:{self.database_path}?mode=ro", uri=True)
+        try:
+            return connection.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+        except OperationalError:
+            return 0
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _match_expression(query: str, field: str | None) -> str:
+        """Turns search terms into an FTS5 expression of quoted phrases, optionally limited to a column."""
+        terms: List[str] = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        if not terms:
+            raise ValueError("The search query has no terms.")
+        expression: str = " AND ".join(terms)
+        return f"{field} : ({expression})" if field else expression
+
+    @staticmethod
+    def _extract_fields(name: str, document_data: Dict[str, List["Document"]]) -> Dict[str, str]:
+        """Splits the formatted sections of an object into the searchable columns."""
+        analysis: str = _section_text(document_data, "analysis", "## Code Analysis")
+        summary: str = ""
+        if _ANALYSIS_MARKER in analysis:
+            summary, analysis = analysis.split(_ANALYSIS_MARKER, 1)
+            summary = summary.replace(_SUMMARY_MARKER, "")
+        structure: str = _section_text(document_data, "structure", "## Code Structure")
+        return {
+            "name": name,
+            "summary": summary.strip(),
+            "analysis": analysis.strip(),
+            "structure": structure,
+            "fields": " ".join(_table_names(structure)),
+            "specification": _section_text(document_data, "specification", "## Technical Specification"),
+        }
+
+    @staticmethod
+    def _metadata(document_data: Dict[str, List["Document"]]) -> Dict[str, Any]:
+        """Returns the splitter metadata carried by the first available section."""
+        for stage in ("analysis", "structure", "specification"):
+            if document_data.get(stage):
+                return document_data[stage][0].metadata
+        return {}
+
+    @staticmethod
+    def _hash(fields: Dict[str, str], metadata: Dict[str, Any]) -> str:
+        """Returns a hash identifying the indexed content and metadata of an object."""
+        digest = sha256()
+        for value in (*fields.values(), metadata.get("document_type"), metadata.get("source"), metadata.get("document_tokens"), metadata.get("chunk_token_count")):
+            digest.update(str(value).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+
+def _section_text(document_data: Dict[str, List["Document"]], stage: str, heading: str) -> str:
+    """Returns the content of a formatted section without its heading."""
+    documents: List["Document"] | None = document_data.get(stage)
+    if not documents:
+        return ""
+    return documents[0].page_content.strip().removeprefix(heading).strip()
+
+
+def _table_names(structure: str) -> Iterator[str]:
+    """Yields the names in the first column of the structure tables, skipping headers and separators."""
+    for match in _TABLE_NAME.finditer(structure):
+        name: str = match.group(1).strip()
+        if name and not set(name) <= set("-: ") and name.lower() not in _TABLE_HEADERS:
+            yield name
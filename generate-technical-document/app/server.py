@@ -0,0 +1,360 @@
+"""
+Runs the document generator as a long-running daemon with an HTTP job API.
+
+This module contains the `DocumentServer` class, which keeps a single
+`Generate` orchestrator (and with it the `Ollama` and `PromptGenerator`
+singletons) warm between jobs. Jobs are submitted over a local HTTP API,
+queued, processed one at a time, and their status, log and report can be
+retrieved afterwards.
+
+Endpoints:
+    POST /jobs                 Submit a job (JSON body, see `DocumentServer.submit`).
+    GET  /jobs                 List all jobs.
+    GET  /jobs/<id>            Status of a job.
+    GET  /jobs/<id>/log        Console output of a job.
+    GET  /jobs/<id>/result     The generated Markdown report.
+    GET  /health               Liveness check.
+"""
+
+from app.generate_document import Generate
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import TextIOBase
+from json import JSONDecodeError, dumps, loads
+from pathlib import Path
+from queue import Queue
+from threading import Lock, Thread, local
+from typing import Any, Dict, List, TextIO
+from uuid import uuid4
+
+
+@dataclass
+class Job:
+    """The state of a single documentation job."""
+
+    id: str
+    file_path: str
+    output_path: str
+    model_name: str
+    status: str = "queued"
+    created_at: str = ""
+    started_at: str | None = None
+    finished_at: str | None = None
+    error: str | None = None
+
+
+def _now() -> str:
+    """Returns the current UTC time as an ISO 8601 string."""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class _JobOutput(TextIOBase):
+    """
+    Routes the console output of the running job to its log.
+
+    The pipeline reports its progress with `print` from the job thread and
+    the request threads it starts, so the job log cannot be captured by
+    swapping `sys.stdout` per job, which would also capture the server's own
+    threads. This stream replaces `sys.stdout` once while the server runs:
+    threads marked as server threads always write to the console, all other
+    threads write to the log of the running job, or to the console between
+    jobs.
+    """
+
+    def __init__(self, console: TextIO) -> None:
+        """
+        Initializes the stream.
+
+        Args:
+            console: The stream receiving the output of the server threads.
+        """
+        self.console: TextIO = console
+        self._log: TextIO | None = None
+        self._server_thread = local()
+        self._lock = Lock()
+
+    def mark_server_thread(self) -> None:
+        """Keeps the output of the calling thread on the console."""
+        self._server_thread.marked = True
+
+    def set_log(self, log: TextIO | None) -> None:
+        """Sends the output of the job threads to a log, or back to the console with None."""
+        with self._lock:
+            self._log = log
+
+    def writable(self) -> bool:
+        """Reports the stream as writable."""
+        return True
+
+    def write(self, text: str) -> int:
+        """Writes text to the log of the running job or to the console."""
+        with self._lock:
+            target: TextIO = self.console if self._log is None or getattr(self._server_thread, "marked", False) else self._log
+            return target.write(text)
+
+    def flush(self) -> None:
+        """Flushes the console and the log of the running job."""
+        with self._lock:
+            self.console.flush()
+            if self._log is not None:
+                self._log.flush()
+
+
+class DocumentServer:
+    """
+    Accepts documentation jobs over HTTP and runs them on a warm model.
+
+    Jobs run strictly one after another on a single worker thread. The model
+    is the bottleneck and each job already sends its requests concurrently,
+    so serial jobs lose no throughput while keeping jobs isolated: every job
+    gets its own working directory and log, and `Generate.run` resets the
+    shared prompt state at the start of each job.
+    """
+
+    def __init__(self, app: Generate, model_name: str, jobs_path: str, source_root: str) -> None:
+        """
+        Initializes the server.
+
+        Args:
+            app: The orchestrator used to run the jobs.
+            model_name: The model used for jobs that do not name one.
+            jobs_path: The directory holding uploaded sources, reports and logs.
+            source_root: The directory below which jobs may read sources with `file_path`.
+        """
+        self.app: Generate = app
+        self.model_name: str = model_name
+        self.jobs_path = Path(jobs_path)
+        self.source_root = Path(source_root)
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Queue[str] = Queue()
+        self._lock = Lock()
+        self._output: _JobOutput | None = None
+
+    def warm_up(self) -> bool:
+        """Connects to the default model so the first job does not pay for it."""
+        return self.app.llm_manager.initialize_llm(self.model_name)
+
+    def submit(self, payload: Dict[str, Any]) -> Job:
+        """
+        Validates a job request and adds it to the queue.
+
+        The payload either names a directory below the source root with
+        `file_path` or uploads sources as `sources`, a mapping of file names
+        to source code. The optional `output_path`, a directory relative to
+        the job directory, and `model` override the defaults.
+
+        Raises:
+            ValueError: If the payload does not describe a valid job.
+            OSError: If the job directory or the output path cannot be created.
+        """
+        job_id: str = uuid4().hex[:12]
+        work_dir: Path = self.jobs_path / job_id
+        sources: Any = payload.get("sources")
+        file_path: Any = payload.get("file_path")
+
+        output_path: Path | None = _resolve_within(work_dir, payload.get("output_path") or "output")
+        if output_path is None:
+            raise ValueError("'output_path' must be a directory relative to the job directory.")
+        if sources is not None:
+            if not isinstance(sources, dict) or not sources:
+                raise ValueError("'sources' must be a non-empty mapping of file names to source code.")
+            # Only the base name is used so uploads cannot escape the job directory.
+            names: Dict[str, str] = {str(file_name): Path(str(file_name)).name for file_name in sources}
+            invalid: List[str] = [file_name for file_name, name in names.items() if name in ("", ".", "..")]
+            if invalid:
+                raise ValueError(f"Invalid source file names: {', '.join(repr(file_name) for file_name in invalid)}.")
+            duplicates: List[str] = sorted({name for name in names.values() if list(names.values()).count(name) > 1})
+            if duplicates:
+                raise ValueError(f"Several sources share the file names: {', '.join(repr(name) for name in duplicates)}.")
+            source_dir: Path = work_dir / "sources"
+            source_dir.mkdir(parents=True, exist_ok=True)
+            for file_name, content in sources.items():
+                (source_dir / names[str(file_name)]).write_text(str(content), encoding="utf-8")
+            file_path = str(source_dir)
+        else:
+            source_path: Path | None = _resolve_within(self.source_root, file_path) if isinstance(file_path, str) else None
+            if source_path is None or not source_path.exists():
+                raise ValueError(f"Either 'sources' or an existing 'file_path' below {self.source_root} is required.")
+            file_path = str(source_path)
+
+        output_path.mkdir(parents=True, exist_ok=True)
+        work_dir.mkdir(parents=True, exist_ok=True)
+
+        job = Job(
+            id=job_id,
+            file_path=file_path,
+            output_path=str(output_path),
+            model_name=str(payload.get("model") or self.model_name),
+            created_at=_now(),
+        )
+        with self._lock:
+            self._jobs[job_id] = job
+        self._queue.put(job_id)
+        return replace(job)
+
+    def get_job(self, job_id: str) -> Job | None:
+        """Returns a copy of a job by its id."""
+        with self._lock:
+            job: Job | None = self._jobs.get(job_id)
+            return replace(job) if job else None
+
+    def list_jobs(self) -> List[Job]:
+        """Returns copies of all jobs in submission order."""
+        with self._lock:
+            return [replace(job) for job in self._jobs.values()]
+
+    def log_path(self, job: Job) -> Path:
+        """Returns the path of a job's console log."""
+        return self.jobs_path / job.id / "job.log"
+
+    def result_path(self, job: Job) -> Path:
+        """Returns the path of a job's Markdown report."""
+        return Path(job.output_path) / "code_structure.md"
+
+    def _worker(self) -> None:
+        """Processes queued jobs one at a time."""
+        while True:
+            job: Job | None = self.get_job(self._queue.get())
+            if job is None:
+                continue
+            self._update(job, status="running", started_at=_now())
+            print(f"[INFO] Running job {job.id}")
+            status: str = "failed"
+            error: str | None = None
+            try:
+                with open(self.log_path(job), "w", encoding="utf-8") as log:
+                    if self._output is not None:
+                        self._output.set_log(log)
+                    try:
+                        succeeded: bool = self.app.run(file_path=job.file_path, output_file_path=job.output_path, model_name=job.model_name)
+                    finally:
+                        if self._output is not None:
+                            self._output.set_log(None)
+                status = "done" if succeeded else "failed"
+                if not succeeded:
+                    error = "The run did not produce a report. See the job log for details."
+            except Exception as exception:
+                error = str(exception)
+            self._update(job, status=status, error=error, finished_at=_now())
+            print(f"[INFO] Job {job.id} {status}")
+
+    def _update(self, job: Job, **fields: Any) -> None:
+        """Changes fields of a job together, so readers never see a partial update."""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self._jobs[job.id], name, value)
+
+    def serve(self, host: str, port: int) -> None:
+        """Starts the worker thread and serves the HTTP API until interrupted."""
+        from sys import stdout
+
+        self._output = _JobOutput(stdout)
+        self._output.mark_server_thread()
+        with redirect_stdout(self._output):
+            Thread(target=self._worker, daemon=True).start()
+            server = ThreadingHTTPServer((host, port), _JobRequestHandler)
+            server.daemon_threads = True
+            server.document_server = self  # type: ignore[attr-defined]
+            print(f"[INFO] Document server listening on http://{host}:{port}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("[INFO] Document server stopped")
+            finally:
+                server.server_close()
+        self._output = None
+
+
+def _resolve_within(root: Path, path: str) -> Path | None:
+    """Returns the absolute path of a path relative to a root, or None if it is not a string or lies outside the root."""
+    if not isinstance(path, str):
+        return None
+    resolved: Path = (root / path).resolve()
+    return resolved if resolved.is_relative_to(root.resolve()) else None
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """Translates HTTP requests into calls on the `DocumentServer`."""
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silences the default per-request logging."""
+
+    @property
+    def document_server(self) -> DocumentServer:
+        """Returns the server instance attached to the HTTP server."""
+        return self.server.document_server  # type: ignore[attr-defined]
+
+    def setup(self) -> None:
+        """Keeps the output of the request thread out of the job log."""
+        if self.document_server._output is not None:
+            self.document_server._output.mark_server_thread()
+        super().setup()
+
+    def do_GET(self) -> None:
+        """Serves job status, logs and results."""
+        parts: List[str] = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["health"]:
+            self._send_json({"status": "ok"})
+            return
+        if parts == ["jobs"]:
+            self._send_json({"jobs": [asdict(job) for job in self.document_server.list_jobs()]})
+            return
+        if len(parts) < 2 or parts[0] != "jobs":
+            self._send_json({"error": "Not found."}, status=404)
+            return
+
+        job: Job | None = self.document_server.get_job(parts[1])
+        if job is None:
+            self._send_json({"error": f"Job '{parts[1]}' not found."}, status=404)
+        elif len(parts) == 2:
+            self._send_json(asdict(job))
+        elif parts[2] == "log":
+            self._send_file(self.document_server.log_path(job), "text/plain")
+        elif parts[2] == "result":
+            if job.status != "done":
+                self._send_json({"error": f"Job '{job.id}' is {job.status}."}, status=409)
+            else:
+                self._send_file(self.document_server.result_path(job), "text/markdown")
+        else:
+            self._send_json({"error": "Not found."}, status=404)
+
+    def do_POST(self) -> None:
+        """Accepts new jobs."""
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json({"error": "Not found."}, status=404)
+            return
+        try:
+            length: int = int(self.headers.get("Content-Length", 0))
+            payload: Any = loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("The request body must be a JSON object.")
+            job: Job = self.document_server.submit(payload)
+        except (JSONDecodeError, ValueError) as error:
+            self._send_json({"error": str(error)}, status=400)
+            return
+        except OSError as error:
+            self._send_json({"error": f"The job could not be created: {error}"}, status=500)
+            return
+        self._send_json(asdict(job), status=202)
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        """Writes a JSON response."""
+        self._send_bytes(dumps(payload, indent=2).encode("utf-8"), "application/json", status)
+
+    def _send_file(self, file_path: Path, content_type: str) -> None:
+        """Writes a file as the response, or a 404 if it does not exist."""
+        if not file_path.is_file():
+            self._send_json({"error": f"'{file_path.name}' is not available."}, status=404)
+            return
+        self._send_bytes(file_path.read_bytes(), f"{content_type}; charset=utf-8", 200)
+
+    def _send_bytes(self, data: bytes, content_type: str, status: int) -> None:
+        """Writes a response body with its headers."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
@@ -0,0 +1,288 @@
+"""
+Lets identical concurrent model requests share one generation.
+
+This module contains the `SingleFlight` class. Concurrent runs, the packages
+of a batch run and queue workers that document common objects (standard
+includes, copied utility classes, shared CDS views) can send the same prompt
+while an identical request is still being generated. A request is identified
+by the hash of its model parameters, output schema, prompt template and page
+content. The first request with a key is sent to the model, and identical
+requests wait for its result instead of starting their own generation:
+
+1. Within a process, the waiting requests block on the running request and
+   receive its result, including a failure.
+2. Across the processes of a host, the running request claims its key in an
+   SQLite table and renews the claim with heartbeats while the model works.
+   Other processes register as waiters of the key, poll the row and take the
+   result once it is written. If the request fails, or its claim expires
+   because its process died, the row is released and the next process sends
+   the request itself.
+
+A result is only published for the processes registered as waiters and is
+removed once the last of them took it; without waiters, the row is deleted as
+soon as the request finishes. A request arriving after that is sent again, so
+the table never acts as a cache. Reuse of results is left to the
+`ResponseCache`.
+"""
+
+from app.resilience import RequestStats
+from app.results_store import deserialize_result, serialize_result
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from hashlib import sha256
+from json import dumps, loads
+from langchain_core.prompts.chat import ChatPromptTemplate
+from os import getpid
+from pathlib import Path
+from pydantic import BaseModel
+from socket import gethostname
+from sqlite3 import Connection, Error, connect
+from threading import Event, Lock, Thread
+from time import sleep, time
+from typing import Any, Callable, Dict, Iterator, Set, Tuple, Type
+
+_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS flights (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    result TEXT,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS flights_finished ON flights (finished_at);
+CREATE TABLE IF NOT EXISTS waiters (
+    key TEXT NOT NULL,
+    waiter TEXT NOT NULL,
+    PRIMARY KEY (key, waiter)
+);
+"""
+# Seconds between two looks at a request running in another process.
+_POLL_SECONDS: float = 0.5
+
+
+@dataclass
+class _Flight:
+    """A request running in this process and the outcome its waiting requests receive."""
+
+    done: Event = field(default_factory=Event)
+    result: Any = None
+    error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical requests that are in flight at the same time.
+
+    `run` can be called from any number of threads. Without a database path,
+    requests are only coalesced within the process.
+    """
+
+    def __init__(self, stats: RequestStats, database_path: str | None = None, lease_seconds: float = 30.0) -> None:
+        """
+        Initializes the coalescing layer.
+
+        Args:
+            stats: The counters receiving the number of coalesced requests.
+            database_path: The SQLite database shared by the processes of the
+                           host, or None to coalesce within the process only.
+            lease_seconds: How long a claim stays valid without a heartbeat
+                           before another process may send the request, and
+                           how long a result is kept for a waiter that
+                           stopped polling.
+        """
+        self.stats: RequestStats = stats
+        self.database_path: Path | None = Path(database_path) if database_path else None
+        self.lease_seconds: float = lease_seconds
+        self.owner: str = f"{gethostname()}-{getpid()}"
+        self._flights: Dict[str, _Flight] = {}
+        # The keys claimed in the database by this process, renewed by the heartbeat.
+        self._claimed: Set[str] = set()
+        self._heartbeat: Thread | None = None
+        self._shared: bool = self.database_path is not None
+        # Whether the database file and its tables were set up by this instance.
+        self._prepared: bool = False
+        # The digest of each prompt template and output schema, computed once.
+        self._digests: Dict[Any, str] = {}
+        self._lock = Lock()
+
+    def key(self, parameters: Tuple[Any, ...], prompt: ChatPromptTemplate, page_content: str, schema: Type[BaseModel] | None = None) -> str:
+        """
+        Returns the hash identifying a request.
+
+        Args:
+            parameters: The model name and every option that changes the answer (e.g., temperature, output cap).
+            prompt: The prompt template filled with the page content.
+            page_content: The content substituted into the template.
+            schema: The Pydantic model of a structured output, if any.
+        """
+        # Prompts without a template name are identified by their text, since the id of a freed prompt is reused.
+        template: str = (prompt.metadata or {}).get("template") or prompt.format(page_content="")
+        if template not in self._digests:
+            self._digests[template] = sha256(prompt.format(page_content="").encode("utf-8")).hexdigest()
+        if schema not in self._digests:
+            self._digests[schema] = sha256(dumps(schema.model_json_schema(), sort_keys=True).encode("utf-8")).hexdigest() if schema else "text"
+        request: str = "\0".join((repr(parameters), self._digests[schema], self._digests[template], page_content))
+        return sha256(request.encode("utf-8")).hexdigest()
+
+    def run(self, key: str, request: Callable[[], Any]) -> Any:
+        """
+        Sends a request unless an identical one is in flight, then waits for its result.
+
+        Args:
+            key: The hash of the request (see `key`).
+            request: Sends the request to the model and returns its result, or None if it failed.
+
+        Returns:
+            The result of this request or of the identical request it waited for.
+        """
+        with self._lock:
+            flight: _Flight | None = self._flights.get(key)
+            leading: bool = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+        if not leading:
+            flight.done.wait()
+            self.stats.increment("coalesced")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run_shared(key, request)
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def _run_shared(self, key: str, request: Callable[[], Any]) -> Any:
+        """Sends a request unless another process is sending it, then takes that process's result."""
+        if not self._shared:
+            return request()
+        while True:
+            try:
+                state, owner, result = self._claim(key)
+            except Error as error:
+                print(f"[WARNING] Requests are no longer coalesced across processes, {self.database_path} is unavailable: {error}")
+                self._shared = False
+                return request()
+            if state == "claimed":
+                break
+            if state == "gone":
+                # The identical request finished before this one registered; it is sent without a claim.
+                return request()
+            if state == "finished":
+                try:
+                    shared: BaseModel | str = deserialize_result(loads(result))
+                except ValueError:
+                    # A result of an older schema; this request is sent without a claim.
+                    return request()
+                self.stats.increment("coalesced" if owner == self.owner else "coalesced_remote")
+                return shared
+            sleep(_POLL_SECONDS)
+
+        with self._lock:
+            self._claimed.add(key)
+            if self._heartbeat is None:
+                self._heartbeat = Thread(target=self._renew_claims, name="single-flight-heartbeat", daemon=True)
+                self._heartbeat.start()
+        result = None
+        try:
+            result = request()
+            return result
+        finally:
+            with self._lock:
+                self._claimed.discard(key)
+            self._release(key, result)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[Connection]:
+        """Opens the database, creating its tables on first use, and holds its write lock for the duration of the block."""
+        database_path: Path = Path(self.database_path or "")
+        if not self._prepared:
+            database_path.parent.mkdir(parents=True, exist_ok=True)
+        connection: Connection = connect(database_path, timeout=30, isolation_level=None)
+        try:
+            if not self._prepared:
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.executescript(_SCHEMA)
+                self._prepared = True
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _claim(self, key: str) -> Tuple[str, str, str | None]:
+        """
+        Claims a request for this process unless another process is sending it.
+
+        A process finding the request running registers as its waiter; only
+        registered waiters take the result once it is written.
+
+        Returns:
+            "claimed", "running" (by another process), "finished" (with the
+            result for this waiter) or "gone" (finished before this process
+            registered), the process that claimed the request, and the
+            serialized result of a finished request.
+        """
+        now: float = time()
+        with self._transaction() as connection:
+            # Results left behind by waiters that stopped polling, e.g. because their process died.
+            stale: str = "SELECT key FROM flights WHERE finished_at < ?"
+            connection.execute(f"DELETE FROM waiters WHERE key IN ({stale})", (now - self.lease_seconds,))
+            connection.execute("DELETE FROM flights WHERE finished_at < ?", (now - self.lease_seconds,))
+            row: Tuple[str, float, str | None] | None = connection.execute("SELECT owner, heartbeat_at, result FROM flights WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[2] is not None:
+                if connection.execute("DELETE FROM waiters WHERE key = ? AND waiter = ?", (key, self.owner)).rowcount == 0:
+                    return "gone", row[0], None
+                if connection.execute("SELECT 1 FROM waiters WHERE key = ?", (key,)).fetchone() is None:
+                    connection.execute("DELETE FROM flights WHERE key = ?", (key,))
+                return "finished", row[0], row[2]
+            if row is not None and row[1] >= now - self.lease_seconds:
+                connection.execute("INSERT OR IGNORE INTO waiters (key, waiter) VALUES (?, ?)", (key, self.owner))
+                return "running", row[0], None
+            connection.execute("DELETE FROM waiters WHERE key = ? AND waiter = ?", (key, self.owner))
+            connection.execute(
+                "INSERT OR REPLACE INTO flights (key, owner, heartbeat_at, result, finished_at) VALUES (?, ?, ?, NULL, NULL)",
+                (key, self.owner, now),
+            )
+            return "claimed", self.owner, None
+
+    def _release(self, key: str, result: Any) -> None:
+        """Publishes the result of a claimed request to its waiters, or removes the claim if none wait or the request failed."""
+        try:
+            with self._transaction() as connection:
+                waiting: bool = connection.execute("SELECT 1 FROM waiters WHERE key = ?", (key,)).fetchone() is not None
+                if waiting and isinstance(result, (BaseModel, str)):
+                    connection.execute(
+                        "UPDATE flights SET result = ?, finished_at = ? WHERE key = ? AND owner = ?",
+                        (dumps(serialize_result(result), ensure_ascii=False), time(), key, self.owner),
+                    )
+                else:
+                    # The waiters of a failed request claim it themselves on their next poll.
+                    connection.execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, self.owner))
+        except Error as error:
+            # The waiting processes send the request themselves once the claim expires.
+            print(f"[WARNING] Could not publish a coalesced request to {self.database_path}: {error}")
+
+    def _renew_claims(self) -> None:
+        """Renews the claims of this process while their requests are running."""
+        while True:
+            sleep(self.lease_seconds / 3)
+            with self._lock:
+                claimed: bool = bool(self._claimed)
+            if not claimed:
+                continue
+            try:
+                with self._transaction() as connection:
+                    connection.execute("UPDATE flights SET heartbeat_at = ? WHERE owner = ? AND result IS NULL", (time(), self.owner))
+            except Error as error:
+                print(f"[WARNING] Could not renew the coalesced requests in {self.database_path}: {error}")
@@ -0,0 +1,164 @@
+"""
+Records the token throughput of model requests across runs.
+
+This module contains the `ThroughputRecorder`, which collects the prompt and
+output token counts and the prefill and decode durations that Ollama reports
+with every response, and persists them per model in a JSON file at the end of
+a run. The `ThroughputProfile` derived from the file is used to estimate the
+cost of future requests, e.g. by the `--plan` mode and the `Scheduler`.
+"""
+
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from json import JSONDecodeError, dumps, loads
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict
+
+
+@dataclass
+class StageThroughput:
+    """Token counts and durations of the requests of one stage."""
+
+    requests: float = 0.0
+    prompt_tokens: float = 0.0
+    output_tokens: float = 0.0
+    prefill_seconds: float = 0.0
+    decode_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    # The prompt tokens as counted by the application. Ollama's `prompt_eval_count`
+    # leaves out the prefix it reused from its cache, so only these relate the
+    # output to the prompts the `Scheduler` estimates.
+    counted_prompt_tokens: float = 0.0
+
+    def merge(self, other: "StageThroughput", weight: float = 1.0) -> None:
+        """Adds the weighted totals of another record to this one."""
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value * weight)
+
+
+@dataclass(frozen=True)
+class ThroughputProfile:
+    """Throughput rates of a model derived from previous runs."""
+
+    model_name: str
+    requests: int
+    prefill_rate: float | None
+    decode_rate: float | None
+    # Output tokens per counted prompt token for each stage.
+    output_ratios: Dict[str, float] = field(default_factory=dict)
+    updated_at: str = ""
+
+
+class ThroughputRecorder:
+    """
+    Collects per-stage throughput during a run and persists it per model.
+
+    When a run is saved, the totals stored from earlier runs are halved
+    before the new totals are added, so the profile follows changes of the
+    hardware or the model settings within a few runs.
+    """
+
+    # Weight of the previously stored totals when a new run is saved.
+    _DECAY: float = 0.5
+
+    def __init__(self) -> None:
+        """Initializes an empty recorder."""
+        self._stages: Dict[str, StageThroughput] = {}
+        self._lock = Lock()
+
+    def reset(self) -> None:
+        """Discards the records of the current run."""
+        with self._lock:
+            self._stages.clear()
+
+    def record(self, stage: str, response: Any, wall_seconds: float, counted_prompt_tokens: int = 0) -> None:
+        """
+        Records the token counts and durations reported with a response.
+
+        Structured output responses (with `include_raw`) are dictionaries that
+        carry the `AIMessage` under "raw"; plain responses are the message itself.
+
+        Args:
+            stage: The pipeline stage of the request.
+            response: The response of the model.
+            wall_seconds: The time from acquiring the concurrency slot to the response.
+            counted_prompt_tokens: The tokens of the prompt (template and content)
+                                   as counted by the application.
+        """
+        message: Any = response.get("raw") if isinstance(response, dict) else response
+        metadata: Dict[str, Any] = getattr(message, "response_metadata", None) or {}
+        record = StageThroughput(
+            requests=1,
+            prompt_tokens=metadata.get("prompt_eval_count") or 0,
+            output_tokens=metadata.get("eval_count") or 0,
+            prefill_seconds=(metadata.get("prompt_eval_duration") or 0) / 1e9,
+            decode_seconds=(metadata.get("eval_duration") or 0) / 1e9,
+            wall_seconds=wall_seconds,
+            counted_prompt_tokens=counted_prompt_tokens,
+        )
+        with self._lock:
+            self._stages.setdefault(stage, StageThroughput()).merge(record)
+
+    def save(self, file_path: str, model_name: str) -> None:
+        """Merges the records of the current run into the profile file of a model."""
+        with self._lock:
+            stages: Dict[str, StageThroughput] = {stage: StageThroughput(**asdict(record)) for stage, record in self._stages.items()}
+        if not stages:
+            return
+
+        profiles: Dict[str, Any] = _read_profiles(file_path)
+        stored: Dict[str, Any] = profiles.get(model_name.upper(), {})
+        merged: Dict[str, StageThroughput] = {}
+        for stage, values in stored.get("stages", {}).items():
+            if "counted_prompt_tokens" not in values:
+                # Recorded before the counted prompt tokens; its output would inflate the output ratio.
+                continue
+            merged[stage] = StageThroughput()
+            merged[stage].merge(StageThroughput(**values), weight=self._DECAY)
+        for stage, record in stages.items():
+            merged.setdefault(stage, StageThroughput()).merge(record)
+
+        profiles[model_name.upper()] = {
+            "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "stages": {stage: asdict(record) for stage, record in merged.items()},
+        }
+        try:
+            Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(file_path).write_text(dumps(profiles, indent=2), encoding="utf-8")
+        except OSError as error:
+            print(f"[WARNING] Failed to save the throughput profile: {error}")
+
+
+def load_profile(file_path: str, model_name: str) -> ThroughputProfile | None:
+    """
+    Loads the throughput profile of a model recorded by previous runs.
+
+    Returns:
+        The profile, or None if no requests were recorded for the model.
+    """
+    stored: Dict[str, Any] = _read_profiles(file_path).get(model_name.upper(), {})
+    stages: Dict[str, StageThroughput] = {stage: StageThroughput(**values) for stage, values in stored.get("stages", {}).items()}
+    if not stages:
+        return None
+
+    total = StageThroughput()
+    for record in stages.values():
+        total.merge(record)
+    return ThroughputProfile(
+        model_name=model_name.upper(),
+        requests=round(total.requests),
+        prefill_rate=total.prompt_tokens / total.prefill_seconds if total.prefill_seconds > 0 else None,
+        decode_rate=total.output_tokens / total.decode_seconds if total.decode_seconds > 0 else None,
+        output_ratios={stage: record.output_tokens / record.counted_prompt_tokens for stage, record in stages.items() if record.counted_prompt_tokens > 0},
+        updated_at=stored.get("updated_at", ""),
+    )
+
+
+def _read_profiles(file_path: str) -> Dict[str, Any]:
+    """Reads the profile file, returning an empty mapping if it is missing or corrupt."""
+    try:
+        profiles: Any = loads(Path(file_path).read_text(encoding="utf-8"))
+    except (OSError, JSONDecodeError):
+        return {}
+    return profiles if isinstance(profiles, dict) else {}
@@ -0,0 +1,154 @@
+"""
+Watches the source directory and reports debounced batches of changed files.
+
+This module contains the `SourceWatcher` class used by the `--watch` mode of
+`main.py`. It uses filesystem notifications (inotify on Linux) through the
+optional `watchdog` package when it is installed, and falls back to polling
+file modification times otherwise. Bursts of changes, such as an abapGit pull
+touching many files, are collected until the directory has been quiet for
+the debounce interval and are then reported as a single batch.
+"""
+
+from dataclasses import dataclass, field
+from os import walk
+from pathlib import Path
+from threading import Event, Lock
+from time import monotonic, sleep
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+try:
+    from watchdog.events import FileSystemEvent, FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - optional dependency
+    Observer = None
+
+
+@dataclass
+class ChangeBatch:
+    """A debounced set of source file changes."""
+
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+class SourceWatcher:
+    """
+    Reports changes to source files below a directory.
+
+    Iterating over the watcher blocks until a batch of changes is available
+    and yields it as a `ChangeBatch`. Iteration ends when `stop` is called.
+    """
+
+    def __init__(self, file_path: str, suffixes: Tuple[str, ...] = (".abap",), debounce: float = 1.0, interval: float = 1.0) -> None:
+        """
+        Initializes the watcher.
+
+        Args:
+            file_path: The directory to watch recursively.
+            suffixes: The file suffixes that count as source files.
+            debounce: Seconds without further changes before a batch is reported.
+            interval: Seconds between polls when notifications are unavailable.
+        """
+        self.file_path = Path(file_path)
+        self.suffixes: Tuple[str, ...] = suffixes
+        self.debounce: float = debounce
+        self.interval: float = interval
+        self._stopped = Event()
+        self._pending: Set[str] = set()
+        self._last_event: float = 0.0
+        self._lock = Lock()
+        self._snapshot: Dict[str, Tuple[int, int]] = self._scan()
+
+    @property
+    def uses_notifications(self) -> bool:
+        """Returns True if filesystem notifications are available."""
+        return Observer is not None
+
+    def stop(self) -> None:
+        """Ends the iteration after the current poll."""
+        self._stopped.set()
+
+    def __iter__(self) -> Iterator[ChangeBatch]:
+        """Yields debounced batches of changes until stopped."""
+        observer: Any = None
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(_NotificationHandler(self), str(self.file_path), recursive=True)
+            observer.start()
+            print(f"[INFO] Watching {self.file_path} using filesystem notifications")
+        else:
+            print(f"[INFO] Watching {self.file_path} by polling every {self.interval:.1f}s")
+
+        try:
+            while not self._stopped.is_set():
+                sleep(min(self.interval, self.debounce) if observer else self.interval)
+                if observer is None and self._poll():
+                    self._touch()
+                batch: ChangeBatch | None = self._take_batch()
+                if batch:
+                    yield batch
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Returns the modification time and size of every source file."""
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        for directory, _, file_names in walk(self.file_path):
+            for file_name in file_names:
+                if file_name.lower().endswith(self.suffixes):
+                    file: Path = Path(directory) / file_name
+                    try:
+                        stat = file.stat()
+                    except OSError:
+                        continue
+                    snapshot[str(file)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _poll(self) -> bool:
+        """Compares a fresh scan with the last one and marks differing files as pending."""
+        snapshot: Dict[str, Tuple[int, int]] = self._scan()
+        differing: Set[str] = {path for path in snapshot.keys() | self._snapshot.keys() if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        with self._lock:
+            self._pending |= differing
+        return bool(differing)
+
+    def _touch(self, path: str | None = None) -> None:
+        """Records that a change happened now, restarting the debounce interval."""
+        with self._lock:
+            if path is not None:
+                self._pending.add(path)
+            self._last_event = monotonic()
+
+    def _take_batch(self) -> ChangeBatch | None:
+        """Returns the pending changes once the debounce interval has passed."""
+        with self._lock:
+            if not self._pending or monotonic() - self._last_event < self.debounce:
+                return None
+            pending: List[str] = sorted(self._pending)
+            self._pending.clear()
+        batch = ChangeBatch()
+        for path in pending:
+            (batch.changed if Path(path).is_file() else batch.removed).append(path)
+        return batch
+
+
+if Observer is not None:
+
+    class _NotificationHandler(FileSystemEventHandler):
+        """Forwards filesystem notifications for source files to the watcher."""
+
+        def __init__(self, watcher: SourceWatcher) -> None:
+            """Initializes the handler for the given watcher."""
+            super().__init__()
+            self.watcher: SourceWatcher = watcher
+
+        def on_any_event(self, event: FileSystemEvent) -> None:
+            """Marks the affected source files as pending."""
+            if event.is_directory or event.event_type in ("opened", "closed_no_write"):
+                return
+            for path in (event.src_path, getattr(event, "dest_path", "")):
+                if path and str(path).lower().endswith(self.watcher.suffixes):
+                    self.watcher._touch(str(path))
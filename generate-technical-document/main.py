@@ -4,21 +4,53 @@ Entry point for the document generation application.
 This script initializes and runs the document generation process. It uses the
 `argparse` library to handle command-line arguments for the source code
 directory, the output directory, and the language model name, providing
-sensible defaults from the application's configuration.
+sensible defaults from the application's configuration. With `--plan` it only
+estimates the cost of a run without contacting the model, with `--watch` it
+keeps regenerating the objects whose sources change, and with `--serve` it
+instead runs as a daemon that accepts jobs over a local HTTP API. With
+`--search` it queries the documentation index of a previous run and exits.
+With `--queue` the run hands its model requests to a shared job queue, and
+with `--worker --queue` the process serves the jobs of that queue on the
+local model. `--profile` profiles the stages of a run and writes the reports
+next to the output. `--render_only` rebuilds the reports from the results
+store of a previous run without contacting the model. Requests whose input is
+unchanged since an earlier run are answered from the response cache unless
+`--no_cache` is given. Several `--file_path` roots or a `--manifest` of
+packages are documented in one batch run on a shared model. With
+`--deadline` the run finishes by a given time, processing the most important
+objects first and switching to cheaper modes as the deadline approaches.
+
+Only the configuration is imported at startup. The application modules, and
+with them LangChain, Pydantic and Tiktoken, are imported once the arguments
+have been parsed and a run actually starts, so `--help`, argument errors and
+the interactive prompts respond immediately.
 """
 
 from app.config import (
+    DEFAULT_ARCHIVE_PATTERN,
+    DEFAULT_DUMP_THRESHOLD_MB,
     DEFAULT_INPUT_PATH,
+    DEFAULT_JOBS_PATH,
+    DEFAULT_METHOD_ANALYSIS_MIN_TOKENS,
     DEFAULT_MODEL_NAME,
     DEFAULT_OUTPUT_PATH,
+    DEFAULT_PREPROCESS_WORKERS,
+    DEFAULT_QUEUE_LEASE_SECONDS,
+    DEFAULT_QUEUE_MAX_ATTEMPTS,
+    DEFAULT_RESPONSE_CACHE_PATH,
+    DEFAULT_SERVER_HOST,
+    DEFAULT_SERVER_PORT,
+    DEFAULT_SERVER_SOURCE_ROOT,
 )
-from app.create_document import CreateDocument
-from app.document_splitter import Document_Splitter
-from app.generate_document import Generate
-from app.language_model import Ollama
-from app.prompt_generator import PromptGenerator
 from argparse import ArgumentParser, Namespace
-from typing import Any
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from app.deadline import DeadlineController
+    from app.generate_document import Generate
+    from app.profiler import RunProfiler
 
 
 def main() -> None:
@@ -31,36 +63,328 @@ def main() -> None:
     """
     # Initialize the argument parser with a description of the application.
     parser = ArgumentParser(description="Analyze ABAP source code and generate Markdown documentation.")
-    parser.add_argument("--file_path", type=str, default=None, help="Path to the code files. Optional.")
+    parser.add_argument(
+        "--file_path",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Path to the code files, a .zip/.tar archive of them, or a multi-object source dump; several paths are documented as separate packages. Optional.",
+    )
+    parser.add_argument("--manifest", type=str, default=None, help="JSON file listing the packages of a batch run with their output paths.")
     parser.add_argument("--output_path", type=str, default=None, help="Path for the output files. Optional.")
     parser.add_argument("--model", type=str, default=None, help="Name of the language model. Optional.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PREPROCESS_WORKERS, help="Worker processes for loading and splitting large corpora.")
+    parser.add_argument("--archive_pattern", type=str, default=DEFAULT_ARCHIVE_PATTERN, help="Pattern selecting the source files inside an archive.")
+    parser.add_argument("--no_cache", action="store_true", help="Send every request to the model instead of reusing the results of unchanged inputs.")
+    parser.add_argument("--plan", action="store_true", help="Estimate requests, tokens and wall time without contacting the model.")
+    parser.add_argument("--search", type=str, default=None, help="Search the documentation index in the output path and exit.")
+    parser.add_argument("--search_field", type=str, default=None, help="Limit the search to one field: name, summary, analysis, structure, fields or specification.")
+    parser.add_argument("--document_type", type=str, default=None, help="Limit the search to one document type (e.g., CLASS).")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of search results.")
+    parser.add_argument(
+        "--profile",
+        nargs="+",
+        metavar="[STAGE:]MODE",
+        default=None,
+        help="Profile the run with cprofile, sampling or memory, for all stages or one of loading, splitting, prompts, llm and rendering (e.g., llm:sampling).",
+    )
+    parser.add_argument("--watch", action="store_true", help="Keep running and regenerate the objects whose source files change.")
+    parser.add_argument("--debounce", type=float, default=1.0, help="Seconds of quiet before a burst of changes is processed in watch mode.")
+    parser.add_argument("--serve", action="store_true", help="Run as a daemon accepting jobs over a local HTTP API.")
+    parser.add_argument("--host", type=str, default=DEFAULT_SERVER_HOST, help="Interface of the HTTP API in server mode.")
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT, help="Port of the HTTP API in server mode.")
+    parser.add_argument("--queue", type=str, default=None, help="Shared job queue file; the run hands its model requests to the queue workers.")
+    parser.add_argument("--worker", action="store_true", help="Process the jobs of the --queue on the local model.")
+    parser.add_argument("--idle_timeout", type=float, default=None, help="Seconds without queued jobs after which a worker stops. Optional.")
+    parser.add_argument("--render_only", action="store_true", help="Rebuild the reports from the stored results of the last run without the model.")
+    parser.add_argument("--formats", nargs="+", choices=["markdown", "html", "json"], default=["markdown"], help="Formats written by --render_only.")
+    parser.add_argument("--deadline", type=str, default=None, help="Finish the run by a time (e.g., 05:30) or after a duration (e.g., 2h, 45m), degrading the output as needed.")
     # Parse the arguments provided at the command line.
     args: Namespace = parser.parse_args()
 
+    if args.search is not None:
+        search(output_path=args.output_path or DEFAULT_OUTPUT_PATH, query=args.search, field=args.search_field, document_type=args.document_type, limit=args.limit)
+        return
+
+    if args.render_only:
+        create_app().render(output_file_path=args.output_path or DEFAULT_OUTPUT_PATH, formats=list(dict.fromkeys(args.formats)))
+        return
+
+    if args.worker:
+        if not args.queue:
+            parser.error("--worker requires --queue")
+        work(queue_path=args.queue, model_name=args.model or DEFAULT_MODEL_NAME, idle_timeout=args.idle_timeout)
+        return
+
+    if args.serve:
+        serve(model_name=args.model or DEFAULT_MODEL_NAME, host=args.host, port=args.port)
+        return
+
+    profiler: "RunProfiler | None" = None
+    if args.profile:
+        from app.profiler import RunProfiler
+
+        try:
+            profiler = RunProfiler(RunProfiler.parse(args.profile))
+        except ValueError as error:
+            parser.error(str(error))
+
+    if args.manifest or (args.file_path and len(args.file_path) > 1):
+        for flag in ("plan", "watch", "queue", "deadline"):
+            if getattr(args, flag):
+                parser.error(f"--{flag} cannot be combined with several packages")
+        batch(args=args, profiler=profiler, parser=parser)
+        return
+
+    deadline: "DeadlineController | None" = None
+    if args.deadline is not None:
+        for flag in ("plan", "watch", "queue"):
+            if getattr(args, flag):
+                parser.error(f"--deadline cannot be combined with --{flag}")
+        deadline = create_deadline(args.deadline, parser)
+
     # If arguments are not provided via command line, prompt the user interactively.
-    file_path: Any | str = args.file_path or input(f"Enter the path for the code files (default: {DEFAULT_INPUT_PATH}): ").strip() or DEFAULT_INPUT_PATH
+    file_path: Any | str = (args.file_path and args.file_path[0]) or input(f"Enter the path for the code files (default: {DEFAULT_INPUT_PATH}): ").strip() or DEFAULT_INPUT_PATH
     output_path: Any | str = args.output_path or input(f"Enter the output file path (default: {DEFAULT_OUTPUT_PATH}): ").strip() or DEFAULT_OUTPUT_PATH
     model_name: Any | str = args.model or input(f"Enter the model name (default: {DEFAULT_MODEL_NAME}): ").strip() or DEFAULT_MODEL_NAME
 
-    # --- Application Composition Root ---
-    # Instantiate all the components of the application.
-    document_splitter: Document_Splitter = Document_Splitter()
+    # Run the application workflow.
+    app: "Generate" = create_app(workers=args.workers, archive_pattern=args.archive_pattern, queue_path=args.queue, cache=not args.no_cache, deadline=deadline)
+    if profiler is not None:
+        profiler.activate()
+    try:
+        if args.plan:
+            app.plan(file_path=file_path, output_file_path=output_path, model_name=model_name)
+        else:
+            app.run(
+                file_path=file_path,
+                output_file_path=output_path,
+                model_name=model_name,
+            )
+    finally:
+        if profiler is not None:
+            # Only the initial run is profiled; watch mode continues without the profiler.
+            profiler.deactivate()
+            report_profile(profiler=profiler, output_path=output_path)
+    if args.plan:
+        return
+    if args.watch and Path(file_path).is_file():
+        print("[WARNING] Watch mode requires a source directory; archives and dumps are processed once.")
+    elif args.watch:
+        watch(app=app, file_path=file_path, output_path=output_path, model_name=model_name, debounce=args.debounce)
+
+
+def create_deadline(value: str, parser: ArgumentParser) -> "DeadlineController":
+    """
+    Creates the controller of a deadline-bounded run.
+
+    Args:
+        value: The deadline as given on the command line.
+        parser: The argument parser, used to report an invalid deadline or fallback model.
+    """
+    from app.deadline import DeadlineController, parse_deadline
+    from app.language_model import Ollama
+
+    try:
+        timestamp: float = parse_deadline(value)
+    except ValueError as error:
+        parser.error(str(error))
+    fallback_model: str | None = Ollama().deadline_model
+    if fallback_model and fallback_model not in Ollama().model_configs:
+        parser.error(f"OLLAMA_DEADLINE_MODEL '{fallback_model}' is not a configured model")
+    return DeadlineController(timestamp, fallback_model=fallback_model)
+
+
+def batch(args: Namespace, profiler: "RunProfiler | None", parser: ArgumentParser) -> None:
+    """
+    Documents the packages of a manifest, or of several input roots, in one run.
+
+    Args:
+        args: The parsed arguments; the output path is the root of the package reports.
+        profiler: An optional profiler observing the whole batch.
+        parser: The argument parser, used to report an unreadable manifest.
+    """
+    from app.batch_runner import BatchRunner, Package, load_manifest, packages_from_roots
+
+    output_root: str = args.output_path or DEFAULT_OUTPUT_PATH
+    try:
+        packages: List[Package] = load_manifest(args.manifest, output_root) if args.manifest else packages_from_roots(args.file_path, output_root)
+    except ValueError as error:
+        parser.error(str(error))
+    runner = BatchRunner(create_app(workers=args.workers, archive_pattern=args.archive_pattern, cache=not args.no_cache))
+    if profiler is not None:
+        profiler.activate()
+    try:
+        runner.run(packages=packages, model_name=args.model or DEFAULT_MODEL_NAME)
+    finally:
+        if profiler is not None:
+            profiler.deactivate()
+            report_profile(profiler=profiler, output_path=output_root)
+
+
+def create_app(
+    workers: int = DEFAULT_PREPROCESS_WORKERS,
+    archive_pattern: str = DEFAULT_ARCHIVE_PATTERN,
+    queue_path: str | None = None,
+    cache: bool = True,
+    deadline: "DeadlineController | None" = None,
+) -> "Generate":
+    """
+    Application composition root.
+
+    Instantiates all the components of the application and injects them
+    into the main orchestrator.
+
+    Args:
+        workers: The number of worker processes used for preprocessing.
+        archive_pattern: The pattern selecting the source files inside archives.
+        queue_path: An optional shared job queue file that receives the model requests.
+        cache: Whether requests with unchanged input are answered from the response cache
+               and identical in-flight requests share one generation.
+        deadline: An optional controller keeping the run within a fixed time window.
+    """
+    from app.create_document import CreateDocument
+    from app.document_splitter import Document_Splitter
+    from app.generate_document import Generate
+    from app.job_queue import JobQueue
+    from app.language_model import Ollama
+    from app.prompt_generator import PromptGenerator
+    from app.response_cache import ResponseCache
+
+    document_splitter: Document_Splitter = Document_Splitter(
+        workers=workers,
+        archive_pattern=archive_pattern,
+        dump_threshold=int(DEFAULT_DUMP_THRESHOLD_MB * 2**20),
+    )
     llm_manager: Ollama = Ollama()
+    if not cache:
+        # Without the cache, no request is answered with the result of another one.
+        llm_manager.single_flight = None
     prompt_generator: PromptGenerator = PromptGenerator()
     document_creator: CreateDocument = CreateDocument()
-    # Instantiate the main orchestrator, injecting the components.
-    app = Generate(
+    return Generate(
         document_splitter=document_splitter,
         llm_manager=llm_manager,
         prompt_generator=prompt_generator,
         document_creator=document_creator,
+        job_queue=JobQueue(queue_path, lease_seconds=DEFAULT_QUEUE_LEASE_SECONDS, max_attempts=DEFAULT_QUEUE_MAX_ATTEMPTS) if queue_path else None,
+        response_cache=ResponseCache(DEFAULT_RESPONSE_CACHE_PATH) if cache else None,
+        method_min_tokens=DEFAULT_METHOD_ANALYSIS_MIN_TOKENS,
+        deadline=deadline,
     )
-    # Run the application workflow.
-    app.run(
-        file_path=file_path,
-        output_file_path=output_path,
-        model_name=model_name,
-    )
+
+
+def work(queue_path: str, model_name: str, idle_timeout: float | None) -> None:
+    """
+    Runs a worker serving the jobs of a shared queue on the local model.
+
+    Args:
+        queue_path: The job queue file on the shared mount.
+        model_name: The model the jobs are sent to.
+        idle_timeout: Seconds without queued jobs after which the worker stops, or None to run until interrupted.
+    """
+    from app.job_queue import JobQueue
+    from app.queue_worker import QueueWorker
+
+    job_queue = JobQueue(queue_path, lease_seconds=DEFAULT_QUEUE_LEASE_SECONDS, max_attempts=DEFAULT_QUEUE_MAX_ATTEMPTS)
+    worker = QueueWorker(app=create_app(cache=False), job_queue=job_queue, model_name=model_name, idle_timeout=idle_timeout)
+    if not worker.run():
+        print("Failed to initialize the language model. Aborting.")
+
+
+def watch(app: "Generate", file_path: str, output_path: str, model_name: str, debounce: float) -> None:
+    """
+    Regenerates the documentation of changed objects until interrupted.
+
+    The orchestrator of the initial run is reused, so the model connection,
+    the prompt templates and the results of unchanged objects stay warm.
+
+    Args:
+        app: The orchestrator that performed the initial run.
+        file_path: The directory to watch.
+        output_path: The directory of the Markdown report.
+        model_name: The name of the language model.
+        debounce: Seconds of quiet before a burst of changes is processed.
+    """
+    from app.language_separator import ABAP
+    from app.watcher import SourceWatcher
+
+    watcher = SourceWatcher(file_path=file_path, suffixes=ABAP.get_source_extensions(), debounce=debounce)
+    try:
+        for batch in watcher:
+            print(f"\n=== Detected {len(batch.changed)} changed and {len(batch.removed)} removed files ===")
+            app.update(
+                file_path=file_path,
+                output_file_path=output_path,
+                model_name=model_name,
+                changed_files=batch.changed,
+                removed_files=batch.removed,
+            )
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def search(output_path: str, query: str, field: str | None, document_type: str | None, limit: int) -> None:
+    """
+    Prints the objects of the documentation index matching a query.
+
+    Args:
+        output_path: The directory holding the report and its index.
+        query: The search terms; all of them must match.
+        field: An optional field to search in.
+        document_type: An optional document type to filter by.
+        limit: The maximum number of results.
+    """
+    from app.search_index import INDEX_FILENAME, SearchIndex, SearchResult
+
+    index = SearchIndex(str(Path(output_path) / INDEX_FILENAME))
+    if not index.database_path.is_file():
+        print(f"[ERROR] No documentation index found at {index.database_path}. Generate the documentation first.")
+        return
+    started: float = perf_counter()
+    try:
+        results: List[SearchResult] = index.search(query=query, field=field, document_type=document_type, limit=limit)
+    except ValueError as error:
+        print(f"[ERROR] {error}")
+        return
+    elapsed: float = perf_counter() - started
+
+    for result in results:
+        print(f"{result.name}  [{result.document_type}]  {result.source}")
+        print(f"\t{' '.join(result.snippet.split())}")
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms ({index.count()} objects indexed)")
+
+
+def report_profile(profiler: "RunProfiler", output_path: str) -> None:
+    """
+    Prints the stage timings of a profiled run and writes its reports.
+
+    Args:
+        profiler: The profiler that observed the run.
+        output_path: The directory receiving the `profile` reports.
+    """
+    profiler.print_summary()
+    written: List[Path] = profiler.write(output_path)
+    if written:
+        print(f"\tReports written to {written[0].parent}: {', '.join(path.name for path in written)}")
+
+
+def serve(model_name: str, host: str, port: int) -> None:
+    """
+    Runs the long-lived server mode with a warm model and prompt templates.
+
+    Args:
+        model_name: The model connected at startup and used by default.
+        host: The interface the HTTP API binds to.
+        port: The port the HTTP API binds to.
+    """
+    from app.server import DocumentServer
+
+    server = DocumentServer(app=create_app(), model_name=model_name, jobs_path=DEFAULT_JOBS_PATH, source_root=DEFAULT_SERVER_SOURCE_ROOT)
+    if not server.warm_up():
+        print("Failed to initialize the language model. Aborting.")
+        return
+    server.serve(host=host, port=port)
 
 
 if __name__ == "__main__":
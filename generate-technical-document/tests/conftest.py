@@ -0,0 +1,32 @@
+"""
+Shared fixtures of the preprocessing tests.
+
+The tests reuse the source generators, helpers and recorded baseline of
+`tools/check_preprocessing.py`, so the script and the tests always check
+the same expectations. The project root and `tools/` are on the import path
+(see `[tool.pytest.ini_options]` in `pyproject.toml`).
+"""
+
+from app.document_splitter import Document_Splitter
+from check_preprocessing import BASELINE_PATH, measure_machine
+from json import loads
+from pytest import fixture
+from typing import Any, Dict
+
+
+@fixture(scope="session")
+def baseline() -> Dict[str, Any]:
+    """Returns the baseline recorded by `check_preprocessing.py --update`."""
+    return loads(BASELINE_PATH.read_text(encoding="utf-8"))
+
+
+@fixture(scope="session")
+def splitter() -> Document_Splitter:
+    """Returns an in-process splitter shared by the tests."""
+    return Document_Splitter()
+
+
+@fixture(scope="session")
+def machine_speed(baseline: Dict[str, Any]) -> float:
+    """Returns the time of the fixed workload on this machine relative to the machine of the baseline."""
+    return min(measure_machine() for _ in range(5)) / baseline["machine_seconds"]
@@ -0,0 +1,90 @@
+"""
+Checks how the specification input is fitted into its token budget.
+
+The sections of the sample Markdown appear in another order than their
+priorities, so the tests tell the priority order from the document order.
+Tokens are counted as characters, which makes every budget exact.
+"""
+
+from app.context_budget import SpecificationContext
+from pytest import mark
+from typing import Dict, List
+
+# The sections of the sample in document order, and their titles by priority (highest first).
+SECTIONS: Dict[str, List[str]] = {
+    "Summary": ["The report program lists the open items of a company code.", "It is started from the transaction ZFI_OPEN."],
+    "Interface": ["Parameter P_BUKRS selects the company code of the items.", "Select option S_BUDAT limits the posting dates."],
+    "Quality": ["The SELECT inside the loop should be replaced by a join.", "Hard-coded texts should move to text symbols."],
+    "Core Logic": ["Items are read from BSID and grouped by customer account.", "Each group is summed up per currency of the items."],
+    "Data Interaction": ["Table BSID is read with the company code and the dates.", "Table KNA1 is read for the names of the customers."],
+}
+PRIORITY_ORDER: List[str] = ["Interface", "Core Logic", "Data Interaction", "Summary", "Quality"]
+
+
+def markdown(sections: Dict[str, List[str]]) -> str:
+    """Returns Markdown with a level-two heading per section."""
+    return "\n".join(line for title, lines in sections.items() for line in [f"## {title}", *lines])
+
+
+def section_tokens(title: str) -> int:
+    """Returns the budget a whole section takes, one token per character and line break."""
+    return sum(len(line) + 1 for line in [f"## {title}", *SECTIONS[title]])
+
+
+@mark.parametrize("budget", [0, 40, 150, 400, 700, 10_000])
+def test_output_within_budget(budget: int) -> None:
+    """The input never exceeds the budget, and the recorded trim matches the output."""
+    context = SpecificationContext(token_counter=len, budget=budget)
+    output: str = context.build("zfi_open_items", markdown(SECTIONS))
+    assert len(output) <= budget
+    assert context.trims["zfi_open_items"].tokens == len(output)
+
+
+def test_input_within_budget_unchanged() -> None:
+    """An input that fits the budget is returned as it is."""
+    text: str = markdown(SECTIONS)
+    context = SpecificationContext(token_counter=len, budget=len(text))
+    assert context.build("zfi_open_items", text) == text
+    assert context.trims["zfi_open_items"].trimmed_tokens == 0
+
+
+def test_duplicates_removed_first() -> None:
+    """Repeated lines are removed from the section of lower priority before any section is cut."""
+    repeated: str = SECTIONS["Interface"][0]
+    sections: Dict[str, List[str]] = {**SECTIONS, "Summary": [*SECTIONS["Summary"], repeated]}
+    text: str = markdown(sections)
+    context = SpecificationContext(token_counter=len, budget=len(text) - len(repeated) - 1)
+    output: str = context.build("zfi_open_items", text)
+    assert output == markdown(SECTIONS)
+    assert context.trims["zfi_open_items"].duplicate_lines == 1
+    assert context.trims["zfi_open_items"].reduced_sections == []
+
+
+def test_duplicates_removed_without_budget() -> None:
+    """Without a budget, only repeated lines are removed; short lines and table separators are kept."""
+    lines: List[str] = ["| Field | Type |", "|---|---|", "| BUKRS | CHAR4 |", "|---|---|", "Done.", "Done."]
+    sections: Dict[str, List[str]] = {"Interface": [*lines, SECTIONS["Core Logic"][0]], "Core Logic": SECTIONS["Core Logic"]}
+    context = SpecificationContext(token_counter=len, budget=None)
+    output: str = context.build("zfi_open_items", markdown(sections))
+    assert output == markdown({"Interface": sections["Interface"], "Core Logic": SECTIONS["Core Logic"][1:]})
+
+
+@mark.parametrize("kept", range(len(PRIORITY_ORDER)))
+def test_sections_dropped_in_reverse_priority(kept: int) -> None:
+    """With room for the sections of highest priority, the others are dropped, lowest priority last in the report."""
+    budget: int = sum(section_tokens(title) for title in PRIORITY_ORDER[:kept])
+    context = SpecificationContext(token_counter=len, budget=budget)
+    output: str = context.build("zfi_open_items", markdown(SECTIONS))
+    assert output == markdown({title: lines for title, lines in SECTIONS.items() if title in PRIORITY_ORDER[:kept]})
+    assert context.trims["zfi_open_items"].reduced_sections == PRIORITY_ORDER[kept:]
+
+
+def test_section_cut_at_line_boundary() -> None:
+    """The first section that no longer fits is cut after its last whole line and marked as trimmed."""
+    marker: str = "(... trimmed to fit the context budget)"
+    budget: int = section_tokens("Interface") + len("## Core Logic\n") + len(SECTIONS["Core Logic"][0]) + 1 + len(marker) + 1 + 10
+    context = SpecificationContext(token_counter=len, budget=budget)
+    output: str = context.build("zfi_open_items", markdown(SECTIONS))
+    assert output.splitlines()[-3:] == ["## Core Logic", SECTIONS["Core Logic"][0], marker]
+    assert len(output) <= budget
+    assert context.trims["zfi_open_items"].reduced_sections == ["Core Logic", "Data Interaction", "Summary", "Quality"]
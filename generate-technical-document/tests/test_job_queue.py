@@ -0,0 +1,110 @@
+"""
+Checks the leases, re-queuing and results of the shared job queue.
+
+Every test uses its own database in a temporary directory and a lease of a
+fraction of a second, so expired leases are produced by waiting briefly.
+"""
+
+from app.job_queue import JobQueue
+from pathlib import Path
+from pytest import fixture
+from time import sleep
+from typing import List, Tuple
+
+LEASE_SECONDS: float = 0.2
+JOBS: List[Tuple[str, str, str, str]] = [
+    ("zcl_big", "analysis", "analysis.txt", "CLASS zcl_big DEFINITION."),
+    ("zcl_big", "structure", "structure.txt", "CLASS zcl_big DEFINITION."),
+    ("zr_small", "analysis", "analysis.txt", "REPORT zr_small."),
+]
+
+
+@fixture
+def queue(tmp_path: Path) -> JobQueue:
+    """Returns a queue with a short lease and two attempts per job."""
+    return JobQueue(str(tmp_path / "jobs.db"), lease_seconds=LEASE_SECONDS, max_attempts=2)
+
+
+def expire() -> None:
+    """Waits until the current leases have expired."""
+    sleep(LEASE_SECONDS * 1.5)
+
+
+def test_enqueue_returns_added_ids(queue: JobQueue) -> None:
+    """A second enqueue for the same run returns only the ids of its own jobs."""
+    first: List[int] = queue.enqueue("run", JOBS[:2])
+    second: List[int] = queue.enqueue("run", JOBS[2:])
+    assert len(first) == 2 and len(second) == 1
+    assert not set(first) & set(second)
+    assert queue.progress("run") == {"queued": 3}
+
+
+def test_claim_in_order(queue: JobQueue) -> None:
+    """Jobs are claimed in the order they were enqueued, each by one worker."""
+    ids: List[int] = queue.enqueue("run", JOBS)
+    claimed = [queue.claim(f"worker-{position}") for position in range(len(JOBS))]
+    assert [job.id for job in claimed if job] == ids
+    assert queue.claim("worker-late") is None
+    assert queue.progress("run") == {"leased": 3}
+
+
+def test_expired_lease_requeued(queue: JobQueue) -> None:
+    """A job whose worker stops sending heartbeats is claimed by another worker."""
+    (job_id,) = queue.enqueue("run", JOBS[:1])
+    assert queue.claim("worker-a") is not None
+    assert queue.claim("worker-b") is None
+    expire()
+    job = queue.claim("worker-b")
+    assert job is not None and job.id == job_id and job.attempts == 2
+
+
+def test_heartbeat_extends_lease(queue: JobQueue) -> None:
+    """A worker sending heartbeats keeps its job beyond the lease duration."""
+    queue.enqueue("run", JOBS[:1])
+    queue.claim("worker-a")
+    for _ in range(4):
+        sleep(LEASE_SECONDS / 2)
+        assert queue.heartbeat("worker-a", "MISTRAL") == 1
+    assert queue.claim("worker-b") is None
+    assert [worker[0] for worker in queue.live_workers()] == ["worker-a"]
+
+
+def test_failed_after_max_attempts(queue: JobQueue) -> None:
+    """A job whose lease expired `max_attempts` times is failed instead of re-queued."""
+    (job_id,) = queue.enqueue("run", JOBS[:1])
+    for worker in ("worker-a", "worker-b"):
+        assert queue.claim(worker) is not None
+        expire()
+    assert queue.claim("worker-c") is None
+    result = queue.results("run")[job_id]
+    assert (result.status, result.attempts, result.error) == ("failed", 2, "lease expired too often")
+
+
+def test_release_requeues_without_attempt(queue: JobQueue) -> None:
+    """The jobs of a stopping worker go back to the queue without using up an attempt."""
+    (job_id,) = queue.enqueue("run", JOBS[:1])
+    queue.claim("worker-a")
+    assert queue.release("worker-a") == 1
+    job = queue.claim("worker-b")
+    assert job is not None and job.id == job_id and job.attempts == 1
+
+
+def test_late_complete(queue: JobQueue) -> None:
+    """A late result is accepted until another worker finished the job; later results are rejected."""
+    (job_id,) = queue.enqueue("run", JOBS[:1])
+    queue.claim("worker-a")
+    expire()
+    assert queue.claim("worker-b") is not None
+    assert queue.complete(job_id, "worker-a", '"late result"')
+    assert not queue.complete(job_id, "worker-b", '"second result"')
+    result = queue.results("run")[job_id]
+    assert (result.status, result.worker, result.result) == ("done", "worker-a", '"late result"')
+
+
+def test_complete_without_result_fails(queue: JobQueue) -> None:
+    """A job completed without a result is marked as failed with its error."""
+    (job_id,) = queue.enqueue("run", JOBS[:1])
+    queue.claim("worker-a")
+    assert queue.complete(job_id, "worker-a", None, "model unavailable")
+    assert queue.results("run")[job_id].error == "model unavailable"
+    assert queue.progress("run") == {"failed": 1}
@@ -0,0 +1,47 @@
+"""
+Checks the classification, chunking and dump boundaries against fixed expectations.
+
+The synthetic sources and the golden files in `files/backup` must be
+classified and split exactly as recorded in the baseline of
+`tools/check_preprocessing.py`, and the first lines in `BOUNDARY_CASES` must
+start the expected objects of a source dump.
+"""
+
+from app.document_splitter import Document_Splitter
+from app.language_separator import ABAP
+from check_preprocessing import BASE_DIR, BOUNDARY_CASES, CHUNK_SIZE, GOLDEN_CHUNK_SIZES, SYNTHETIC_SIZES, classify_and_split, find_boundary, generate_source
+from pathlib import Path
+from pytest import mark
+from typing import Any, Dict, List
+
+# The sample sources whose classification and chunk counts are recorded in the baseline.
+GOLDEN_SAMPLES: List[Path] = sorted((BASE_DIR / "files" / "backup").glob("*.abap"))
+
+
+@mark.parametrize("size", SYNTHETIC_SIZES)
+@mark.parametrize("document_type", list(ABAP.get_document_keywords()))
+def test_synthetic_source(splitter: Document_Splitter, baseline: Dict[str, Any], document_type: str, size: int) -> None:
+    """A synthetic source of every document type and size keeps its type and chunk count."""
+    classified, chunks = classify_and_split(splitter, f"synthetic_{size}.abap", generate_source(document_type, size), CHUNK_SIZE)
+    assert {"document_type": classified, "chunks": chunks} == baseline["synthetic"][document_type][str(size)]
+
+
+def test_golden_samples_are_recorded(baseline: Dict[str, Any]) -> None:
+    """Every golden sample has a baseline entry and every entry a sample."""
+    assert sorted(sample.stem for sample in GOLDEN_SAMPLES) == sorted(baseline["golden"])
+
+
+@mark.parametrize("sample", GOLDEN_SAMPLES, ids=lambda sample: sample.stem)
+def test_golden_sample(splitter: Document_Splitter, baseline: Dict[str, Any], sample: Path) -> None:
+    """A golden sample keeps its type and its chunk counts at every golden chunk size."""
+    text: str = sample.read_text(encoding="utf-8")
+    results: Dict[str, Any] = {"document_type": "", "chunks": {}}
+    for chunk_size in GOLDEN_CHUNK_SIZES:
+        results["document_type"], results["chunks"][str(chunk_size)] = classify_and_split(splitter, str(sample), text, chunk_size)
+    assert results == baseline["golden"][sample.stem]
+
+
+@mark.parametrize(("line", "expected"), BOUNDARY_CASES, ids=[f"boundary_{position}" for position in range(len(BOUNDARY_CASES))])
+def test_object_boundary(tmp_path: Path, line: str, expected: str | None) -> None:
+    """A line starts a new object of a source dump with the expected name, or none."""
+    assert find_boundary(tmp_path, line) == expected
@@ -0,0 +1,40 @@
+"""
+Checks the time and memory of the preprocessing against the budgets of the baseline.
+
+The budgets are those of `tools/check_preprocessing.py`: the recorded times
+scaled by the speed of this machine plus `TOLERANCE`, and the recorded peak
+memory plus `MEMORY_TOLERANCE`. The tests are marked `perf`, take about a
+minute and only run with `-m perf` (see `addopts` in `pyproject.toml`).
+"""
+
+from app.document_splitter import Document_Splitter
+from check_preprocessing import MEMORY_TOLERANCE, TOLERANCE, create_corpus, run_scale, run_synthetic
+from pytest import TempPathFactory, fixture, mark
+from typing import Any, Dict
+
+pytestmark = mark.perf
+
+
+@fixture(scope="module")
+def scale(baseline: Dict[str, Any], tmp_path_factory: TempPathFactory) -> Dict[str, float]:
+    """Measures a corpus of as many files as the baseline's, since fixed costs weigh more in smaller corpora."""
+    directory = tmp_path_factory.mktemp("corpus")
+    create_corpus(directory, baseline["scale"]["files"])
+    return run_scale(str(directory), baseline["scale"]["files"])
+
+
+def test_synthetic_budget(splitter: Document_Splitter, baseline: Dict[str, Any], machine_speed: float) -> None:
+    """Classifying and splitting all synthetic sources stays within the time budget."""
+    _, seconds = run_synthetic(splitter)
+    assert seconds <= baseline["synthetic_seconds"] * machine_speed * (1 + TOLERANCE)
+
+
+@mark.parametrize("stage", ["load", "classify", "split"])
+def test_scale_budget(scale: Dict[str, float], baseline: Dict[str, Any], machine_speed: float, stage: str) -> None:
+    """Every stage of the scale corpus stays within its time budget per file."""
+    assert scale[stage] <= baseline["scale"][stage] * machine_speed * (1 + TOLERANCE)
+
+
+def test_scale_memory_budget(scale: Dict[str, float], baseline: Dict[str, Any]) -> None:
+    """The peak memory per file of the scale corpus stays within its budget."""
+    assert scale["peak_bytes"] <= baseline["scale"]["peak_bytes"] * (1 + MEMORY_TOLERANCE)
@@ -0,0 +1,191 @@
+"""
+Checks the timeout, retry, repair and hedging logic of the resilient request layer.
+
+The requests are fake callables that answer, fail or hang on demand, so the
+tests need neither a model nor a network. The backoff between retries is
+shortened to a few milliseconds.
+"""
+
+from app.concurrency import AdaptiveLimiter
+from app.resilience import RequestAttempt, RequestPolicy, ResilientInvoker, repair_json
+from pydantic import BaseModel
+from pytest import mark, raises
+from threading import Event
+from time import monotonic, sleep
+from typing import Any, List
+
+# A policy that retries at once and times out early while no latencies are known.
+FAST_POLICY = RequestPolicy(default_timeout=0.5, min_timeout=0.1, backoff_base=0.001, backoff_max=0.001)
+
+
+class Answer(BaseModel):
+    """A structured output with a string and a list."""
+
+    name: str
+    items: List[int]
+
+
+def answer(text: str) -> Any:
+    """Returns a request that starts its attempt and answers with the text."""
+
+    def request(request_attempt: RequestAttempt) -> str:
+        request_attempt.start()
+        return text
+
+    return request
+
+
+@mark.parametrize(
+    "text",
+    [
+        '```json\n{"name": "a", "items": [1, 2]}\n```',
+        'Here is the result:\n{"name": "a", "items": [1, 2,],}\nI hope this hel',
+        '{"name": "a",\n "items": [1, 2]}\n```',
+    ],
+    ids=["fenced", "trailing_text_and_commas", "unclosed_fence"],
+)
+def test_repair_json(text: str) -> None:
+    """A JSON object is recovered from fences, trailing commas and text truncated after the object."""
+    assert Answer.model_validate(repair_json(text)) == Answer(name="a", items=[1, 2])
+
+
+@mark.parametrize("text", ['{"name": "a", "items": [1, 2', "no JSON at all"], ids=["truncated_object", "no_object"])
+def test_repair_json_rejects(text: str) -> None:
+    """An object cut off before its closing brace cannot be repaired."""
+    with raises(ValueError):
+        repair_json(text)
+
+
+def test_timeout_from_p99() -> None:
+    """The timeout is the default until enough samples exist, then the p99 latency times the multiplier, never below the minimum."""
+    invoker = ResilientInvoker(RequestPolicy(default_timeout=600.0, min_timeout=30.0, timeout_multiplier=3.0, min_samples=5))
+    for latency in (10.0, 11.0, 12.0, 13.0):
+        invoker.latency.record("analysis", latency)
+    assert invoker.timeout_for("analysis") == 600.0
+    invoker.latency.record("analysis", 40.0)
+    assert invoker.timeout_for("analysis") == 120.0
+    for latency in (1.0, 1.0, 1.0, 1.0, 1.0):
+        invoker.latency.record("specification", latency)
+    assert invoker.timeout_for("specification") == 30.0
+
+
+def test_retry_after_failure() -> None:
+    """A failed request is retried and the retry's answer is returned."""
+    invoker = ResilientInvoker(FAST_POLICY)
+    calls: List[int] = []
+
+    def request(request_attempt: RequestAttempt) -> str:
+        request_attempt.start()
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("refused")
+        return "answer"
+
+    assert invoker.invoke("analysis", request, parse=lambda response: response) == "answer"
+    assert len(calls) == 2
+    assert invoker.stats.as_dict()["retries"] == 1
+
+
+def test_retry_after_unparsable_response() -> None:
+    """A response the parser rejects is retried."""
+    invoker = ResilientInvoker(FAST_POLICY)
+    responses: List[str] = ["not json", '{"name": "a", "items": []}']
+
+    def parse(response: str) -> Answer | None:
+        try:
+            return Answer.model_validate(repair_json(response))
+        except ValueError:
+            return None
+
+    def request(request_attempt: RequestAttempt) -> str:
+        request_attempt.start()
+        return responses.pop(0)
+
+    assert invoker.invoke("analysis", request, parse=parse) == Answer(name="a", items=[])
+
+
+def test_retry_after_timeout() -> None:
+    """A hung request times out, runs its timeout callbacks, and the retry answers."""
+    invoker = ResilientInvoker(FAST_POLICY)
+    hung = Event()
+    released = Event()
+    calls: List[int] = []
+
+    def request(request_attempt: RequestAttempt) -> str:
+        request_attempt.start()
+        calls.append(1)
+        if len(calls) == 1:
+            request_attempt.on_timeout(released.set)
+            hung.wait(5)
+        return "answer"
+
+    started: float = monotonic()
+    assert invoker.invoke("analysis", request, parse=lambda response: response) == "answer"
+    hung.set()
+    assert monotonic() - started < 2
+    assert released.is_set()
+    assert invoker.stats.as_dict()["timeouts"] == 1
+
+
+def test_timeout_frees_concurrency_slot() -> None:
+    """The retry of a timed-out request gets the only slot while the hung request still runs."""
+    invoker = ResilientInvoker(FAST_POLICY)
+    limiter = AdaptiveLimiter(initial_limit=1, max_limit=1, verbose=False)
+    hung = Event()
+
+    def request(request_attempt: RequestAttempt) -> str:
+        with limiter.slot() as slot:
+            request_attempt.start()
+            request_attempt.on_timeout(lambda: limiter.abandon(slot))
+            if not hung.is_set():
+                hung.set()
+                sleep(2)
+            return "answer"
+
+    started: float = monotonic()
+    assert invoker.invoke("analysis", request, parse=lambda response: response) == "answer"
+    assert monotonic() - started < 1.5
+    sleep(1)
+    assert limiter.in_flight == 0
+
+
+def test_failure_after_retries() -> None:
+    """A request failing every attempt returns None and counts as a failure."""
+    invoker = ResilientInvoker(FAST_POLICY)
+
+    def request(request_attempt: RequestAttempt) -> str:
+        request_attempt.start()
+        raise ConnectionError("refused")
+
+    assert invoker.invoke("analysis", request, parse=lambda response: response) is None
+    assert invoker.stats.as_dict()["retries"] == FAST_POLICY.max_retries
+    assert invoker.stats.as_dict()["failures"] == 1
+
+
+def test_hedge_wins_over_slow_primary() -> None:
+    """Once the p95 latency has passed, a hedged request is sent and its earlier answer is returned."""
+    invoker = ResilientInvoker(RequestPolicy(min_timeout=5.0, min_samples=5))
+    for _ in range(5):
+        invoker.latency.record("analysis", 0.05)
+    slow = Event()
+
+    def primary(request_attempt: RequestAttempt) -> str:
+        request_attempt.start()
+        slow.wait(5)
+        return "primary"
+
+    started: float = monotonic()
+    assert invoker.invoke("analysis", primary, parse=lambda response: response, hedge_request=lambda: "hedge") == "hedge"
+    slow.set()
+    assert monotonic() - started < 1
+    assert invoker.stats.as_dict()["hedged"] == 1
+    assert invoker.stats.as_dict()["hedge_wins"] == 1
+
+
+def test_no_hedge_for_fast_primary() -> None:
+    """A primary request answering before the p95 latency is not hedged."""
+    invoker = ResilientInvoker(RequestPolicy(min_samples=5))
+    for _ in range(5):
+        invoker.latency.record("analysis", 1.0)
+    assert invoker.invoke("analysis", answer("primary"), parse=lambda response: response, hedge_request=lambda: "hedge") == "primary"
+    assert invoker.stats.as_dict()["hedged"] == 0
@@ -0,0 +1,30 @@
+"""
+Checks the startup cost of the command line against the budgets of `tools/bench_startup.py`.
+
+`main.py --help` and `import app.config` are started in fresh interpreters
+with `-X importtime`; neither may import a module of `HEAVY_MODULES`. The
+import time budgets depend on the load of the machine and are marked `perf`.
+"""
+
+from bench_startup import HELP_BUDGET_MS, Scenario, heavy_modules, measure
+from pytest import mark
+
+SCENARIOS = [
+    Scenario("main.py --help", ("main.py", "--help"), HELP_BUDGET_MS, check_heavy=True),
+    Scenario("import app.config", ("-c", "import app.config"), HELP_BUDGET_MS, check_heavy=True),
+]
+
+
+@mark.parametrize("scenario", SCENARIOS, ids=lambda scenario: scenario.name)
+def test_no_heavy_imports(scenario: Scenario) -> None:
+    """The command line help and the configuration load without the model and parsing packages."""
+    _, _, modules = measure(scenario, repeat=1)
+    assert heavy_modules(modules) == []
+
+
+@mark.perf
+@mark.parametrize("scenario", SCENARIOS, ids=lambda scenario: scenario.name)
+def test_import_budget(scenario: Scenario) -> None:
+    """The median import time of five starts stays within the budget."""
+    import_ms, _, _ = measure(scenario, repeat=5)
+    assert import_ms <= scenario.budget_ms
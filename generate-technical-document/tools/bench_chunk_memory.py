@@ -0,0 +1,90 @@
+"""
+Compares the memory footprint of the chunk representations.
+
+A synthetic corpus is created from upper-cased copies of the sample sources
+in `files/backup`, so that the ABAP separators split every object into many
+chunks. The corpus is split once, and the resulting offsets are materialized
+both as the previous representation (one LangChain `Document` per chunk with
+its own text and metadata dictionary) and as compact `Chunk` records. The
+memory allocated for each representation is measured with `tracemalloc`.
+
+Usage:
+    python tools/bench_chunk_memory.py --files 2000 --chunk_size 256
+"""
+
+from argparse import ArgumentParser, Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from sys import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+from typing import Any, Callable, Dict, List
+
+BASE_DIR: Path = Path(__file__).resolve().parent.parent
+path.insert(0, str(BASE_DIR))
+
+from app.chunk_model import Chunk, SourceDocument, create_chunks  # noqa: E402
+from app.document_splitter import Document_Splitter  # noqa: E402
+from langchain_core.documents.base import Document  # noqa: E402
+
+
+def create_corpus(target: Path, files: int) -> None:
+    """Fills the target directory with upper-cased, uniquely named copies of the sample sources."""
+    samples: List[Path] = sorted((BASE_DIR / "files" / "backup").glob("*.abap"))
+    for index in range(files):
+        sample: Path = samples[index % len(samples)]
+        (target / f"{sample.stem}_{index:06d}.abap").write_text(sample.read_text(encoding="utf-8").upper(), encoding="utf-8")
+
+
+def build_documents(sources: List[SourceDocument], chunks: Dict[str, List[Chunk]]) -> List[Document]:
+    """Builds the previous representation: a `Document` with copied text and metadata per chunk."""
+    return [chunk.to_document() for source in sources for chunk in chunks[source.name]]
+
+
+def build_chunks(sources: List[SourceDocument], chunks: Dict[str, List[Chunk]]) -> List[Chunk]:
+    """Builds the compact representation from the same offsets."""
+    return [
+        chunk
+        for source in sources
+        for chunk in create_chunks(source, [(chunk.start, chunk.end, chunk.token_count) for chunk in chunks[source.name]])
+    ]
+
+
+def measure(label: str, build: Callable[[], List[Any]]) -> int:
+    """Builds a representation under `tracemalloc` and prints the allocated memory."""
+    start()
+    started: float = perf_counter()
+    result: List[Any] = build()
+    elapsed: float = perf_counter() - started
+    current, peak = get_traced_memory()
+    stop()
+    print(f"{label:<10} chunks={len(result):<8} allocated={current / 2**20:8.2f} MiB  peak={peak / 2**20:8.2f} MiB  time={elapsed:6.2f}s")
+    return current
+
+
+def main() -> None:
+    """Runs the benchmark and prints one line per representation."""
+    parser = ArgumentParser(description="Compare the memory footprint of the chunk representations.")
+    parser.add_argument("--files", type=int, default=2000, help="Number of files in the synthetic corpus.")
+    parser.add_argument("--chunk_size", type=int, default=256, help="Chunk size passed to the splitter.")
+    args: Namespace = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        create_corpus(Path(directory), args.files)
+        # Characters stand in for tokens so the benchmark does not depend on the tokenizer.
+        with redirect_stdout(StringIO()):
+            chunks: Dict[str, List[Chunk]] = Document_Splitter().split_documents(file_path=directory, chunk_size=args.chunk_size, token_counter=len)
+
+    sources: List[SourceDocument] = [document_chunks[0].document for document_chunks in chunks.values() if document_chunks]
+    text_size: int = sum(len(source.text) for source in sources)
+    print(f"Corpus: {len(sources)} documents, {text_size / 2**20:.2f} MiB of source text (shared by both representations)")
+
+    documents: int = measure("documents", lambda: build_documents(sources, chunks))
+    compact: int = measure("chunks", lambda: build_chunks(sources, chunks))
+    print(f"Compact chunks use {documents / max(compact, 1):.1f}x less memory than per-chunk documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Measures the per-request overhead of the LangChain and the direct backend.
+
+The benchmark starts a mock Ollama server that answers instantly (prefill and
+decode rates far above any real model), so the measured latency is almost
+entirely client overhead: building the chain or request body, serializing
+the JSON schema, HTTP handling and validating the structured output. The same
+structured analysis requests are sent through `Ollama.invoke` with each
+backend, first one at a time and then from a thread pool.
+
+Usage:
+    python tools/bench_direct_client.py --requests 300 --parallel 4
+"""
+
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+from pathlib import Path
+from statistics import mean, median
+from sys import path
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_ollama_server import MockOllamaConfig, start_server  # noqa: E402
+
+
+def measure(send: Callable[[], Any], requests: int, parallel: int) -> Dict[str, float]:
+    """Sends the requests and returns the latency percentiles and the request rate."""
+
+    def timed(_: int) -> float:
+        started: float = perf_counter()
+        if send() is None:
+            raise RuntimeError("A request of the benchmark failed")
+        return perf_counter() - started
+
+    started: float = perf_counter()
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        latencies: List[float] = sorted(executor.map(timed, range(requests)))
+    elapsed: float = perf_counter() - started
+    return {
+        "mean": mean(latencies) * 1000,
+        "p50": median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "rate": requests / elapsed,
+    }
+
+
+def main() -> None:
+    """Runs both backends against the mock server and prints the overhead saved per request."""
+    parser = ArgumentParser(description="Compare the per-request overhead of the LangChain and the direct backend.")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per backend and concurrency.")
+    parser.add_argument("--parallel", type=int, default=4, help="Concurrent requests of the parallel round.")
+    parser.add_argument("--model", type=str, default="MISTRAL", help="Model key from the .env file.")
+    args: Namespace = parser.parse_args()
+
+    server = start_server(MockOllamaConfig(capacity=args.parallel, prefill_rate=1e9, decode_rate=1e9, output_tokens=50, contention=0.0))
+    environ["OLLAMA_MODEL_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    environ["OLLAMA_PARALLEL_INITIAL"] = str(args.parallel)
+    environ["OLLAMA_MAX_PARALLEL"] = str(args.parallel)
+    environ.pop("OLLAMA_HEDGE_BASE_URL", None)
+    # Every request is identical; coalescing would answer most of them without reaching the server.
+    environ["OLLAMA_SINGLE_FLIGHT"] = "off"
+
+    # Imported after the environment is prepared, since the manager reads it on creation.
+    from app.language_model import BACKENDS, Ollama
+    from app.prompt_generator import PromptGenerator
+    from app.structured_output import Code_Analysis
+
+    llm_manager = Ollama()
+    prompt = PromptGenerator().get_prompt("analysis_summary_template.md")
+    code: str = (Path(__file__).resolve().parent.parent / "prompts" / "method_analysis_template.md").read_text(encoding="utf-8")
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for backend in BACKENDS:
+        llm_manager.backend = backend
+        if not llm_manager.initialize_llm(args.model):
+            print(f"[ERROR] Could not connect to the mock server with the {backend} backend.")
+            return
+        send: Callable[[], Any] = lambda: llm_manager.invoke("analysis", prompt, code, Code_Analysis)  # noqa: E731
+        measure(send, min(20, args.requests), 1)
+        results[backend] = {"sequential": measure(send, args.requests, 1), "parallel": measure(send, args.requests, args.parallel)}
+    server.shutdown()
+
+    print(f"\nRequests per round: {args.requests}, parallel round: {args.parallel} threads, mock server answering instantly")
+    for round_name in ("sequential", "parallel"):
+        for backend in BACKENDS:
+            stats: Dict[str, float] = results[backend][round_name]
+            print(f"{round_name:<10} {backend:<9} mean={stats['mean']:7.2f} ms  p50={stats['p50']:7.2f} ms  p95={stats['p95']:7.2f} ms  {stats['rate']:8.1f} requests/s")
+        saved: float = results["langchain"][round_name]["mean"] - results["direct"][round_name]["mean"]
+        print(f"{round_name:<10} saved per request: {saved:.2f} ms ({saved / results['langchain'][round_name]['mean'] * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares the peak memory of scanning a multi-object source dump.
+
+A synthetic dump is created by concatenating upper-cased copies of the
+sample sources in `files/backup`, with each copy renamed so that every object
+is unique. The dump is then read the previous way (the whole file as one
+string plus the lower-cased copy made for classification) and with the
+memory-mapped `DumpScanner`, which decodes and classifies one object at a
+time. The peak memory of both is measured with `tracemalloc`.
+
+Usage:
+    python tools/bench_dump_scanner.py --copies 20000
+"""
+
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from sys import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+from typing import Callable, List
+
+BASE_DIR: Path = Path(__file__).resolve().parent.parent
+path.insert(0, str(BASE_DIR))
+
+from app.document_splitter import Document_Splitter  # noqa: E402
+from app.dump_scanner import DumpScanner  # noqa: E402
+
+
+def create_dump(target: Path, copies: int) -> None:
+    """Writes a dump holding the given number of uniquely named object copies."""
+    samples: List[Path] = sorted((BASE_DIR / "files" / "backup").glob("*.abap"))
+    with open(target, "w", encoding="utf-8") as dump:
+        for index in range(copies):
+            sample: Path = samples[index % len(samples)]
+            text: str = sample.read_text(encoding="utf-8").upper()
+            dump.write(text.replace("ZDMO_", f"Z{index:06d}_") + "\n")
+
+
+def read_whole(dump: Path) -> int:
+    """Reads the dump into one string and classifies it, as `TextLoader` does."""
+    text: str = dump.read_text(encoding="utf-8")
+    Document_Splitter()._analyze_document_type(text)
+    return 1
+
+
+def read_scanned(dump: Path) -> int:
+    """Reads and classifies the dump one object at a time with the `DumpScanner`."""
+    splitter = Document_Splitter()
+    objects: int = 0
+    for _, text in DumpScanner(str(dump)).read():
+        splitter._analyze_document_type(text)
+        objects += 1
+    return objects
+
+
+def measure(label: str, read: Callable[[], int]) -> None:
+    """Runs a reader under `tracemalloc` and prints its peak memory."""
+    start()
+    started: float = perf_counter()
+    objects: int = read()
+    elapsed: float = perf_counter() - started
+    _, peak = get_traced_memory()
+    stop()
+    print(f"{label:<8} objects={objects:<8} peak={peak / 2**20:9.2f} MiB  time={elapsed:6.2f}s")
+
+
+def main() -> None:
+    """Runs the benchmark and prints one line per reader."""
+    parser = ArgumentParser(description="Compare the peak memory of scanning a multi-object source dump.")
+    parser.add_argument("--copies", type=int, default=20000, help="Number of objects in the synthetic dump.")
+    args: Namespace = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        dump: Path = Path(directory) / "transport.abap"
+        create_dump(dump, args.copies)
+        print(f"Dump: {dump.stat().st_size / 2**20:.2f} MiB")
+        measure("whole", lambda: read_whole(dump))
+        measure("scanner", lambda: read_scanned(dump))
+
+
+if __name__ == "__main__":
+    main()
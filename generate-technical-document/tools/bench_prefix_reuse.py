@@ -0,0 +1,137 @@
+"""
+Measures the prefill time saved by reusing the cached prompt prefix of a template.
+
+The analysis and structure requests of the sample sources are sent in these
+layouts:
+
+- `no reuse`: the previous layout against a server without a prefix cache,
+  the baseline of the savings (mock server only).
+- `string/cost`: each template as one string with the code substituted into
+  it, ordered by estimated cost across all templates (the previous layout).
+- `chat/cost`: the chat prompts of the `PromptGenerator` (static system
+  message, then a user message with the code) in the same order.
+- `chat/grouped`: the chat prompts ordered by the `Scheduler`, which keeps
+  the requests of a template back to back among requests of similar cost.
+
+Without `--base_url`, every layout runs against a fresh mock server that
+simulates Ollama's prefix cache per parallel slot. With `--base_url`, the
+requests go to a real Ollama endpoint and the reported prefill durations are
+used; its cache is not reset between layouts, so the first layout also pays
+for warming it up.
+
+Usage:
+    python tools/bench_prefix_reuse.py --copies 4 --parallel 4
+    python tools/bench_prefix_reuse.py --base_url http://localhost:11434 --model MISTRAL
+"""
+
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from sys import path
+from time import monotonic
+from typing import Any, Callable, Dict, List, Tuple
+
+BASE_DIR: Path = Path(__file__).resolve().parent.parent
+path.insert(0, str(BASE_DIR))
+
+from mock_ollama_server import MockOllamaConfig, start_server  # noqa: E402
+
+
+def build_tasks(file_path: str, model_name: str, copies: int) -> Tuple[List[Any], List[Any]]:
+    """
+    Creates the analysis and structure tasks of the sources, each repeated `copies` times.
+
+    Returns:
+        The tasks in the scheduler's grouped order and in the previous cost order.
+    """
+    from app.document_splitter import Document_Splitter
+    from app.language_model import Ollama
+    from app.prompt_generator import PromptGenerator
+    from app.scheduler import Scheduler
+    from langchain_core.documents.base import Document
+
+    llm_manager = Ollama()
+    documents = Document_Splitter().split_documents(file_path=file_path, chunk_size=llm_manager.model_max_chunk(model_name), token_counter=llm_manager.count_tokens)
+    prompt_generator = PromptGenerator()
+    prompt_generator.create_analysis_prompts(documents=documents)
+
+    # Every copy differs right after the template, like a different object would.
+    prompts: Dict[str, Dict[str, Tuple[Any, Any]]] = {}
+    for document_name, stages in prompt_generator.get_documents.items():
+        for copy in range(copies):
+            prompts[f"{document_name}_{copy}"] = {
+                stage: (Document(page_content=f"* Copy {copy}\n{chunk.page_content}", metadata=chunk.metadata), prompt) for stage, (chunk, prompt) in stages.items()
+            }
+
+    scheduler = Scheduler(token_counter=llm_manager.count_tokens, prefill_rate=llm_manager.prefill_rate, decode_rate=llm_manager.decode_rate)
+    grouped = scheduler.plan(prompts=prompts, stages=("analysis", "structure"))
+    return grouped, sorted(grouped, key=lambda task: task.estimated_seconds, reverse=True)
+
+
+def string_prompt(prompt: Any) -> Any:
+    """Returns the previous single-string form of a chat prompt."""
+    from langchain_core.prompts import PromptTemplate
+
+    template: str = "\n\n".join(message.prompt.template for message in prompt.messages)
+    return PromptTemplate(input_variables=["page_content"], template=template)
+
+
+def run_layout(tasks: List[Any], prompt_for: Callable[[Any], Any], base_url: str, model: str, parallel: int) -> Tuple[List[Dict[str, Any]], float]:
+    """Sends the tasks in order from a thread pool and returns the response metadata and wall time."""
+    from langchain_ollama import ChatOllama
+
+    llm = ChatOllama(model=model, base_url=base_url, temperature=0.1, num_predict=64, keep_alive="30m")
+    started: float = monotonic()
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        responses = list(executor.map(lambda task: (prompt_for(task.prompt) | llm).invoke({"page_content": task.document.page_content}), tasks))
+    return [response.response_metadata for response in responses], monotonic() - started
+
+
+def main() -> None:
+    """Runs every layout and prints the mean prefill per request and the savings."""
+    parser = ArgumentParser(description="Measure the prefill time saved by template prefix reuse.")
+    parser.add_argument("--file_path", type=str, default=str(BASE_DIR / "files" / "backup"), help="Directory with the sample sources.")
+    parser.add_argument("--copies", type=int, default=4, help="Number of copies of every source.")
+    parser.add_argument("--parallel", type=int, default=4, help="Concurrent requests, and parallel slots of the mock server.")
+    parser.add_argument("--model", type=str, default="MISTRAL", help="Model key from the .env file.")
+    parser.add_argument("--base_url", type=str, default=None, help="A real Ollama endpoint; the mock server is used if omitted.")
+    parser.add_argument("--prefill_rate", type=float, default=2000.0, help="Prompt tokens per second of the mock server.")
+    args: Namespace = parser.parse_args()
+
+    from app.language_model import Ollama
+
+    model: str = Ollama().model_configs[args.model.upper()].name
+    grouped, by_cost = build_tasks(args.file_path, args.model, args.copies)
+    layouts: List[Tuple[str, List[Any], Callable[[Any], Any], bool]] = [
+        ("no reuse", by_cost, string_prompt, False),
+        ("string/cost", by_cost, string_prompt, True),
+        ("chat/cost", by_cost, lambda prompt: prompt, True),
+        ("chat/grouped", grouped, lambda prompt: prompt, True),
+    ]
+    if args.base_url:
+        layouts = layouts[1:]
+
+    print(f"Requests per layout: {len(grouped)}, parallel: {args.parallel}, endpoint: {args.base_url or 'mock with prefix cache'}")
+    baseline: float | None = None
+    for label, tasks, prompt_for, prefix_cache in layouts:
+        base_url: str | None = args.base_url
+        if base_url is None:
+            config = MockOllamaConfig(capacity=args.parallel, prefill_rate=args.prefill_rate, decode_rate=4000.0, output_tokens=64, contention=0.0, prefix_cache=prefix_cache)
+            server = start_server(config)
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        metadata, elapsed = run_layout(tasks, prompt_for, base_url, model, args.parallel)
+        if args.base_url is None:
+            server.shutdown()
+
+        prefill: float = sum(item.get("prompt_eval_duration", 0) for item in metadata) / 1e9 / len(metadata)
+        evaluated: float = sum(item.get("prompt_eval_count", 0) for item in metadata) / len(metadata)
+        baseline = prefill if baseline is None else baseline
+        saved: float = baseline - prefill
+        print(
+            f"{label:<13} prefill/request={prefill * 1000:8.1f} ms  evaluated tokens/request={evaluated:8.0f}  "
+            f"wall={elapsed:6.2f}s  saved/request={saved * 1000:7.1f} ms ({saved / baseline * 100 if baseline else 0.0:5.1f}%)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmarks multi-process preprocessing across worker counts.
+
+A synthetic corpus is created by copying the sample sources in
+`files/backup` under unique names into a temporary directory. The corpus is
+then loaded, classified, token-counted and split with an increasing number
+of worker processes, and the wall time and speedup are printed.
+
+With `--layout abapgit`, the copies are named like an abapGit repository
+(`.clas.abap`, `.ddls.asddls`, `.bdef.asbdef`, ...) with an XML description
+next to each, and the time spent determining the object types from the file
+names is compared with the keyword analysis of the contents.
+
+Usage:
+    python tools/bench_preprocessing.py --files 2000 --workers 1 2 4 8
+    python tools/bench_preprocessing.py --files 2000 --layout abapgit
+"""
+
+from argparse import ArgumentParser, Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from os import cpu_count
+from pathlib import Path
+from shutil import copyfile
+from sys import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+BASE_DIR: Path = Path(__file__).resolve().parent.parent
+path.insert(0, str(BASE_DIR))
+
+from app.document_splitter import Document_Splitter  # noqa: E402
+from app.language_model import Ollama  # noqa: E402
+
+
+# The abapGit object type and source extension used for the samples of a document type in the abapGit layout.
+_ABAPGIT_FILES: Dict[str, Tuple[str, str]] = {
+    "CLASS": ("clas", "abap"),
+    "SERVICE DEFINITION": ("srvd", "srvdsrv"),
+    "BEHAVIOR PROJECTION": ("bdef", "asbdef"),
+    "UNMANAGED BEHAVIOR DEFINITION": ("bdef", "asbdef"),
+    "MANAGED BEHAVIOR DEFINITION": ("bdef", "asbdef"),
+    "METADATA ENTITY": ("ddlx", "asddlxs"),
+}
+
+
+def create_corpus(target: Path, files: int, layout: str = "plain") -> None:
+    """Fills the target directory with uniquely named copies of the sample sources."""
+    samples: List[Path] = sorted((BASE_DIR / "files" / "backup").glob("*.abap"))
+    splitter = Document_Splitter()
+    types: Dict[Path, str] = {sample: splitter._analyze_document_type(sample.read_text(encoding="utf-8")) for sample in samples}
+    for index in range(files):
+        sample: Path = samples[index % len(samples)]
+        if layout == "plain":
+            copyfile(sample, target / f"{sample.stem}_{index:06d}.abap")
+            continue
+        file_type, extension = _ABAPGIT_FILES.get(types[sample], ("ddls", "asddls"))
+        object_name: str = f"{sample.stem}_{index:06d}"
+        copyfile(sample, target / f"{object_name}.{file_type}.{extension}")
+        (target / f"{object_name}.{file_type}.xml").write_text(f"<abapGit><DESCRIPT>Copy {index} of {sample.stem}</DESCRIPT></abapGit>\n", encoding="utf-8")
+
+
+def measure_classification(directory: str) -> None:
+    """Compares the object type inference from the file names with the keyword analysis of the contents."""
+    splitter = Document_Splitter()
+    sources: List[str] = splitter.select_sources(splitter._discover_files(directory))[0]
+    texts: List[Tuple[str, str]] = [(source, Path(source).read_text(encoding="utf-8")) for source in sources]
+    started: float = perf_counter()
+    for source, text in texts:
+        splitter._infer_document_type(source, text)
+    inferred: float = perf_counter() - started
+    started = perf_counter()
+    for _, text in texts:
+        splitter._analyze_document_type(text)
+    analyzed: float = perf_counter() - started
+    print(f"classification of {len(texts)} documents: file names {inferred * 1000:.1f} ms, keyword analysis {analyzed * 1000:.1f} ms ({analyzed / max(inferred, 1e-9):.0f}x)")
+
+
+def main() -> None:
+    """Runs the benchmark and prints one line per worker count."""
+    parser = ArgumentParser(description="Benchmark multi-process preprocessing.")
+    parser.add_argument("--files", type=int, default=2000, help="Number of files in the synthetic corpus.")
+    parser.add_argument("--chunk_size", type=int, default=16384, help="Chunk size passed to the splitter.")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Worker counts to benchmark.")
+    parser.add_argument("--layout", choices=["plain", "abapgit"], default="plain", help="Name the copies as plain .abap files or like an abapGit repository.")
+    args: Namespace = parser.parse_args()
+    worker_counts: List[int] = args.workers or sorted({1, 2, 4, cpu_count() or 1})
+
+    with TemporaryDirectory() as directory:
+        create_corpus(Path(directory), args.files, args.layout)
+        print(f"Corpus: {args.files} files ({args.layout} layout), {cpu_count()} CPUs available")
+        if args.layout == "abapgit":
+            measure_classification(directory)
+        baseline: float | None = None
+        for workers in worker_counts:
+            splitter = Document_Splitter(workers=workers)
+            started: float = perf_counter()
+            with redirect_stdout(StringIO()):
+                documents = splitter.split_documents(file_path=directory, chunk_size=args.chunk_size, token_counter=Ollama.count_tokens)
+            elapsed: float = perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3} documents={len(documents):<7} time={elapsed:8.2f}s  speedup={baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures building, updating and querying the documentation search index.
+
+A synthetic set of objects is generated, each with a summary, an analysis
+naming the tables it reads, a structure table of fields and a specification.
+The script times the initial index build, an incremental update in which a
+share of the objects is regenerated and some are removed, and a set of
+keyword, namespace and field-name queries.
+
+Usage:
+    python tools/bench_search_index.py --objects 100000
+"""
+
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from sys import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.search_index import SearchIndex  # noqa: E402
+from langchain_core.documents.base import Document  # noqa: E402
+
+# The tables and document types the synthetic objects are spread over.
+TABLES: Tuple[str, ...] = ("/dmo/agency", "/dmo/travel", "/dmo/booking", "/dmo/customer", "/dmo/flight", "vbak", "vbap", "mara")
+TYPES: Tuple[str, ...] = ("CLASS", "DATABASE TABLE", "ROOT ENTITY", "FUNCTION MODULE", "REPORT")
+
+
+def create_object(index: int, revision: int = 0) -> Dict[str, List[Document]]:
+    """Builds the formatted sections of one synthetic object."""
+    table: str = TABLES[index % len(TABLES)]
+    metadata: Dict[str, object] = {
+        "source": f"src/z{index:06d}.abap",
+        "document_type": TYPES[index % len(TYPES)],
+        "document_tokens": 500 + index % 4000,
+        "chunk_token_count": 500 + index % 2000,
+    }
+    fields: str = "\n".join(f"| field_{index % 97}_{column} | abap.char(10) | No | Field {column} of the object. |" for column in range(8))
+    analysis: str = (
+        f"## Code Analysis\n\n ### **Summary**:\nObject Type: {metadata['document_type']}. Purpose: maintains records of {table} (revision {revision}).\n\n"
+        f"### **Analysis**:\n### Data Interaction\nSELECT SINGLE from {table} into ls_result where id = iv_id.\n"
+        f"### Core Logic & Flow\nReads the entries of {table}, validates them and returns the result set of object {index}."
+    )
+    return {
+        "analysis": [Document(page_content=analysis, metadata=metadata)],
+        "structure": [Document(page_content=f"## Code Structure\n\n| Field Name | Type | Is Key Field | Description |\n|---|---|---|---|\n{fields}", metadata=metadata)],
+        "specification": [Document(page_content=f"## Technical Specification\n\nThe object z{index:06d} manages {table} records.", metadata=metadata)],
+    }
+
+
+def timed(label: str, action) -> object:
+    """Runs an action, prints its duration and returns its result."""
+    started: float = perf_counter()
+    result = action()
+    print(f"{label:<45} {(perf_counter() - started) * 1000:10.1f} ms")
+    return result
+
+
+def main() -> None:
+    """Builds, updates and queries an index of synthetic objects."""
+    parser = ArgumentParser(description="Measure building, updating and querying the documentation search index.")
+    parser.add_argument("--objects", type=int, default=100000, help="Number of synthetic objects.")
+    parser.add_argument("--changed", type=float, default=0.01, help="Share of objects regenerated in the incremental update.")
+    args: Namespace = parser.parse_args()
+
+    documents: Dict[str, Dict[str, List[Document]]] = {f"z{index:06d}": create_object(index) for index in range(args.objects)}
+    with TemporaryDirectory() as directory:
+        index = SearchIndex(str(Path(directory) / "documentation.db"))
+        print(f"Objects: {args.objects}")
+        print("Build:", timed("initial synchronization", lambda: index.synchronize(documents)))
+
+        step: int = max(1, round(1 / args.changed)) if args.changed > 0 else args.objects + 1
+        regenerated: List[str] = [f"z{position:06d}" for position in range(0, args.objects, step)]
+        for name in regenerated:
+            documents[name] = create_object(int(name[1:]), revision=1)
+        for position in range(1, args.objects, step * 10):
+            documents.pop(f"z{position:06d}", None)
+        print("Update:", timed("incremental synchronization (all compared)", lambda: index.synchronize(documents)))
+        for name in regenerated:
+            documents[name] = create_object(int(name[1:]), revision=2)
+        print("Update:", timed("incremental synchronization (regenerated only)", lambda: index.synchronize(documents, names=regenerated)))
+
+        queries: List[Tuple[str, str, str | None, str | None]] = [
+            ("namespace table", "/dmo/agency", None, None),
+            ("keyword in analysis", "validates", "analysis", None),
+            ("field name", "field_42_3", "fields", None),
+            ("two terms, type filter", "/dmo/travel revision", None, "CLASS"),
+            ("object name", "z004242", "name", None),
+        ]
+        for label, query, field, document_type in queries:
+            results = timed(f"query: {label}", lambda: index.search(query=query, field=field, document_type=document_type, limit=20))
+            print(f"\t{len(results)} results for {query!r}")
+
+
+if __name__ == "__main__":
+    main()
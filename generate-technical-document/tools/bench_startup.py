@@ -0,0 +1,121 @@
+"""
+Measures the startup cost of the command line and checks it against budgets.
+
+Every scenario is started in a fresh interpreter with `-X importtime`, and the
+cumulative import time of the modules imported by the scenario (excluding
+the interpreter's own `site` setup) is reported together with the wall time.
+A scenario fails if its median import time exceeds its budget or if it
+imports a module that must only be loaded once a run starts.
+
+The script exits with a non-zero status if any scenario fails, so it can be
+used as a check in CI.
+
+Usage:
+    python tools/bench_startup.py --repeat 5 --help-budget 150
+"""
+
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass
+from pathlib import Path
+from statistics import median
+from subprocess import run
+from sys import executable, exit
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+BASE_DIR: Path = Path(__file__).resolve().parent.parent
+
+# Modules that must not be imported before a run starts.
+HEAVY_MODULES: Tuple[str, ...] = ("langchain_core", "langchain_community", "langchain_ollama", "langchain_text_splitters", "pydantic", "tiktoken")
+# The default import budget in milliseconds of the command line help and the configuration.
+HELP_BUDGET_MS: float = 150.0
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A command whose startup is measured."""
+
+    name: str
+    arguments: Tuple[str, ...]
+    budget_ms: float | None
+    check_heavy: bool
+
+
+def parse_importtime(output: str) -> Tuple[float, List[str]]:
+    """
+    Parses the `-X importtime` output of an interpreter.
+
+    Returns:
+        The cumulative import time in milliseconds of all top-level imports
+        except `site`, and the names of all imported modules.
+    """
+    total_us: int = 0
+    modules: List[str] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # The header line.
+        module: str = name.strip()
+        modules.append(module)
+        # Top-level imports are not indented; their cumulative times add up to the total.
+        if not name[1:].startswith(" ") and module != "site":
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def heavy_modules(modules: List[str]) -> List[str]:
+    """Returns the imported modules that belong to a package of `HEAVY_MODULES`."""
+    return sorted({module for module in modules if module.split(".")[0] in HEAVY_MODULES})
+
+
+def measure(scenario: Scenario, repeat: int) -> Tuple[float, float, List[str]]:
+    """Runs a scenario repeatedly and returns its median import and wall times in milliseconds."""
+    import_times: List[float] = []
+    wall_times: List[float] = []
+    modules: List[str] = []
+    for _ in range(repeat):
+        started: float = perf_counter()
+        result = run([executable, "-X", "importtime", *scenario.arguments], cwd=BASE_DIR, capture_output=True, text=True)
+        wall_times.append((perf_counter() - started) * 1000)
+        if result.returncode != 0:
+            raise RuntimeError(f"'{scenario.name}' failed with exit code {result.returncode}:\n{result.stderr[-2000:]}")
+        import_ms, modules = parse_importtime(result.stderr)
+        import_times.append(import_ms)
+    return median(import_times), median(wall_times), modules
+
+
+def main() -> None:
+    """Runs all scenarios and exits with status 1 if a budget is exceeded."""
+    parser = ArgumentParser(description="Measure the startup cost of the command line.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per scenario; the median is reported.")
+    parser.add_argument("--help-budget", type=float, default=HELP_BUDGET_MS, help="Import budget in milliseconds for 'main.py --help'.")
+    parser.add_argument("--pipeline-budget", type=float, default=None, help="Optional import budget in milliseconds for the full pipeline.")
+    args: Namespace = parser.parse_args()
+
+    scenarios: List[Scenario] = [
+        Scenario("main.py --help", ("main.py", "--help"), args.help_budget, check_heavy=True),
+        Scenario("import app.config", ("-c", "import app.config"), args.help_budget, check_heavy=True),
+        Scenario("full pipeline imports", ("-c", "import main; main.create_app()"), args.pipeline_budget, check_heavy=False),
+    ]
+
+    failures: Dict[str, str] = {}
+    for scenario in scenarios:
+        import_ms, wall_ms, modules = measure(scenario, max(1, args.repeat))
+        budget: str = f"{scenario.budget_ms:.0f} ms" if scenario.budget_ms is not None else "none"
+        print(f"{scenario.name:<24} imports={import_ms:8.1f} ms  wall={wall_ms:8.1f} ms  budget={budget}")
+        if scenario.budget_ms is not None and import_ms > scenario.budget_ms:
+            failures[scenario.name] = f"imports took {import_ms:.1f} ms (budget {scenario.budget_ms:.0f} ms)"
+        if scenario.check_heavy:
+            heavy: List[str] = heavy_modules(modules)
+            if heavy:
+                failures[scenario.name] = f"imports heavy modules: {', '.join(heavy[:5])}"
+
+    for name, reason in failures.items():
+        print(f"[ERROR] {name}: {reason}")
+    exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
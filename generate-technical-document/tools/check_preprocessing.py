@@ -0,0 +1,290 @@
+"""
+Guards the classification, chunking and speed of the preprocessing against regressions.
+
+A change to the separators or keywords in `ABAP` can silently change the
+chunk counts, and with them the number and size of the model requests, or
+make loading and splitting much slower. This check compares three kinds of
+results with a baseline recorded by `--update` in
+`tools/preprocessing_baseline.json`, and checks the object boundaries of
+multi-object dumps against fixed expectations:
+
+1. Synthetic sources: for every document type in `ABAP.get_document_keywords()`,
+   a source of 1 KB, 64 KB, 1 MB and 5 MB is generated. Its classified type
+   and chunk count must match the baseline, and the total time to classify
+   and split all of them must stay within the tolerance.
+2. Golden files: the document type and the chunk counts at two chunk sizes
+   of every sample in `files/backup` must match the baseline exactly.
+3. Scale: a corpus of `--files` synthetic files (10,000 by default) is loaded,
+   classified and split. The time per file of each stage and the peak memory
+   per file must stay within the tolerance; they are only compared if the
+   corpus has as many files as the baseline's, since fixed costs weigh more
+   in smaller corpora.
+4. Object boundaries: the first lines in `BOUNDARY_CASES` must start a new
+   object of a source dump with the expected name, or not start one.
+
+Times are compared after scaling the baseline by the speed of the machine,
+measured with a fixed workload that does not depend on the application.
+Tokens are counted as characters, so the results do not depend on whether a
+Tiktoken encoding is available. The script exits with a non-zero status if
+any check fails, so it can be used as a check in CI. The same checks run as
+pytest modules in `tests/`, which import the helpers of this script.
+
+Usage:
+    python tools/check_preprocessing.py
+    python tools/check_preprocessing.py --update
+    python tools/check_preprocessing.py --files 2000 --tolerance 0.5
+"""
+
+from argparse import ArgumentParser, Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+from json import dumps, loads
+from pathlib import Path
+from sys import exit, path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+from typing import Any, Dict, List, Tuple
+
+BASE_DIR: Path = Path(__file__).resolve().parent.parent
+path.insert(0, str(BASE_DIR))
+
+from app.document_splitter import Document_Splitter  # noqa: E402
+from app.dump_scanner import DumpScanner  # noqa: E402
+from app.language_separator import ABAP  # noqa: E402
+
+BASELINE_PATH: Path = Path(__file__).resolve().parent / "preprocessing_baseline.json"
+# Sizes in bytes of the synthetic sources of each document type.
+SYNTHETIC_SIZES: Tuple[int, ...] = (1024, 64 * 1024, 2**20, 5 * 2**20)
+# Chunk sizes of the golden files: the model's usual chunk size and a small one that exercises the separators.
+GOLDEN_CHUNK_SIZES: Tuple[int, ...] = (512, 16384)
+CHUNK_SIZE: int = 16384
+# Default allowed slowdown and peak memory growth over the baseline, as a fraction.
+TOLERANCE: float = 0.3
+MEMORY_TOLERANCE: float = 0.2
+# First lines of a source dump object and the object they start, or None for lines inside an object (local classes).
+BOUNDARY_CASES: Tuple[Tuple[str, str | None], ...] = (
+    ("CLASS zcl_demo DEFINITION PUBLIC FINAL CREATE PUBLIC.", "zcl_demo"),
+    ("CLASS zcl_demo DEFINITION PUBLIC INHERITING FROM zcl_base.", "zcl_demo"),
+    ("CLASS /dmo/cl_demo DEFINITION FINAL PUBLIC CREATE PRIVATE.", "dmo_cl_demo"),
+    ("CLASS zcl_demo DEFINITION INHERITING FROM zcl_base PUBLIC ABSTRACT.", "zcl_demo"),
+    ("CLASS zcl_demo DEFINITION ABSTRACT FOR TESTING PUBLIC.", "zcl_demo"),
+    ("INTERFACE zif_demo PUBLIC.", "zif_demo"),
+    ("CLASS lcl_helper DEFINITION FINAL CREATE PUBLIC.", None),
+    ("CLASS lcl DEFINITION CREATE PUBLIC.", None),
+    ("CLASS lcl DEFINITION INHERITING FROM zcl_a CREATE PUBLIC.", None),
+    ("CLASS lcl DEFINITION INHERITING FROM zcl_a FINAL CREATE PROTECTED.", None),
+    ("CLASS zcl_other DEFINITION DEFERRED PUBLIC.", None),
+    ("CLASS lhc_agency DEFINITION INHERITING FROM cl_abap_behavior_handler.", None),
+)
+
+# The statement repeated to fill a synthetic source of each category; "{n}" is the number of the repetition.
+_BODIES: Dict[str, str] = {
+    "OBJECT ORIENTED": "\nMETHOD method_{n}.\n  DATA lv_value_{n} TYPE i.\n  lv_value_{n} = {n} * 2.\n  IF lv_value_{n} > 10.\n    RETURN.\n  ENDIF.\nENDMETHOD.\n",
+    "DATABASE": "  field_{n} : abap.char(10); // element {n}\n",
+    "RAP FRAMEWORK": "\nDEFINE BEHAVIOR FOR zi_entity_{n} ALIAS entity_{n}\n{{\n  update;\n  delete;\n  field ( readonly ) id_{n};\n}}\n",
+    "CLASSICAL": "\nFORM routine_{n}.\n  WRITE: / 'line {n}'.\nENDFORM.\n",
+    "FUNCTION MODULE": "\nFUNCTION z_function_{n}.\n  DATA lv_{n} TYPE i.\n  lv_{n} = {n}.\nENDFUNCTION.\n",
+    "OTHER": "* interval {n}: from {n}000 to {n}999\n",
+}
+
+
+def generate_source(document_type: str, size: int) -> str:
+    """
+    Generates a deterministic source of about the given size for a document type.
+
+    The source starts with the keywords of the type and is filled with a
+    statement typical for the type's category.
+    """
+    category: str = next((category for category, types in ABAP.get_document_categories().items() if document_type in types), "OTHER")
+    parts: List[str] = [f"* Synthetic {document_type.lower()} source\n", " ".join(ABAP.get_document_keywords()[document_type]), "\n"]
+    length: int = sum(len(part) for part in parts)
+    number: int = 0
+    while length < size:
+        number += 1
+        statement: str = _BODIES[category].format(n=number)
+        parts.append(statement)
+        length += len(statement)
+    return "".join(parts)[:size]
+
+
+def measure_machine() -> float:
+    """Times a fixed workload independent of the application, to scale the time budgets to the machine."""
+    text: str = "method data select from where endmethod. " * 20000
+    started: float = perf_counter()
+    for _ in range(5):
+        sum(number * number for number in range(200000))
+        text.lower().count("select")
+        sorted(text.split())
+    return perf_counter() - started
+
+
+def classify_and_split(splitter: Document_Splitter, source: str, text: str, chunk_size: int) -> Tuple[str, int]:
+    """Classifies a source and returns its document type and chunk count."""
+    from langchain_core.documents.base import Document
+
+    document_type: str = splitter._infer_document_type(source, text)
+    offsets: List[Tuple[int, int, int]] = splitter._split_offsets(document=Document(page_content=text, metadata={"source": source}), chunk_size=min(len(text), chunk_size), token_counter=len)
+    return document_type, len(offsets)
+
+
+def run_synthetic(splitter: Document_Splitter) -> Tuple[Dict[str, Dict[str, Any]], float]:
+    """Classifies and splits the synthetic sources of every document type and size."""
+    results: Dict[str, Dict[str, Any]] = {}
+    elapsed: float = 0.0
+    for document_type in ABAP.get_document_keywords():
+        for size in SYNTHETIC_SIZES:
+            text: str = generate_source(document_type, size)
+            started: float = perf_counter()
+            classified, chunks = classify_and_split(splitter, f"synthetic_{size}.abap", text, CHUNK_SIZE)
+            elapsed += perf_counter() - started
+            results.setdefault(document_type, {})[str(size)] = {"document_type": classified, "chunks": chunks}
+    return results, elapsed
+
+
+def run_golden(splitter: Document_Splitter) -> Dict[str, Dict[str, Any]]:
+    """Classifies and splits the sample sources at every golden chunk size."""
+    results: Dict[str, Dict[str, Any]] = {}
+    for sample in sorted((BASE_DIR / "files" / "backup").glob("*.abap")):
+        text: str = sample.read_text(encoding="utf-8")
+        chunks: Dict[str, int] = {}
+        document_type: str = ""
+        for chunk_size in GOLDEN_CHUNK_SIZES:
+            document_type, chunks[str(chunk_size)] = classify_and_split(splitter, str(sample), text, chunk_size)
+        results[sample.stem] = {"document_type": document_type, "chunks": chunks}
+    return results
+
+
+def create_corpus(target: Path, files: int) -> None:
+    """Writes a corpus of small synthetic sources of all document types, between 1 and 8 KB each."""
+    document_types: List[str] = list(ABAP.get_document_keywords())
+    for index in range(files):
+        document_type: str = document_types[index % len(document_types)]
+        size: int = 1024 * (1 + (index * 7) % 8)
+        (target / f"synthetic_{index:06d}.abap").write_text(generate_source(document_type, size), encoding="utf-8")
+
+
+def run_scale(directory: str, files: int) -> Dict[str, float]:
+    """Measures the time per file of loading, classifying and splitting the corpus, and the peak memory per file."""
+    with redirect_stdout(StringIO()):
+        # An untimed pass imports the loaders and warms the file cache, which the first timed load would pay for.
+        Document_Splitter()._load_documents(file_path=directory)
+        # The best of two passes is less affected by other load on the machine.
+        loaded: float = float("inf")
+        for _ in range(2):
+            splitter = Document_Splitter()
+            started: float = perf_counter()
+            splitter._load_documents(file_path=directory)
+            loaded = min(loaded, perf_counter() - started)
+        documents = splitter._document_directory
+        if len(documents) != files:
+            raise RuntimeError(f"Loaded {len(documents)} of {files} corpus files")
+        classified: float = float("inf")
+        split: float = float("inf")
+        for _ in range(2):
+            started = perf_counter()
+            for document in documents:
+                splitter._infer_document_type(document.metadata["source"], document.page_content)
+            classified = min(classified, perf_counter() - started)
+            started = perf_counter()
+            for document in documents:
+                splitter._split_offsets(document=document, chunk_size=min(len(document.page_content), CHUNK_SIZE), token_counter=len)
+            split = min(split, perf_counter() - started)
+
+        splitter = Document_Splitter()
+        start()
+        splitter.split_documents(file_path=directory, chunk_size=CHUNK_SIZE, token_counter=len)
+        _, peak = get_traced_memory()
+        stop()
+    return {"files": files, "load": loaded / files, "classify": classified / files, "split": split / files, "peak_bytes": peak / files}
+
+
+def find_boundary(directory: Path, line: str, position: int = 0) -> str | None:
+    """Returns the object a line starts after a first object in a source dump, or None if it starts none."""
+    dump: Path = directory / f"dump_{position}.txt"
+    dump.write_text(f"REPORT zfirst.\nWRITE 'first'.\n{line}\n  PUBLIC SECTION.\nENDCLASS.\n", encoding="utf-8")
+    names: List[str] = [Path(source).stem for source, _ in DumpScanner(str(dump)).read()]
+    return names[1] if len(names) > 1 else None
+
+
+def run_boundaries(directory: Path) -> Dict[str, str | None]:
+    """Returns the object started by each line of `BOUNDARY_CASES` in a source dump, or None."""
+    return {line: find_boundary(directory, line, position) for position, (line, _) in enumerate(BOUNDARY_CASES)}
+
+
+def compare_exact(name: str, expected: Dict[str, Any], actual: Dict[str, Any], failures: List[str]) -> None:
+    """Records a failure for every entry whose result differs from the baseline."""
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            failures.append(f"{name} {key}: expected {expected.get(key)}, got {actual.get(key)}")
+
+
+def compare_budget(name: str, baseline: float, actual: float, tolerance: float, unit: str, failures: List[str]) -> None:
+    """Prints a measurement and records a failure if it exceeds the baseline by more than the tolerance."""
+    budget: float = baseline * (1 + tolerance)
+    status: str = "ok" if actual <= budget else "REGRESSION"
+    print(f"\t{name:<28} {actual:12.2f} {unit:<3} baseline {baseline:12.2f} {unit:<3} budget {budget:12.2f} {unit:<3} {status}")
+    if actual > budget:
+        failures.append(f"{name}: {actual:.2f} {unit} is more than {tolerance:.0%} over the baseline of {baseline:.2f} {unit}")
+
+
+def main() -> None:
+    """Runs the checks and exits with status 1 if a result changed or a budget is exceeded."""
+    parser = ArgumentParser(description="Check the preprocessing against the recorded baseline.")
+    parser.add_argument("--update", action="store_true", help="Record the current results as the new baseline.")
+    parser.add_argument("--files", type=int, default=10000, help="Number of files in the scale corpus.")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown over the baseline, as a fraction.")
+    parser.add_argument("--memory_tolerance", type=float, default=MEMORY_TOLERANCE, help="Allowed peak memory growth over the baseline, as a fraction.")
+    args: Namespace = parser.parse_args()
+
+    splitter = Document_Splitter()
+    machine: float = min(measure_machine() for _ in range(5))
+    synthetic, synthetic_seconds = run_synthetic(splitter)
+    print(f"Synthetic sources: {sum(len(sizes) for sizes in synthetic.values())} classified and split in {synthetic_seconds:.2f}s")
+    golden: Dict[str, Dict[str, Any]] = run_golden(splitter)
+    print(f"Golden files: {len(golden)} samples")
+    with TemporaryDirectory() as directory:
+        boundaries: Dict[str, str | None] = run_boundaries(Path(directory))
+        create_corpus(Path(directory), args.files)
+        scale: Dict[str, float] = run_scale(directory, args.files)
+    print(f"Scale corpus: {args.files} files")
+    # Measured before and after the checks, so a temporary slowdown of the machine does not distort the budgets.
+    machine = min(machine, *(measure_machine() for _ in range(5)))
+    print(f"Machine workload: {machine * 1000:.1f} ms")
+
+    current: Dict[str, Any] = {"machine_seconds": machine, "synthetic": synthetic, "synthetic_seconds": synthetic_seconds, "golden": golden, "scale": scale}
+    if args.update:
+        BASELINE_PATH.write_text(dumps(current, indent=2) + "\n", encoding="utf-8")
+        print(f"[INFO] Baseline written to {BASELINE_PATH}")
+        return
+    if not BASELINE_PATH.is_file():
+        print(f"[ERROR] No baseline at {BASELINE_PATH}; record one with --update")
+        exit(1)
+
+    baseline: Dict[str, Any] = loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    failures: List[str] = []
+    compare_exact("boundary", dict(BOUNDARY_CASES), boundaries, failures)
+    for document_type in sorted(set(baseline["synthetic"]) | set(synthetic)):
+        compare_exact(f"synthetic {document_type}", baseline["synthetic"].get(document_type, {}), synthetic.get(document_type, {}), failures)
+    compare_exact("golden", baseline["golden"], golden, failures)
+
+    # The time budgets follow the speed of the machine; the memory budget does not.
+    speed: float = machine / baseline["machine_seconds"]
+    print(f"\nBudgets (machine speed factor {speed:.2f}):")
+    compare_budget("synthetic classify+split", baseline["synthetic_seconds"] * speed, synthetic_seconds, args.tolerance, "s", failures)
+    if scale["files"] == baseline["scale"]["files"]:
+        for stage in ("load", "classify", "split"):
+            compare_budget(f"scale {stage} per file", baseline["scale"][stage] * speed * 1e6, scale[stage] * 1e6, args.tolerance, "us", failures)
+        compare_budget("scale peak memory per file", baseline["scale"]["peak_bytes"] / 1024, scale["peak_bytes"] / 1024, args.memory_tolerance, "KB", failures)
+    else:
+        print(f"[WARNING] The scale budgets are skipped: the corpus has {scale['files']} files, the baseline {baseline['scale']['files']}")
+
+    for failure in failures:
+        print(f"[ERROR] {failure}")
+    if not failures:
+        print("[INFO] Classification, chunk counts and budgets match the baseline")
+    exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Drives the adaptive concurrency limiter against the mock Ollama server.
+
+The probe starts a mock server with the given capacity, points the `Ollama`
+manager at it and sends a batch of structured analysis requests from a
+thread pool. It prints every limiter decision followed by the aggregate
+throughput, which shows whether the limit settles near the server capacity.
+
+Usage:
+    python tools/concurrency_probe.py --capacity 4 --requests 60
+"""
+
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+from pathlib import Path
+from sys import path
+from time import monotonic
+
+path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_ollama_server import MockOllamaConfig, start_server  # noqa: E402
+
+
+def main() -> None:
+    """Runs the probe and prints the limiter decisions and throughput."""
+    parser = ArgumentParser(description="Probe the adaptive concurrency limiter against a mock Ollama server.")
+    parser.add_argument("--capacity", type=int, default=4, help="Parallel slots of the mock server.")
+    parser.add_argument("--contention", type=float, default=0.05, help="Slowdown per additional busy slot.")
+    parser.add_argument("--requests", type=int, default=60, help="Number of requests to send.")
+    parser.add_argument("--max_parallel", type=int, default=8, help="Upper bound of the concurrency limit.")
+    parser.add_argument("--model", type=str, default="MISTRAL", help="Model key from the .env file.")
+    args: Namespace = parser.parse_args()
+
+    server = start_server(MockOllamaConfig(capacity=args.capacity, contention=args.contention, decode_rate=2000.0))
+    environ["OLLAMA_MODEL_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    environ["OLLAMA_MAX_PARALLEL"] = str(args.max_parallel)
+    # Every request is identical; coalescing would answer most of them without reaching the server.
+    environ["OLLAMA_SINGLE_FLIGHT"] = "off"
+
+    # Imported after the environment is prepared, since the manager reads it on creation.
+    from app.language_model import Ollama
+    from app.structured_output import Code_Analysis
+    from langchain_core.prompts import ChatPromptTemplate
+
+    llm_manager = Ollama()
+    if not llm_manager.initialize_llm(args.model):
+        print("[ERROR] Could not connect to the mock server.")
+        return
+
+    prompt = ChatPromptTemplate([("system", "You are an ABAP reviewer."), ("human", "Analyze the following code:\n{page_content}")])
+    started: float = monotonic()
+    with ThreadPoolExecutor(max_workers=args.max_parallel) as executor:
+        results = list(executor.map(lambda _: llm_manager.invoke("analysis", prompt, "METHOD x. ENDMETHOD.", Code_Analysis), range(args.requests)))
+    elapsed: float = monotonic() - started
+
+    completed: int = sum(result is not None for result in results)
+    print(f"\n[INFO] Server capacity: {args.capacity}, final limit: {llm_manager.limiter.limit}, peak limit: {llm_manager.limiter.peak_limit}")
+    print(f"[INFO] {completed}/{args.requests} requests in {elapsed:.1f}s ({completed / elapsed:.2f} requests/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Runs a coordinator and several queue workers against the mock Ollama server.
+
+The probe starts a mock server, a number of worker processes
+(`main.py --worker --queue ...`) and a coordinator run (`main.py --queue ...`)
+sharing one job queue file in a temporary directory, as they would on an NFS
+mount. To exercise lease expiry, some workers are killed with SIGKILL while
+they hold jobs; their jobs must be re-queued and finished by the remaining
+workers. The script prints the coordinator's summary and exits with a
+non-zero status if the report is missing sections.
+
+Usage:
+    python tools/distributed_probe.py --workers 3 --kill 1
+"""
+
+from argparse import ArgumentParser, Namespace
+from os import environ
+from socket import gethostname
+from sqlite3 import OperationalError, connect
+from pathlib import Path
+from re import MULTILINE, findall
+from subprocess import Popen
+from sys import executable, exit, path
+from tempfile import TemporaryDirectory
+from time import monotonic, sleep
+from typing import Dict, List
+
+BASE_DIR: Path = Path(__file__).resolve().parent.parent
+path.insert(0, str(BASE_DIR))
+
+from mock_ollama_server import MockOllamaConfig, start_server  # noqa: E402
+
+
+def holds_jobs(queue_path: str, worker: Popen) -> bool:
+    """Returns whether a worker process currently holds the lease of a job."""
+    try:
+        connection = connect(queue_path, timeout=5)
+        try:
+            query: str = "SELECT COUNT(*) FROM jobs WHERE worker = ? AND status = 'leased'"
+            return connection.execute(query, (f"{gethostname()}-{worker.pid}",)).fetchone()[0] > 0
+        finally:
+            connection.close()
+    except OperationalError:
+        # The queue does not exist until the coordinator has enqueued its first jobs.
+        return False
+
+
+def main() -> None:
+    """Runs the coordinator and workers and checks the assembled report."""
+    parser = ArgumentParser(description="Run a coordinator and queue workers against a mock Ollama server.")
+    parser.add_argument("--file_path", type=str, default=str(BASE_DIR / "files" / "backup"), help="Directory with the sample sources.")
+    parser.add_argument("--workers", type=int, default=3, help="Number of worker processes.")
+    parser.add_argument("--kill", type=int, default=1, help="Number of workers killed while they hold jobs.")
+    parser.add_argument("--lease", type=float, default=5.0, help="Lease duration of the queue in seconds.")
+    parser.add_argument("--decode_rate", type=float, default=100.0, help="Output tokens per second per request of the mock server.")
+    parser.add_argument("--model", type=str, default="MISTRAL", help="Model key from the .env file.")
+    args: Namespace = parser.parse_args()
+
+    server = start_server(MockOllamaConfig(capacity=4 * args.workers, decode_rate=args.decode_rate, contention=0.0))
+    environment: Dict[str, str] = {
+        **environ,
+        "OLLAMA_MODEL_BASE_URL": f"http://127.0.0.1:{server.server_address[1]}",
+        "QUEUE_LEASE_SECONDS": str(args.lease),
+        "PYTHONUNBUFFERED": "1",
+    }
+    sources: int = sum(1 for file in Path(args.file_path).iterdir() if file.is_file())
+
+    with TemporaryDirectory() as directory:
+        queue_path: str = str(Path(directory) / "jobs.db")
+        output_path: Path = Path(directory) / "output"
+        output_path.mkdir()
+        workers: List[Popen] = []
+        for number in range(args.workers):
+            command: List[str] = [executable, "main.py", "--worker", "--queue", queue_path, "--model", args.model, "--idle_timeout", str(3 * args.lease)]
+            with open(Path(directory) / f"worker_{number}.log", "w") as log:
+                workers.append(Popen(command, cwd=BASE_DIR, env=environment, stdout=log, stderr=log))
+
+        coordinator_log: Path = Path(directory) / "coordinator.log"
+        with open(coordinator_log, "w") as log:
+            # Without the response cache, every request of the run reaches the workers.
+            command = [executable, "main.py", "--queue", queue_path, "--file_path", args.file_path, "--output_path", str(output_path), "--model", args.model, "--no_cache"]
+            started: float = monotonic()
+            coordinator: Popen = Popen(command, cwd=BASE_DIR, env=environment, stdout=log, stderr=log)
+            targets: List[Popen] = workers[: args.kill]
+            while coordinator.poll() is None:
+                for worker in [worker for worker in targets if holds_jobs(queue_path, worker)]:
+                    worker.kill()
+                    targets.remove(worker)
+                    print(f"[INFO] Killed worker process {worker.pid} while it held jobs")
+                sleep(0.2)
+        elapsed: float = monotonic() - started
+        for worker in workers:
+            worker.wait()
+        server.shutdown()
+
+        summary: str = coordinator_log.read_text(encoding="utf-8")
+        for line in summary.splitlines():
+            if "Queue jobs by worker" in line or "Re-queued" in line or "Makespan total" in line:
+                print(line.strip())
+        report: Path = output_path / "code_structure.md"
+        sections: int = len(findall(r"^## Technical Specification", report.read_text(encoding="utf-8"), MULTILINE)) if report.is_file() else 0
+        print(f"[INFO] {sections}/{sources} documents with a technical specification in {elapsed:.1f}s")
+        if sections < sources:
+            print(f"[ERROR] The report is incomplete; see the logs in {directory}")
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
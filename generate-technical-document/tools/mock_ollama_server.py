@@ -0,0 +1,246 @@
+"""
+A local mock of the Ollama HTTP API for exercising the request path.
+
+The server emulates `/api/chat` (streaming and non-streaming), `/api/tags`
+and `/api/version`. It models a GPU with a fixed number of parallel slots:
+requests beyond `--capacity` queue up, and every request pays a prefill cost
+per prompt token and a decode cost per generated token. With `--prefix_cache`
+every slot keeps the prompt it served last, and a request is placed on the
+free slot sharing the longest prefix with it; the shared tokens are not
+prefilled again, like Ollama's KV cache reuse. Failure, malformed JSON and
+hang rates can be injected to exercise retries, JSON repair and hedging.
+
+Usage:
+    python tools/mock_ollama_server.py --port 11435 --capacity 4
+"""
+
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from os.path import commonprefix
+from random import Random
+from threading import BoundedSemaphore, Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Dict, List
+
+
+class MockOllamaConfig:
+    """Holds the simulated capacity and fault injection settings."""
+
+    def __init__(
+        self,
+        capacity: int = 4,
+        prefill_rate: float = 4000.0,
+        decode_rate: float = 400.0,
+        output_tokens: int = 200,
+        contention: float = 0.15,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        prefix_cache: bool = False,
+        seed: int = 7,
+    ) -> None:
+        """
+        Initializes the configuration.
+
+        Args:
+            capacity: The number of requests served in parallel.
+            prefill_rate: Prompt tokens processed per second.
+            decode_rate: Output tokens generated per second for a single request.
+            output_tokens: The number of tokens each response pretends to generate.
+            contention: The slowdown added per additional busy slot.
+            error_rate: The fraction of requests answered with HTTP 500.
+            malformed_rate: The fraction of structured responses wrapped in prose.
+            hang_rate: The fraction of requests that never answer.
+            prefix_cache: Whether slots skip the prefill of a prompt prefix they already processed.
+            seed: The random seed used for fault injection.
+        """
+        self.capacity: int = capacity
+        self.prefill_rate: float = prefill_rate
+        self.decode_rate: float = decode_rate
+        self.output_tokens: int = output_tokens
+        self.contention: float = contention
+        self.error_rate: float = error_rate
+        self.malformed_rate: float = malformed_rate
+        self.hang_rate: float = hang_rate
+        self.random = Random(seed)
+        self.prefix_cache: bool = prefix_cache
+        self.slots = BoundedSemaphore(capacity)
+        self.free_slots: List[int] = list(range(capacity))
+        self.slot_prompts: List[str] = [""] * capacity
+        self.busy: int = 0
+        self.served: int = 0
+        self.lock = Lock()
+
+
+def _fill_schema(schema: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Builds a JSON object satisfying a simple JSON schema of string fields."""
+    return {name: f"{text} ({name})" if spec.get("type", "string") == "string" else None for name, spec in schema.get("properties", {}).items()}
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Answers Ollama API requests according to the server's `MockOllamaConfig`."""
+
+    server_version = "MockOllama/1.0"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; with Nagle's algorithm the body waits for the client's delayed ACK (about 40 ms).
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silences the default per-request logging."""
+
+    def do_GET(self) -> None:
+        """Serves the version and model listing endpoints."""
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-mock"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": [{"name": "mock:latest", "model": "mock:latest"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self) -> None:
+        """Serves the chat endpoint."""
+        length: int = int(self.headers.get("Content-Length", 0))
+        body: Dict[str, Any] = loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/chat":
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        config: MockOllamaConfig = self.server.config  # type: ignore[attr-defined]
+        with config.lock:
+            roll: float = config.random.random()
+        if roll < config.hang_rate:
+            sleep(3600)
+            return
+        if roll < config.hang_rate + config.error_rate:
+            self._send_json({"error": "simulated failure"}, status=500)
+            return
+
+        messages: List[Dict[str, Any]] = body.get("messages", [])
+        prompt_tokens: int = sum(len(str(message.get("content", ""))) for message in messages) // 4
+        prompt: str = "".join(f"<{message.get('role')}>{message.get('content', '')}\n" for message in messages)
+        started: float = monotonic()
+        with config.slots:
+            with config.lock:
+                config.busy += 1
+                slowdown: float = 1.0 + config.contention * (config.busy - 1)
+                slot: int = max(config.free_slots, key=lambda index: len(commonprefix([config.slot_prompts[index], prompt])))
+                config.free_slots.remove(slot)
+                cached_tokens: int = min(prompt_tokens, len(commonprefix([config.slot_prompts[slot], prompt])) // 4) if config.prefix_cache else 0
+            # Like Ollama, only the prompt tokens that were actually evaluated are reported.
+            evaluated_tokens: int = prompt_tokens - cached_tokens
+            prefill: float = evaluated_tokens / config.prefill_rate
+            decode: float = config.output_tokens / config.decode_rate * slowdown
+            sleep(prefill + decode)
+            with config.lock:
+                config.busy -= 1
+                config.served += 1
+                config.slot_prompts[slot] = prompt
+                config.free_slots.append(slot)
+        total: float = monotonic() - started
+
+        schema: Any = body.get("format")
+        if isinstance(schema, dict):
+            content: str = dumps(_fill_schema(schema, "Mock response"))
+            if roll > 1.0 - config.malformed_rate:
+                content = f"Here is the result:\n```json\n{content[:-1]},}}\n```"
+        elif schema == "json":
+            content = dumps({"page_content": "Mock response"})
+        else:
+            content = "Mock response"
+
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        final: Dict[str, Any] = {
+            "model": body.get("model", "mock:latest"),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": message,
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(total * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": evaluated_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": config.output_tokens,
+            "eval_duration": int(decode * 1e9),
+        }
+        if body.get("stream", True):
+            first: Dict[str, Any] = {"model": final["model"], "created_at": final["created_at"], "message": message, "done": False}
+            self._send_lines([first, {**final, "message": {"role": "assistant", "content": ""}}])
+        else:
+            self._send_json(final)
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        """Writes a single JSON response."""
+        data: bytes = dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_lines(self, payloads: List[Dict[str, Any]]) -> None:
+        """Writes a newline-delimited JSON stream."""
+        data: bytes = "".join(dumps(payload) + "\n" for payload in payloads).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_server(config: MockOllamaConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Starts the mock server in a background thread.
+
+    Args:
+        config: The simulated capacity and fault injection settings.
+        host: The interface to bind.
+        port: The port to bind. Port 0 picks a free port.
+
+    Returns:
+        The running server. Its address is available as `server.server_address`.
+    """
+    server = ThreadingHTTPServer((host, port), MockOllamaHandler)
+    server.daemon_threads = True
+    server.config = config  # type: ignore[attr-defined]
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    """Parses the command line and runs the mock server in the foreground."""
+    parser = ArgumentParser(description="Run a mock Ollama server with configurable capacity.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=11435, help="Port to bind.")
+    parser.add_argument("--capacity", type=int, default=4, help="Number of requests served in parallel.")
+    parser.add_argument("--decode_rate", type=float, default=400.0, help="Output tokens per second per request.")
+    parser.add_argument("--output_tokens", type=int, default=200, help="Tokens generated per response.")
+    parser.add_argument("--contention", type=float, default=0.15, help="Slowdown added per additional busy slot.")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests failing with HTTP 500.")
+    parser.add_argument("--malformed_rate", type=float, default=0.0, help="Fraction of malformed structured responses.")
+    parser.add_argument("--hang_rate", type=float, default=0.0, help="Fraction of requests that never answer.")
+    parser.add_argument("--prefix_cache", action="store_true", help="Skip the prefill of prompt prefixes a slot already processed.")
+    args: Namespace = parser.parse_args()
+
+    config = MockOllamaConfig(
+        capacity=args.capacity,
+        decode_rate=args.decode_rate,
+        output_tokens=args.output_tokens,
+        contention=args.contention,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        hang_rate=args.hang_rate,
+        prefix_cache=args.prefix_cache,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), MockOllamaHandler)
+    server.config = config  # type: ignore[attr-defined]
+    print(f"[INFO] Mock Ollama listening on http://{args.host}:{args.port} with capacity {args.capacity}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Mock Ollama stopped")
+
+
+if __name__ == "__main__":
+    main()